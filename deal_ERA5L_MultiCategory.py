@@ -2,8 +2,35 @@
 # -*- coding: utf-8 -*-
 
 """
-ERA5-Land GeoTIFF -> NetCDF (Multi-Category) - v5.0 (交互式类别选择)
+ERA5-Land GeoTIFF -> NetCDF (Multi-Category) - v5.1 (长时间回补)
 --------------------------------------------------------------------
+新增功能 (v5.1)：
+- 单日处理流程移至模块级函数，可通过 run_era5l_multi() 非交互调用
+- PARALLEL_DAYS > 1 时按日多进程并行，并按 MEMORY_BUDGET_GB 调度在途日期的估算内存
+- PREFETCH_DEPTH > 0 时启用预读流水线，重叠下一日读取与当日写出，并分别统计各阶段阻塞时间
+- PARALLEL_WRITERS 为 True 时按输出设备分队列，在独立进程中并行压缩写出各类别（波段经共享内存传递），并报告各类别写出耗时
+- STREAM_STRIP_ROWS > 0 时按纬度条带流式读写，峰值内存与条带高度成正比，输出数值与整幅路径一致
+- 两块半球直接读入同一个预分配缓冲区，蒸发 Es/Ew/Et 交换改为索引重映射，不再复制数据
+- 压缩/分块方案 (ENCODING_PROFILES) 可按类别选择 (CATEGORY_ENCODING)；bench-encoding 子命令在样例日上比较各方案
+- OUTPUT_BACKEND='zarr' 时每类别写入一个带 time 维的 Zarr 存储，支持多进程并发写入不同日期与断点续写
+- OUTPUT_BACKEND='cube' 时在处理过程中将各日累积到每类别每月/每年一个 NetCDF 文件，支持不完整月份与断点续写
+- MANIFEST_PATH 指定时以 SQLite 清单记录已完整写出的文件并据此跳过，manifest-verify / manifest-scan 子命令复核与登记输出
+- 运行开始前每个输入月目录只列一次建立索引 (可按目录修改时间缓存到 INPUT_INDEX_CACHE)，提前报告缺失或不完整的日期
+- METRICS_PATH / PROMETHEUS_TEXTFILE 输出逐日、逐类别的结构化指标，PROFILE_MODE 剖析单日热点，metrics-summary 子命令汇总 p50/p95
+- DASK_LAZY 为 True 时各波段为按窗口读取的 dask 数组，拼接、缩放与写出均惰性执行，按块流经调度器
+- REGION_BBOX 只读取与经纬度框相交的 tif 窗口，COARSEN_FACTOR 按块平均粗化输出（*_min/*_max 取块内最小/最大）
+- 按 tif 布局（波段/像素交错、分块、压缩）选择按波段、按块行窗口或全部波段读取 (READ_STRATEGY)，GDAL 多线程解压并打印实测吞吐量
+- INCREMENTAL_APPEND 为 True 时已有输出缺少新选变量只读取对应波段并追加写入，不重写已有变量
+- PACK_INT16 为 True 时 PACK_SPECS 中的变量按有效范围与精度写为 CF int16 打包变量，bench-encoding --pack 报告往返误差
+- 输出先写入同目录临时文件再原子重命名；JOURNAL_PATH 运行日志记录各单元开始/完成，续跑时报告并清理上次中断遗留的临时文件
+- AGGREGATE_PERIODS 在逐日处理中累加月/年 count、均值/方差与 min/max（带检查点），周期结束即写出聚合；aggregate-climatology 子命令由月聚合合并多年逐月气候态
+- NC_WRITER='direct' 时按运行开始时计算的类别模板用 netCDF4 直接写出波段缓冲区切片，不构建 xarray 对象；bench-writer 子命令比较两种写出方式并核对文件结构
+- CLAIM_DIR 指定时多台机器/多个工作进程在共享目录中以锁文件认领 (日期, 类别) 单元，心跳续期，过期锁可接管；worker 子命令非交互启动工作进程
+- REF_INDEX 为 True 时每个日文件写出后记录 kerchunk 引用片段，运行结束按类别合并为可一次打开整个时间序列的引用索引；ref-index 子命令由已有文件并行重建
+- LAND_GATHER 为 True 时各变量只写出陆地格点的一维向量（CF 按收集压缩），掩膜来自 LAND_MASK_PATH 或首日数据；bench-encoding --land 报告各类别的节省
+- QC_REPORT_PATH 指定时每日写出前检查内存中的波段（缺测、物理范围、两块 tif 的接缝、X_min <= X <= X_max、蒸发符号与顺序），逐日记录并在运行结束时汇总；QC_FAIL_FAST 达到天数即停止运行
+- rechunk 子命令将逐日输出重排为每类别一个按时间方向分块的 Zarr 存储（内存有界的两遍算法），extract-points / era5l_rechunk.extract_points 只读取站点所在的块提取长时间序列
+
 新增功能 (v5.0)：
 - 添加交互式类别选择界面：在处理数据前，用户可通过 tkinter 复选框界面选择要处理的数据类别
 - 支持选择性处理五大类别：蒸发(Evaporation)、植被(Vegetation)、辐射(Radiation)、土壤(Soil)、径流+降水(Runoff+Precip)
@@ -24,6 +51,8 @@ ERA5-Land GeoTIFF -> NetCDF (Multi-Category) - v5.0 (交互式类别选择)
 
 import os
 import sys
+import csv
+import argparse
 import datetime as dt
 import time
 import glob
@@ -31,10 +60,34 @@ import gc
 import numpy as np
 import xarray as xr
 import rasterio
+import netCDF4
+import era5l_zarr
+import era5l_cube
+import era5l_aggregate
+import era5l_manifest
+import era5l_input_index
+import era5l_metrics
+import era5l_dask
+import era5l_region
+import era5l_read_plan
+import era5l_packing
+import era5l_nc_template
+import era5l_journal
+import era5l_claims
+import era5l_refindex
+import era5l_land
+import era5l_qc
+import era5l_rechunk
+from rasterio.windows import Window
 import traceback
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
 
 # ===== 可配置项 =====
 APPLY_EVAP_SWAP = True  # 历史数据已修正；如需在新数据上继续应用交换修正，改为 True
@@ -45,6 +98,2304 @@ OUT_RAD  = r'G:\\Radiation'
 OUT_SOIL = r'G:\\SoilMoisture'
 OUT_ROPR = r'G:\\Precipitation_Runoff'
 
+# 按日多进程并行（长时间回补用）
+PARALLEL_DAYS = 1          # 同时处理的天数（工作进程数）；1 表示保持原有的逐日串行处理
+MEMORY_BUDGET_GB = 16.0    # 并行模式下所有在途日期的估算内存总上限 (GB)；流式聚合的累加器与单日处理合计也不得超过此值
+
+# 流水线预读（串行模式下，将下一日的 GeoTIFF 读取与当日的 NetCDF 写出重叠）
+PREFETCH_DEPTH = 0         # 预读队列深度 k；0 表示关闭（PARALLEL_DAYS > 1 时不使用）
+PREFETCH_MEMORY_GB = 8.0   # 预读队列与正在写出的数据合计的内存上限 (GB)
+
+# 并行写出：每个输出设备（物理卷）一个写出进程，五个类别按所在设备排队、跨设备并行压缩写出
+PARALLEL_WRITERS = False   # PARALLEL_DAYS > 1 时不使用（各日期已在独立进程中写出）
+
+# 条带流式模式：按纬度条带窗口读取并直接写入预先创建的 NetCDF 变量，峰值内存与条带高度成正比
+STREAM_STRIP_ROWS = 0      # 条带高度（行）；0 表示关闭，使用整幅读取（与预读、并行写出互斥）
+
+# 读取计划：按 tif 布局（波段/像素交错、分块、压缩）选择读取方式，并开启 GDAL 多线程解压
+READ_STRATEGY = 'auto'          # 'auto' / 'bands'（按波段）/ 'windows'（按块行窗口）/ 'full'（全部波段后切片）
+GDAL_NUM_THREADS = 'ALL_CPUS'   # 每块 tif 的解压线程数：'ALL_CPUS' 或整数
+
+# dask 惰性模式（需要 dask）：各波段为按纬度窗口读取的 dask 数组，to_netcdf(compute=False) 后一次计算写出，
+# 峰值内存约为 并发数 x 所需波段数 x DASK_CHUNK_ROWS x 3600 x 4 字节（与预读、并行写出、条带流式互斥）
+DASK_LAZY = False
+DASK_CHUNK_ROWS = 225
+DASK_SCHEDULER = 'threads'  # 'threads' 或 'synchronous'；多进程请配合 PARALLEL_DAYS
+
+# NetCDF 压缩/分块方案：键名同时适用于 xarray encoding 与 netCDF4.createVariable
+# chunksizes 为 (lat, lon)；significant_digits + quantize_mode 为有损量化，可显著提高压缩率
+ENCODING_PROFILES = {
+    'default':   {'zlib': True, 'complevel': 5},                                          # 历史设置，netCDF 默认分块
+    'fast':      {'zlib': True, 'complevel': 1, 'shuffle': True, 'chunksizes': (180, 360)},
+    'regional':  {'zlib': True, 'complevel': 4, 'shuffle': True, 'chunksizes': (90, 90)},   # 区域框/单点读取
+    'quantized': {'zlib': True, 'complevel': 4, 'shuffle': True, 'chunksizes': (90, 90),
+                  'significant_digits': 4, 'quantize_mode': 'GranularBitRound'},
+}
+# 各类别使用的方案名称
+CATEGORY_ENCODING = {'evap': 'default', 'veg': 'default', 'rad': 'default', 'soil': 'default', 'ropr': 'default'}
+
+# 逐日 NetCDF 的写出方式：'xarray' 构建 Dataset 后 to_netcdf；'direct' 按运行开始时计算的类别模板
+# 用 netCDF4 直接写出波段缓冲区切片（文件结构与 xarray 路径一致，不用于 dask 惰性模式与增量追加）
+NC_WRITER = 'xarray'
+
+# CF int16 打包：PACK_SPECS 中有定义的变量写为 int16 + scale_factor/add_offset，其余变量仍为 float32（仅 netcdf 后端）
+PACK_INT16 = False
+
+# 输出后端：'netcdf' 每类别每日一个文件；'zarr' 每类别一个带 time 维的 Zarr 存储（需要 zarr>=3）；
+# 'cube' 每类别每月/每年一个带 time 维的 NetCDF 文件（周期由 CUBE_PERIOD 指定，仅主进程串行写出）
+OUTPUT_BACKEND = 'netcdf'
+CUBE_PERIOD = 'month'      # 'month' 或 'year'
+
+# 完成清单 (SQLite) 路径，仅用于 'netcdf' 后端；None 表示逐个检查输出文件是否存在。
+# 清单在运行开始时一次性载入，只登记完整写出的文件；请放在本地磁盘上
+MANIFEST_PATH = None
+
+# 增量追加：已存在的类别输出缺少已选变量时，只读取缺少变量的波段并追加写入（不重写已有变量）
+# 'netcdf' 后端以追加模式打开已有文件，'zarr' 后端只写入各日缺少的变量切片；不用于 cube 后端、条带流式与 dask 惰性模式
+INCREMENTAL_APPEND = False
+
+# 运行日志 (JSONL) 路径，仅用于 'netcdf' 后端；记录各 (日期, 类别) 单元的开始与完成，
+# 重新运行时报告并清理上次中断时正在写出的单元（输出总是先写临时文件再原子重命名，与是否启用日志无关）
+JOURNAL_PATH = None
+
+# 多机分布式：各工作进程在共享目录中以锁文件认领 (日期, 类别) 单元，只处理自己认领到的单元（仅 netcdf 后端）；
+# 锁由心跳续期，超过 CLAIM_LEASE_S 秒未续期的锁视为崩溃遗留，可被其他工作进程接管。None 表示不启用
+CLAIM_DIR = None
+CLAIM_LEASE_S = 600
+
+# 流式月/年聚合：非空时各类别在写出后将整幅数据累加到所在月/年的累加器（count、均值/方差、min/max），
+# 周期结束时写出到 <类别输出目录>/aggregates；累加器每 AGGREGATE_CHECKPOINT_DAYS 天保存一次检查点（仅 netcdf 后端）
+AGGREGATE_PERIODS = ()     # 例如 ('month', 'year')
+AGGREGATE_CHECKPOINT_DAYS = 7
+
+# 虚拟聚合索引：每个日文件写出后记录 kerchunk 引用片段（各数据块在文件中的字节范围），运行结束时按类别合并为
+# <类别输出目录>/refs/ERA5_Land_Daily_<类别>.json，可作为一个惰性 Dataset 打开（仅 netcdf 后端，需要 kerchunk 与 h5py）
+REF_INDEX = False
+
+# 陆地格点存储：各变量只写出陆地格点的一维向量（CF 按收集压缩，列表变量 land 带 compress = "lat lon"），约为整幅的 1/3；
+# 掩膜读取自 LAND_MASK_PATH（land_mask 或 lsm 变量），文件不存在或为 None 时取首个待处理日期所读波段的有效值并集，
+# 并保存到 LAND_MASK_PATH 供之后的运行复用（仅 netcdf 后端的整幅读取路径）
+LAND_GATHER = False
+LAND_MASK_PATH = None
+
+# 时间序列重排（rechunk 子命令）：逐日 NetCDF 重排为每类别一个按时间方向分块的 Zarr 存储（<类别输出目录>/timeseries），
+# 供 extract-points 子命令 / era5l_rechunk.extract_points 快速提取站点长时间序列（需要 zarr>=3）
+RECHUNK_CHUNKS = (None, 50, 50)   # (time, lat, lon)；time 为 None 表示整个日期范围一个块
+RECHUNK_MEMORY_GB = 4.0           # 两遍重排的内存预算 (GB)，多个进程时均分
+
+# 输入目录索引缓存 (JSON) 路径；None 表示每次运行都重新列出所需的月目录（每个目录只列一次）
+INPUT_INDEX_CACHE = None
+
+# 结构化指标：每日/每类别一条 JSONL 记录（None 表示不记录）；可选同时写出 Prometheus node-exporter textfile
+METRICS_PATH = None
+PROMETHEUS_TEXTFILE = None
+# 性能剖析：None / 'cprofile' / 'tracemalloc'，只剖析 PROFILE_DAY（'yyyymmdd'，None 为第一个处理的日期）这一天，
+# 结果写入 METRICS_PATH 所在目录（未设置时为当前目录）
+PROFILE_MODE = None
+PROFILE_DAY = None
+
+# 数据质量检查 (QC)：每日写出前检查读入的各输出变量（缺测比例、物理有效范围 QC_RANGES、两块 tif 拼接处的接缝连续性、
+# X_min <= X <= X_max、蒸发符号与 Es/Ew/Et 顺序），每日一条记录追加到 QC_REPORT_PATH (JSONL)，运行结束时汇总；
+# None 表示不检查。仅用于整幅读取路径（不用于条带流式与 dask 惰性模式）
+QC_REPORT_PATH = None
+# 超过阈值记为 error：缺测比例、超出物理范围的格点比例、接缝差值与内部差值之比、违反 min/max 约束的格点比例、蒸发负值比例
+QC_LIMITS = {'nan_fraction': 0.8, 'out_of_range': 0.001, 'seam_ratio': 5.0, 'bounds': 0.001, 'evap_negative': 0.5}
+# fail-fast：> 0 时有 error 的日期不写出，累计达到该天数即停止运行；0 表示只记录不停止
+QC_FAIL_FAST = 0
+
+# 区域子集：(南, 北, 西, 东) 度，None 表示全球；只读取与之相交的 tif 窗口（仅用于 netcdf 后端的整幅读取路径）
+# 建议区域输出使用单独的输出目录，文件名与全球输出相同
+REGION_BBOX = None         # 例如东亚 (15.0, 55.0, 70.0, 150.0)；西 > 东 表示跨越 180° 经线，如 (10.0, 20.0, 170.0, -170.0)
+# 粗化倍数：1 不粗化；5 输出 0.5°，10 输出 1°（须整除 1800）。块内取平均，*_min/*_max 取最小/最大，忽略缺测
+COARSEN_FACTOR = 1
+
+# 全球网格尺寸（两块半球 tif 各 1800x1800，左右拼接为 1800x3600）
+GRID_HEIGHT = 1800
+GRID_WIDTH = 3600
+
+# ========= 变量表 =========
+EVAP_BANDS = [
+    {'Index': 35, 'VarName': 'Es', 'LongName': 'Evaporation from bare soil', 'Units': 'mm day-1'},
+    {'Index': 36, 'VarName': 'Ew', 'LongName': 'Evaporation from open water surfaces excluding oceans', 'Units': 'mm day-1'},
+    {'Index': 37, 'VarName': 'Ec', 'LongName': 'Evaporation from the top of canopy', 'Units': 'mm day-1'},
+    {'Index': 38, 'VarName': 'Et', 'LongName': 'Evaporation from vegetation transpiration', 'Units': 'mm day-1'},
+    {'Index': 39, 'VarName': 'Ep', 'LongName': 'Potential evaporation', 'Units': 'mm day-1'},
+    {'Index': 44, 'VarName': 'E',  'LongName': 'Total evaporation', 'Units': 'mm day-1'}
+]
+VEG_BANDS = [
+    {'Index': 49,  'VarName': 'lai_high',     'LongName': 'Leaf area index of high vegetation (half of total green leaf area)', 'Units': '1'},
+    {'Index': 50,  'VarName': 'lai_low',      'LongName': 'Leaf area index of low vegetation (half of total green leaf area)',  'Units': '1'},
+    {'Index': 147, 'VarName': 'lai_high_min', 'LongName': 'Daily minimum leaf_area_index_high_vegetation', 'Units': '1'},
+    {'Index': 148, 'VarName': 'lai_high_max', 'LongName': 'Daily maximum leaf_area_index_high_vegetation', 'Units': '1'},
+    {'Index': 149, 'VarName': 'lai_low_min',  'LongName': 'Daily minimum leaf_area_index_low_vegetation',  'Units': '1'},
+    {'Index': 150, 'VarName': 'lai_low_max',  'LongName': 'Daily maximum leaf_area_index_low_vegetation',  'Units': '1'},
+]
+RAD_BANDS = [
+    {'Index': 28,  'VarName': 'albedo',      'LongName': 'Forecast albedo', 'Units': '1'},
+    {'Index': 29,  'VarName': 'lhf_sum',     'LongName': 'Surface latent heat flux sum', 'Units': 'J m-2'},
+    {'Index': 30,  'VarName': 'nsr_sum',     'LongName': 'Surface net solar radiation sum', 'Units': 'J m-2'},
+    {'Index': 31,  'VarName': 'ntr_sum',     'LongName': 'Surface net thermal radiation sum', 'Units': 'J m-2'},
+    {'Index': 32,  'VarName': 'shf_sum',     'LongName': 'Surface sensible heat flux sum', 'Units': 'J m-2'},
+    {'Index': 33,  'VarName': 'srd_sum',     'LongName': 'Surface solar radiation downwards sum', 'Units': 'J m-2'},
+    {'Index': 34,  'VarName': 'trd_sum',     'LongName': 'Surface thermal radiation downwards sum', 'Units': 'J m-2'},
+    {'Index': 105, 'VarName': 'albedo_min',  'LongName': 'Daily minimum forecast albedo', 'Units': '1'},
+    {'Index': 106, 'VarName': 'albedo_max',  'LongName': 'Daily maximum forecast albedo', 'Units': '1'},
+    {'Index': 107, 'VarName': 'lhf_min',     'LongName': 'Daily minimum surface latent heat flux', 'Units': 'J m-2'},
+    {'Index': 108, 'VarName': 'lhf_max',     'LongName': 'Daily maximum surface latent heat flux', 'Units': 'J m-2'},
+    {'Index': 109, 'VarName': 'nsr_min',     'LongName': 'Daily minimum surface net solar radiation', 'Units': 'J m-2'},
+    {'Index': 110, 'VarName': 'nsr_max',     'LongName': 'Daily maximum surface net solar radiation', 'Units': 'J m-2'},
+    {'Index': 111, 'VarName': 'ntr_min',     'LongName': 'Daily minimum surface net thermal radiation', 'Units': 'J m-2'},
+    {'Index': 112, 'VarName': 'ntr_max',     'LongName': 'Daily maximum surface net thermal radiation', 'Units': 'J m-2'},
+    {'Index': 113, 'VarName': 'shf_min',     'LongName': 'Daily minimum surface sensible heat flux', 'Units': 'J m-2'},
+    {'Index': 114, 'VarName': 'shf_max',     'LongName': 'Daily maximum surface sensible heat flux', 'Units': 'J m-2'},
+    {'Index': 115, 'VarName': 'srd_min',     'LongName': 'Daily minimum surface solar radiation downwards', 'Units': 'J m-2'},
+    {'Index': 116, 'VarName': 'srd_max',     'LongName': 'Daily maximum surface solar radiation downwards', 'Units': 'J m-2'},
+    {'Index': 117, 'VarName': 'trd_min',     'LongName': 'Daily minimum surface thermal radiation downwards', 'Units': 'J m-2'},
+    {'Index': 118, 'VarName': 'trd_max',     'LongName': 'Daily maximum surface thermal radiation downwards', 'Units': 'J m-2'},
+]
+SOIL_BANDS = [
+    {'Index': 4,  'VarName': 'stl1', 'LongName': 'Soil temperature level 1 (0-7 cm)',   'Units': 'K'},
+    {'Index': 5,  'VarName': 'stl2', 'LongName': 'Soil temperature level 2 (7-28 cm)',  'Units': 'K'},
+    {'Index': 6,  'VarName': 'stl3', 'LongName': 'Soil temperature level 3 (28-100 cm)','Units': 'K'},
+    {'Index': 7,  'VarName': 'stl4', 'LongName': 'Soil temperature level 4 (100-289 cm)','Units': 'K'},
+    {'Index': 57, 'VarName': 'stl1_min', 'LongName': 'Daily minimum soil temperature level 1', 'Units': 'K'},
+    {'Index': 58, 'VarName': 'stl1_max', 'LongName': 'Daily maximum soil temperature level 1', 'Units': 'K'},
+    {'Index': 59, 'VarName': 'stl2_min', 'LongName': 'Daily minimum soil temperature level 2', 'Units': 'K'},
+    {'Index': 60, 'VarName': 'stl2_max', 'LongName': 'Daily maximum soil temperature level 2', 'Units': 'K'},
+    {'Index': 61, 'VarName': 'stl3_min', 'LongName': 'Daily minimum soil temperature level 3', 'Units': 'K'},
+    {'Index': 62, 'VarName': 'stl3_max', 'LongName': 'Daily maximum soil temperature level 3', 'Units': 'K'},
+    {'Index': 63, 'VarName': 'stl4_min', 'LongName': 'Daily minimum soil temperature level 4', 'Units': 'K'},
+    {'Index': 64, 'VarName': 'stl4_max', 'LongName': 'Daily maximum soil temperature level 4', 'Units': 'K'},
+    {'Index': 24, 'VarName': 'vsw1', 'LongName': 'Volumetric soil water layer 1 (0-7 cm)',    'Units': 'm3 m-3'},
+    {'Index': 25, 'VarName': 'vsw2', 'LongName': 'Volumetric soil water layer 2 (7-28 cm)',   'Units': 'm3 m-3'},
+    {'Index': 26, 'VarName': 'vsw3', 'LongName': 'Volumetric soil water layer 3 (28-100 cm)', 'Units': 'm3 m-3'},
+    {'Index': 27, 'VarName': 'vsw4', 'LongName': 'Volumetric soil water layer 4 (100-289 cm)','Units': 'm3 m-3'},
+    {'Index': 97,  'VarName': 'vsw1_min', 'LongName': 'Daily minimum volumetric soil water layer 1', 'Units': 'm3 m-3'},
+    {'Index': 98,  'VarName': 'vsw1_max', 'LongName': 'Daily maximum volumetric soil water layer 1', 'Units': 'm3 m-3'},
+    {'Index': 99,  'VarName': 'vsw2_min', 'LongName': 'Daily minimum volumetric soil water layer 2', 'Units': 'm3 m-3'},
+    {'Index': 100, 'VarName': 'vsw2_max', 'LongName': 'Daily maximum volumetric soil water layer 2', 'Units': 'm3 m-3'},
+    {'Index': 101, 'VarName': 'vsw3_min', 'LongName': 'Daily minimum volumetric soil water layer 3', 'Units': 'm3 m-3'},
+    {'Index': 102, 'VarName': 'vsw3_max', 'LongName': 'Daily maximum volumetric soil water layer 3', 'Units': 'm3 m-3'},
+    {'Index': 103, 'VarName': 'vsw4_min', 'LongName': 'Daily minimum volumetric soil water layer 4', 'Units': 'm3 m-3'},
+    {'Index': 104, 'VarName': 'vsw4_max', 'LongName': 'Daily maximum volumetric soil water layer 4', 'Units': 'm3 m-3'},
+]
+ROPR_BANDS = [
+    {'Index': 40,  'VarName': 'ro',     'LongName': 'Runoff (total)',          'Units': 'm'},
+    {'Index': 42,  'VarName': 'ro_sub', 'LongName': 'Sub-surface runoff',      'Units': 'm'},
+    {'Index': 43,  'VarName': 'ro_sfc', 'LongName': 'Surface runoff',          'Units': 'm'},
+    {'Index': 48,  'VarName': 'tp',     'LongName': 'Total precipitation',     'Units': 'm'},
+    {'Index': 129, 'VarName': 'ro_min',     'LongName': 'Daily minimum runoff',              'Units': 'm'},
+    {'Index': 130, 'VarName': 'ro_max',     'LongName': 'Daily maximum runoff',              'Units': 'm'},
+    {'Index': 133, 'VarName': 'ro_sub_min', 'LongName': 'Daily minimum sub-surface runoff',  'Units': 'm'},
+    {'Index': 134, 'VarName': 'ro_sub_max', 'LongName': 'Daily maximum sub-surface runoff',  'Units': 'm'},
+    {'Index': 135, 'VarName': 'ro_sfc_min', 'LongName': 'Daily minimum surface runoff',      'Units': 'm'},
+    {'Index': 136, 'VarName': 'ro_sfc_max', 'LongName': 'Daily maximum surface runoff',      'Units': 'm'},
+    {'Index': 145, 'VarName': 'tp_min',     'LongName': 'Daily minimum total precipitation', 'Units': 'm'},
+    {'Index': 146, 'VarName': 'tp_max',     'LongName': 'Daily maximum total precipitation', 'Units': 'm'},
+]
+
+# int16 打包元数据 (PACK_INT16)：有效范围与精度为变量单位，超出范围的值裁剪到边界；未列出的变量不打包
+PACK_SPECS = {
+    **{b['VarName']: {'ValidRange': (0.0, 10.0), 'Precision': 0.001, 'FillValue': -32768} for b in VEG_BANDS},
+    **{v: {'ValidRange': (0.0, 1.0), 'Precision': 0.0001, 'FillValue': -32768}
+       for v in ('albedo', 'albedo_min', 'albedo_max')},
+    **{b['VarName']: {'ValidRange': (170.0, 350.0), 'Precision': 0.01, 'FillValue': -32768}
+       for b in SOIL_BANDS if b['VarName'].startswith('stl')},
+    **{b['VarName']: {'ValidRange': (0.0, 1.0), 'Precision': 0.0001, 'FillValue': -32768}
+       for b in SOIL_BANDS if b['VarName'].startswith('vsw')},
+}
+
+# QC 物理有效范围（变量单位）：打包变量沿用 PACK_SPECS 的有效范围；径流/降水允许打包误差造成的微小负值；
+# 未列出的变量（辐射通量）只检查缺测与变量间约束
+QC_RANGES = {
+    **{name: spec['ValidRange'] for name, spec in PACK_SPECS.items()},
+    **{b['VarName']: (-20.0, 50.0) for b in EVAP_BANDS},
+    **{b['VarName']: (-1e-6, 1.0) for b in ROPR_BANDS},
+}
+
+
+# 类别定义：Key 用于内部字典，Name 用于日志，FileTag 用于输出文件名
+CATEGORY_SPECS = [
+    {'Key': 'evap', 'Name': 'Evap',          'FileTag': 'ET',           'Bands': EVAP_BANDS},
+    {'Key': 'veg',  'Name': 'Vegetation',    'FileTag': 'Vegetation',   'Bands': VEG_BANDS},
+    {'Key': 'rad',  'Name': 'Radiation',     'FileTag': 'Radiation',    'Bands': RAD_BANDS},
+    {'Key': 'soil', 'Name': 'Soil',          'FileTag': 'Soil',         'Bands': SOIL_BANDS},
+    {'Key': 'ropr', 'Name': 'Runoff+Precip', 'FileTag': 'RunoffPrecip', 'Bands': ROPR_BANDS},
+]
+
+lat_initial = np.linspace(90, -90, GRID_HEIGHT)
+lon_initial = np.linspace(-180, 180, GRID_WIDTH)
+new_lat = np.arange(89.95, -90.0, -0.1)
+new_lon = np.arange(-179.95, 180.0, 0.1)
+
+# 读取路径中同时存在的全尺寸副本数：两块半球直接读入同一个预分配缓冲区
+# （'full' 读取策略按段读取，临时数据不超过 2 x era5l_read_plan.FULL_READ_MAX_BYTES，不按全尺寸计）
+READ_PATH_COPIES = 1
+# 并行写出 (PARALLEL_WRITERS) 时当日波段复制到一块共享内存，各写出进程直接映射，不再经 pickle 复制
+WRITER_SHARED_COPIES = 1
+
+
+def build_options(**overrides):
+    """
+    汇总模块级可配置项为字典，便于一次性传递给工作进程
+
+    Args:
+        overrides: 覆盖默认值的配置项（键名为小写的配置项名称）
+
+    Returns:
+        配置字典
+    """
+    opts = {
+        'apply_evap_swap': APPLY_EVAP_SWAP,
+        'parallel_days': PARALLEL_DAYS,
+        'memory_budget_gb': MEMORY_BUDGET_GB,
+        'prefetch_depth': PREFETCH_DEPTH,
+        'prefetch_memory_gb': PREFETCH_MEMORY_GB,
+        'parallel_writers': PARALLEL_WRITERS,
+        'stream_strip_rows': STREAM_STRIP_ROWS,
+        'read_strategy': READ_STRATEGY,
+        'gdal_num_threads': GDAL_NUM_THREADS,
+        'region_bbox': REGION_BBOX,
+        'coarsen_factor': COARSEN_FACTOR,
+        'dask_lazy': DASK_LAZY,
+        'dask_chunk_rows': DASK_CHUNK_ROWS,
+        'dask_scheduler': DASK_SCHEDULER,
+        'category_encoding': dict(CATEGORY_ENCODING),
+        'pack_int16': PACK_INT16,
+        'nc_writer': NC_WRITER,
+        'output_backend': OUTPUT_BACKEND,
+        'cube_period': CUBE_PERIOD,
+        'manifest_path': MANIFEST_PATH,
+        'journal_path': JOURNAL_PATH,
+        'incremental_append': INCREMENTAL_APPEND,
+        'claim_dir': CLAIM_DIR,
+        'claim_lease_s': CLAIM_LEASE_S,
+        'aggregate_periods': tuple(AGGREGATE_PERIODS),
+        'aggregate_checkpoint_days': AGGREGATE_CHECKPOINT_DAYS,
+        'ref_index': REF_INDEX,
+        'land_gather': LAND_GATHER,
+        'land_mask_path': LAND_MASK_PATH,
+        'input_index_cache': INPUT_INDEX_CACHE,
+        'metrics_path': METRICS_PATH,
+        'prometheus_textfile': PROMETHEUS_TEXTFILE,
+        'profile_mode': PROFILE_MODE,
+        'profile_day': PROFILE_DAY,
+        'qc_report_path': QC_REPORT_PATH,
+        'qc_limits': dict(QC_LIMITS),
+        'qc_fail_fast': QC_FAIL_FAST,
+    }
+    unknown = set(overrides) - set(opts)
+    if unknown:
+        raise ValueError(f'未知配置项: {sorted(unknown)}')
+    opts.update(overrides)
+    bad = {k: v for k, v in opts['category_encoding'].items() if v not in ENCODING_PROFILES}
+    if bad:
+        raise ValueError(f'未知压缩方案: {bad}，可选 {sorted(ENCODING_PROFILES)}')
+    if opts['output_backend'] not in ('netcdf', 'zarr', 'cube'):
+        raise ValueError(f"未知输出后端: {opts['output_backend']}，可选 'netcdf' / 'zarr' / 'cube'")
+    if opts['output_backend'] != 'netcdf' and opts['stream_strip_rows']:
+        raise ValueError(f"{opts['output_backend']} 后端按日写入整幅切片，不能与条带流式模式 (STREAM_STRIP_ROWS) 同时使用")
+    if opts['output_backend'] == 'cube':
+        if opts['cube_period'] not in era5l_cube.CUBE_PERIODS:
+            raise ValueError(f"未知 cube 周期: {opts['cube_period']}，可选 {era5l_cube.CUBE_PERIODS}")
+        if opts['parallel_days'] > 1:
+            raise ValueError('cube 后端多日写入同一文件，HDF5 不支持多进程并发写，请将 PARALLEL_DAYS 设为 1')
+    if opts['pack_int16'] and opts['output_backend'] != 'netcdf':
+        raise ValueError(f"int16 打包 (PACK_INT16) 仅用于 netcdf 后端，{opts['output_backend']} 后端按 float32 写出")
+    if opts['journal_path'] and opts['output_backend'] != 'netcdf':
+        raise ValueError(f"{opts['output_backend']} 后端在存储内部按日记录完成状态，运行日志 (JOURNAL_PATH) 仅用于 netcdf 后端")
+    if opts['manifest_path'] and opts['output_backend'] != 'netcdf':
+        raise ValueError(f"{opts['output_backend']} 后端在存储内部记录完成状态，完成清单 (MANIFEST_PATH) 仅用于 netcdf 后端")
+    if opts['incremental_append']:
+        if opts['output_backend'] == 'cube' or opts['stream_strip_rows'] or opts['dask_lazy']:
+            raise ValueError('增量追加仅用于 netcdf / zarr 后端的整幅读取路径，不能与 cube 后端、条带流式或 dask 惰性模式同时使用')
+    if opts['claim_dir']:
+        if opts['output_backend'] != 'netcdf':
+            raise ValueError(f"{opts['output_backend']} 后端写入共享存储，分布式认领 (CLAIM_DIR) 仅用于 netcdf 后端")
+        if opts['parallel_days'] > 1 or opts['prefetch_depth'] > 0:
+            raise ValueError('分布式认领模式下每个工作进程逐日认领处理，请将 PARALLEL_DAYS 设为 1、PREFETCH_DEPTH 设为 0'
+                             '（同一主机上可启动多个工作进程）')
+        if opts['aggregate_periods']:
+            raise ValueError('流式聚合需要单个进程处理完整周期，不能与分布式认领 (CLAIM_DIR) 同时使用')
+        if opts['journal_path'] or opts['manifest_path']:
+            raise ValueError('运行日志 (JOURNAL_PATH) 与完成清单 (MANIFEST_PATH) 按单个运行回放与更新，'
+                             '多个工作进程同时运行时会互相清理或覆盖，不能与分布式认领 (CLAIM_DIR) 同时使用')
+        if opts['claim_lease_s'] <= 0:
+            raise ValueError(f"租约须为正数: {opts['claim_lease_s']}")
+    if opts['aggregate_periods']:
+        bad = set(opts['aggregate_periods']) - set(era5l_aggregate.AGGREGATE_PERIODS)
+        if bad:
+            raise ValueError(f'未知聚合周期: {sorted(bad)}，可选 {era5l_aggregate.AGGREGATE_PERIODS}')
+        if opts['output_backend'] != 'netcdf':
+            raise ValueError("流式聚合 (AGGREGATE_PERIODS) 需从逐日 NetCDF 补读未累加的日期，仅用于 netcdf 后端")
+        if opts['aggregate_checkpoint_days'] < 1:
+            raise ValueError(f"检查点间隔须为正整数: {opts['aggregate_checkpoint_days']}")
+    if opts['ref_index']:
+        if opts['output_backend'] != 'netcdf':
+            raise ValueError(f"{opts['output_backend']} 后端本身即为带 time 维的存储，引用索引 (REF_INDEX) 仅用于 netcdf 后端")
+        era5l_refindex.require_kerchunk()
+    if opts['land_gather']:
+        if opts['output_backend'] != 'netcdf' or opts['stream_strip_rows'] or opts['dask_lazy']:
+            raise ValueError('陆地格点存储 (LAND_GATHER) 仅用于 netcdf 后端的整幅读取路径，不能与条带流式或 dask 惰性模式同时使用')
+        if opts['incremental_append'] or opts['aggregate_periods'] or opts['ref_index']:
+            raise ValueError('陆地格点存储的日文件为一维陆地向量，不能与增量追加、流式聚合或引用索引同时使用')
+    if opts['nc_writer'] not in ('xarray', 'direct'):
+        raise ValueError(f"未知写出方式: {opts['nc_writer']}，可选 'xarray' / 'direct'")
+    if opts['read_strategy'] not in era5l_read_plan.READ_STRATEGIES:
+        raise ValueError(f"未知读取策略: {opts['read_strategy']}，可选 {era5l_read_plan.READ_STRATEGIES}")
+    if opts['dask_lazy']:
+        if opts['output_backend'] != 'netcdf' or opts['stream_strip_rows']:
+            raise ValueError('dask 惰性模式仅用于 netcdf 后端，且不能与条带流式模式 (STREAM_STRIP_ROWS) 同时使用')
+        if opts['dask_scheduler'] not in era5l_dask.DASK_SCHEDULERS:
+            raise ValueError(f"未知 dask 调度器: {opts['dask_scheduler']}，可选 {era5l_dask.DASK_SCHEDULERS}")
+        if opts['nc_writer'] == 'direct':
+            raise ValueError("dask 惰性模式由 xarray 写出计算图，不能与直接写出 (NC_WRITER='direct') 同时使用")
+    if opts['region_bbox'] is not None or opts['coarsen_factor'] != 1:
+        if opts['output_backend'] != 'netcdf' or opts['stream_strip_rows'] or opts['dask_lazy']:
+            raise ValueError('区域子集/粗化仅用于 netcdf 后端的整幅读取路径，不能与条带流式或 dask 惰性模式同时使用')
+        if not isinstance(opts['coarsen_factor'], int) or opts['coarsen_factor'] < 1:
+            raise ValueError(f"粗化倍数须为正整数: {opts['coarsen_factor']}")
+    if opts['profile_mode'] not in (None, 'cprofile', 'tracemalloc'):
+        raise ValueError(f"未知剖析方式: {opts['profile_mode']}，可选 None / 'cprofile' / 'tracemalloc'")
+    if opts['qc_report_path']:
+        if opts['stream_strip_rows'] or opts['dask_lazy']:
+            raise ValueError('数据质量检查 (QC_REPORT_PATH) 检查内存中的整幅波段，不能与条带流式或 dask 惰性模式同时使用')
+        bad = set(opts['qc_limits']) - set(era5l_qc.LIMIT_KEYS)
+        if bad:
+            raise ValueError(f'未知 QC 阈值: {sorted(bad)}，可选 {era5l_qc.LIMIT_KEYS}')
+        opts['qc_limits'] = dict(QC_LIMITS, **opts['qc_limits'])
+        if not isinstance(opts['qc_fail_fast'], int) or opts['qc_fail_fast'] < 0:
+            raise ValueError(f"QC fail-fast 天数须为非负整数: {opts['qc_fail_fast']}")
+    return opts
+
+
+def make_global_attrs():
+    return {
+        'title': 'ERA5-Land daily data from 1950 to present',
+        'long_title': 'hourly-daily sum/24',
+        'Conventions': 'CF-1.6',
+        'Conventions_help': 'http://cfconventions.org/Data/cf-standard-names/docs/guidelines.html',
+        'CreationDate': dt.datetime.now().strftime('%d-%b-%Y %H:%M:%S'),
+        'CreatedBy': 'Changming Li & Assistant - Python 扩展版',
+        'Download_source': 'https://cds.climate.copernicus.eu/cdsapp#!/dataset/reanalysis-era5-land?tab=overview',
+        'contact_info': 'licm@scut.edu.cn'
+    }
+
+
+def default_out_dirs(base_output_dir):
+    """基础输出目录下各类别的输出根目录 {Key: 目录}（与交互式流程一致）"""
+    return {
+        'evap': os.path.join(base_output_dir, 'Evaporation_Flux', 'ERA5L'),
+        'veg':  os.path.join(base_output_dir, 'Vegetation'),
+        'rad':  os.path.join(base_output_dir, 'Radiation'),
+        'soil': os.path.join(base_output_dir, 'SoilMoisture'),
+        'ropr': os.path.join(base_output_dir, 'Precipitation_Runoff'),
+    }
+
+
+def out_path_for(out_dirs, spec, d):
+    """某类别某日的输出文件路径（按 yyyy/mm 子目录存储）"""
+    return os.path.join(out_dirs[spec['Key']], str(d.year), f'{d.month:02d}',
+                        f"ERA5_Land_Daily_{spec['FileTag']}_{d:%Y%m%d}.nc")
+
+
+def estimate_day_bytes(n_bands, rows=GRID_HEIGHT, cols=GRID_WIDTH, copies=READ_PATH_COPIES):
+    """
+    估算单日处理的峰值内存占用（字节）
+
+    以 float32 全球网格计：n_bands x 1800 x 3600 x 4 字节，再乘以同时存在的副本数 (day_copies)；
+    条带流式模式下 rows 为条带高度，区域模式下 rows/cols 为区域读取范围
+    """
+    return n_bands * rows * cols * 4 * copies
+
+
+def day_copies(opts):
+    """单日处理中同时存在的全尺寸副本数：读取缓冲区，并行写出时另加共享内存中的一份"""
+    shared = (opts['parallel_writers'] and opts['output_backend'] == 'netcdf' and opts['parallel_days'] <= 1
+              and not opts['stream_strip_rows'] and not opts['dask_lazy'])
+    return READ_PATH_COPIES + (WRITER_SHARED_COPIES if shared else 0)
+
+
+def read_shape(ctx):
+    """单日读入缓冲区的 (行, 列)：全球网格或区域范围（粗化前）"""
+    grid = ctx.get('grid')
+    if grid is None:
+        return GRID_HEIGHT, GRID_WIDTH
+    return grid['rows'][1] - grid['rows'][0], grid['cols'][1] - grid['cols'][0]
+
+
+def output_shape(ctx):
+    """输出变量的 (lat, lon) 形状"""
+    grid = ctx.get('grid')
+    return (GRID_HEIGHT, GRID_WIDTH) if grid is None else grid['shape']
+
+
+def plan_day(d, out_dirs, selected, opts, done=None, present=None):
+    """
+    规划单日任务：结合用户选择与已完成情况判断各类别是否需要写出，并汇总所需波段索引
+
+    Args:
+        d: 日期 (datetime)
+        out_dirs: 各类别输出根目录 {Key: 目录}
+        selected: 各类别已选变量 {Key: 波段列表}，未选类别为空列表
+        opts: build_options() 的返回值
+        done: 各类别已完成日期 {Key: set(日期)}（规划前一次性载入）；为 None 时逐个检查输出文件是否存在
+        present: 增量追加模式下 Zarr 存储中各日已写入的变量 {Key: {日期: set(变量名)}}；
+                 为 None 时检查已存在的 NetCDF 文件中的变量
+
+    Returns:
+        dict: date / out_paths / need / bands（各类别本次写出的变量）/
+              append（追加写入的类别 {Key: 文件中已有变量名}）/ needed_indices / est_bytes
+    """
+    if opts['output_backend'] == 'zarr':
+        out_paths = {spec['Key']: era5l_zarr.store_path(out_dirs[spec['Key']], spec['FileTag'])
+                     for spec in CATEGORY_SPECS}
+    elif opts['output_backend'] == 'cube':
+        out_paths = {spec['Key']: era5l_cube.cube_path(out_dirs[spec['Key']], spec['FileTag'], d, opts['cube_period'])
+                     for spec in CATEGORY_SPECS}
+    else:
+        out_paths = {spec['Key']: out_path_for(out_dirs, spec, d) for spec in CATEGORY_SPECS}
+    if done is None:
+        need = {key: bool(selected[key]) and not os.path.isfile(out_paths[key]) for key in out_paths}
+    else:
+        need = {key: bool(selected[key]) and d not in done.get(key, ()) for key in out_paths}
+    bands = {key: list(selected[key]) if need[key] else [] for key in out_paths}
+
+    # 增量追加：已有输出只补写缺少的变量
+    append = {}
+    if opts['incremental_append']:
+        for key in out_paths:
+            if not selected[key] or (done is not None and d in done.get(key, ())):
+                continue
+            if present is not None:
+                have = present.get(key, {}).get(d, set())
+            elif os.path.isfile(out_paths[key]):
+                have = existing_variables(out_paths[key])
+                append[key] = sorted(have)
+            else:
+                continue
+            bands[key] = [b for b in selected[key] if b['VarName'] not in have]
+            need[key] = bool(bands[key])
+            if not need[key]:
+                append.pop(key, None)
+
+    # 依据“需要”的类别汇总所需波段索引（含 Es/Ew/Et 交换的来源波段），避免不必要读取
+    needed_indices = sorted({src for key in out_paths if need[key]
+                             for _b, src in output_sources(key, bands[key], opts['apply_evap_swap'])})
+
+    return {
+        'date': d,
+        'out_paths': out_paths,
+        'need': need,
+        'bands': bands,
+        'append': append,
+        'needed_indices': needed_indices,
+        'est_bytes': estimate_day_bytes(len(needed_indices), opts['stream_strip_rows'] or GRID_HEIGHT,
+                                        copies=day_copies(opts)),
+    }
+
+
+def find_day_tifs(base_input_dir, d):
+    in_dir = os.path.join(base_input_dir, str(d.year), f'{d.month:02d}')
+    return sorted(glob.glob(os.path.join(in_dir, f'ERA5_LAND_DAILY_{d:%Y%m%d}*.tif')))
+
+
+def day_tif_list(plan, ctx):
+    """当日 tif 列表：优先使用运行开始时建立的输入索引，否则按日 glob"""
+    if 'tif_list' in plan:
+        return plan['tif_list']
+    return find_day_tifs(ctx['base_input_dir'], plan['date'])
+
+
+def read_tif_bands(tif_path, band_indices, out=None, strategy='auto', num_threads='ALL_CPUS'):
+    """
+    读取指定TIF文件的所需波段
+
+    Args:
+        tif_path: TIF文件路径
+        band_indices: 需要读取的波段索引列表
+        out: 可选的预分配 float32 数组（可为更大数组的视图），读取结果直接写入其中
+        strategy: 读取策略（见 era5l_read_plan），'auto' 按文件布局选择
+        num_threads: GDAL 解压线程数
+
+    Returns:
+        读取到的波段数据 (n_bands, height, width)
+    """
+    return era5l_read_plan.read_bands(tif_path, band_indices, out=out, strategy=strategy,
+                                      num_threads=num_threads, label=os.path.basename(tif_path))
+
+
+def read_day_bands(tif_list, needed_indices, evap_index_set, grid=None, strategy='auto', num_threads='ALL_CPUS'):
+    """
+    并行读取两块半球 tif 直接写入预分配的全球数组，同时完成蒸发变量的 *-1000 缩放
+
+    仅分配一个 float32 (n_bands, 1800, 3600) 缓冲区，两块半球分别读入其左右两半的视图，
+    不再产生各半球数组、concatenate 与 astype 的中间副本。
+    grid 为区域网格（era5l_region.make_grid）时只读取与区域相交的窗口，并按需粗化。
+    strategy / num_threads 为读取计划与 GDAL 解压线程数（见 era5l_read_plan）。
+
+    Returns:
+        (full_bands, idx_to_position)
+    """
+    if grid is not None:
+        return read_region_bands(tif_list, needed_indices, evap_index_set, grid, strategy, num_threads)
+    full_bands = np.empty((len(needed_indices), GRID_HEIGHT, GRID_WIDTH), dtype=np.float32)
+    half = GRID_WIDTH // 2
+
+    # 使用 ThreadPoolExecutor 并行读取两个TIF文件，各自写入缓冲区的一半
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_s1 = executor.submit(read_tif_bands, tif_list[0], needed_indices, full_bands[:, :, :half],
+                                    strategy, num_threads)
+        future_s2 = executor.submit(read_tif_bands, tif_list[1], needed_indices, full_bands[:, :, half:],
+                                    strategy, num_threads)
+        future_s1.result()
+        future_s2.result()
+
+    # 向量化处理蒸发数据的缩放 - 性能优化
+    evap_positions = [i for i, idx in enumerate(needed_indices) if idx in evap_index_set]
+    if evap_positions:
+        full_bands[evap_positions] *= -1000.0
+
+    # 构建索引映射
+    idx_to_position = {idx: i for i, idx in enumerate(needed_indices)}
+    return full_bands, idx_to_position
+
+
+def read_region_bands(tif_list, needed_indices, evap_index_set, grid, strategy='auto', num_threads='ALL_CPUS'):
+    """区域模式读取：各相交 tif 的窗口并行读入区域缓冲区的对应列，缩放后按 grid['factor'] 粗化"""
+    (r0, r1), (c0, c1) = grid['rows'], grid['cols']
+    region = np.empty((len(needed_indices), r1 - r0, c1 - c0), dtype=np.float32)
+
+    def read_window(tile, window, col):
+        era5l_read_plan.read_bands(tif_list[tile], needed_indices, out=region[:, :, col:col + window.width],
+                                   window=window, strategy=strategy, num_threads=num_threads,
+                                   label=os.path.basename(tif_list[tile]))
+
+    with ThreadPoolExecutor(max_workers=len(grid['windows'])) as executor:
+        for fut in [executor.submit(read_window, *w) for w in grid['windows']]:
+            fut.result()
+
+    evap_positions = [i for i, idx in enumerate(needed_indices) if idx in evap_index_set]
+    if evap_positions:
+        region[evap_positions] *= -1000.0
+    if grid['factor'] > 1:
+        names = {b['Index']: b['VarName'] for spec in CATEGORY_SPECS for b in spec['Bands']}
+        region = era5l_region.coarsen(region, [era5l_region.reducer_for(names[idx]) for idx in needed_indices],
+                                      grid['factor'])
+    return region, {idx: i for i, idx in enumerate(needed_indices)}
+
+
+def build_dataset(full_bands, idx_to_position, band_list, grid=None):
+    data_vars = {}
+    for b in band_list:
+        data_vars[b['VarName']] = xr.DataArray(
+            full_bands[idx_to_position[b['Index']]], dims=['lat','lon'], name=b['VarName'],
+            attrs={'long_name': b['LongName'], 'units': b['Units']}
+        )
+    lat, lon = (lat_initial, lon_initial) if grid is None else (grid['lat'], grid['lon'])
+    ds = xr.Dataset(data_vars,
+                    coords={'lat': ('lat', lat), 'lon': ('lon', lon)},
+                    attrs={'Conventions':'CF-1.6'})
+    ds['lat'].attrs = {'units':'degrees_north', 'long_name':'latitude'}
+    ds['lon'].attrs = {'units':'degrees_east',  'long_name':'longitude'}
+    return ds
+
+
+def finalize(ds, global_attrs, grid=None):
+    if grid is None:
+        ds = ds.assign_coords(lat=('lat', new_lat), lon=('lon', new_lon))
+    ds.attrs.update(global_attrs)
+    ds.attrs['ProcessingStatus'] = f'Finalized on {dt.datetime.now():%Y-%m-%d %H:%M:%S}'
+    return ds
+
+
+def encoding_for(profile, data_vars):
+    """
+    某压缩方案下各数据变量的编码设置 {变量名: 设置}
+
+    整数变量（int16 打包变量、聚合的有效天数）不做有损量化；打包变量使用其缺测值。
+    """
+    enc = {}
+    for v in data_vars:
+        settings = dict(ENCODING_PROFILES[profile])
+        if np.issubdtype(data_vars[v].dtype, np.integer):
+            settings.pop('significant_digits', None)
+            settings.pop('quantize_mode', None)
+        if era5l_packing.is_packed(data_vars[v]):
+            settings['_FillValue'] = data_vars[v].encoding['_FillValue']
+        enc[v] = settings
+    return enc
+
+
+def save_nc(ds, path, profile='default', compute=True):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    enc = encoding_for(profile, ds.data_vars)
+    shape = (ds.sizes['lat'], ds.sizes['lon'])
+    land = ds.sizes.get(era5l_land.LAND_DIM)
+    for settings in enc.values():
+        if 'chunksizes' in settings:  # 区域输出可能小于方案中的块大小；陆地向量按相同格点数分块
+            settings['chunksizes'] = (era5l_land.chunk_length(settings['chunksizes'], land) if land
+                                      else tuple(min(c, n) for c, n in zip(settings['chunksizes'], shape)))
+    if land:
+        enc[era5l_land.LAND_DIM] = era5l_land.index_encoding(ENCODING_PROFILES[profile], land)
+    return ds.to_netcdf(path, encoding=enc, compute=compute)
+
+
+def load_day(plan, ctx):
+    """
+    读取阶段：定位当日两块 tif 并读取所需波段
+
+    Returns:
+        (full_bands, idx_to_position)；未找到两块 tif 时返回 None
+    """
+    d = plan['date']
+    tif_list = day_tif_list(plan, ctx)
+    if len(tif_list) != 2:
+        print(f'  [{d:%Y-%m-%d}] 未找到2块tif（找到{len(tif_list)}），跳过。')
+        return None
+    evap_index_set = {b['Index'] for b in EVAP_BANDS}  # 交换来源可能是未选中的蒸发波段
+    opts = ctx['opts']
+    return read_day_bands(tif_list, plan['needed_indices'], evap_index_set, ctx.get('grid'),
+                          opts['read_strategy'], opts['gdal_num_threads'])
+
+
+@contextmanager
+def atomic_output(path):
+    """
+    原子写出：with 块内写入同目录的临时文件，正常结束后重命名为 path，异常时删除临时文件
+
+    正式路径上只会出现完整的文件，中断的写出不会被下次运行的存在性检查当作已完成。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = era5l_journal.temp_path(path)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def timed_save_nc(ds, path, profile='default'):
+    """原子写出 NetCDF 并返回写出耗时（秒）；位于模块顶层以便在写出进程中执行"""
+    t = time.time()
+    with atomic_output(path) as tmp:
+        save_nc(ds, tmp, profile)
+    return time.time() - t
+
+
+# 追加写入中的变量带有此属性，写完后删除；中断后该变量视为缺少，下次运行覆盖写入
+APPEND_PENDING_ATTR = 'append_status'
+
+
+def existing_variables(path):
+    """已有 NetCDF 文件中已完整写入的数据变量名（只读取文件头）"""
+    with netCDF4.Dataset(path) as nc:
+        return {name for name, var in nc.variables.items()
+                if name not in nc.dimensions and APPEND_PENDING_ATTR not in var.ncattrs()}
+
+
+def append_nc(ds, path, profile='default'):
+    """
+    将 ds 的数据变量追加写入已有的 NetCDF 文件，不改动文件中已有的变量
+
+    变量属性、缺测值与压缩设置与 save_nc 写出的一致；上次中断留下的未完成变量直接覆盖写入。
+    """
+    enc = encoding_for(profile, ds.data_vars)
+    with netCDF4.Dataset(path, 'a') as nc:
+        shape = (nc.dimensions['lat'].size, nc.dimensions['lon'].size)
+        if shape != (ds.sizes['lat'], ds.sizes['lon']):
+            raise ValueError(f"{path} 的网格 {shape} 与本次输出 {(ds.sizes['lat'], ds.sizes['lon'])} 不一致，无法追加")
+        for name, da in ds.data_vars.items():
+            if name in nc.variables:
+                var = nc.variables[name]  # 未完成的追加（existing_variables 不计入）
+            else:
+                settings = enc[name]
+                fill = settings.pop('_FillValue', np.float32(np.nan))
+                if 'chunksizes' in settings:
+                    settings['chunksizes'] = tuple(min(c, n) for c, n in zip(settings['chunksizes'], shape))
+                var = nc.createVariable(name, da.dtype, ('lat', 'lon'), fill_value=fill, **settings)
+            var.set_auto_maskandscale(False)  # 打包变量已是 int16，不再按 scale_factor 换算
+            var.setncatts(dict(da.attrs, **{APPEND_PENDING_ATTR: 'incomplete'}))
+            var[:] = da.values
+            nc.sync()
+            var.delncattr(APPEND_PENDING_ATTR)
+        history = f"{dt.datetime.now():%Y-%m-%d %H:%M:%S}: appended {', '.join(ds.data_vars)}"
+        if 'history' in nc.ncattrs():
+            history = nc.getncattr('history') + '\n' + history
+        nc.setncattr('history', history)
+
+
+def timed_append_nc(ds, path, profile='default'):
+    """追加写入 NetCDF 并返回耗时（秒）；位于模块顶层以便在写出进程中执行"""
+    t = time.time()
+    append_nc(ds, path, profile)
+    return time.time() - t
+
+
+# 每个输出设备一个单进程写出池：同一设备上的类别排队依次写出，不同设备之间并行
+_writer_pools = {}
+
+
+def get_writer_pool(root):
+    """
+    获取输出根目录所在设备的写出进程池
+
+    按 st_dev 区分物理卷，指向同一卷的多个根目录共用一个队列，避免同盘并发写造成的磁头争用。
+    压缩与写出在独立进程中完成，不受 HDF5/netCDF4 全局锁限制。
+    """
+    os.makedirs(root, exist_ok=True)
+    dev = os.stat(root).st_dev
+    if dev not in _writer_pools:
+        _writer_pools[dev] = ProcessPoolExecutor(max_workers=1)
+    return _writer_pools[dev]
+
+
+def shutdown_writer_pools():
+    for pool in _writer_pools.values():
+        pool.shutdown(wait=True)
+    _writer_pools.clear()
+
+
+def category_positions(key, idx_to_position, ctx, band_list=None):
+    """
+    类别内各变量在 full_bands 中的位置 {波段索引: 位置}
+
+    APPLY_EVAP_SWAP 的 Es/Ew/Et 交换仅体现为索引重映射，不复制数据。
+    band_list 为本次写出的变量（增量追加时为缺少的变量），默认为该类别全部已选变量。
+    """
+    band_list = ctx['selected'][key] if band_list is None else band_list
+    sources = output_sources(key, band_list, ctx['opts']['apply_evap_swap'])
+    return {b['Index']: idx_to_position[src] for b, src in sources}
+
+
+def build_category_dataset(key, full_bands, idx_to_position, ctx, band_list=None):
+    band_list = ctx['selected'][key] if band_list is None else band_list
+    positions = category_positions(key, idx_to_position, ctx, band_list)
+    grid = ctx.get('grid')
+    ds = finalize(build_dataset(full_bands, positions, band_list, grid), ctx['global_attrs'], grid)
+    if ctx.get('land_index') is not None:  # 先抽取陆地向量，打包只处理陆地格点
+        ds, lost = era5l_land.gather_dataset(ds, ctx['land_index'])
+        era5l_land.report_lost(lost, key)
+    if ctx['opts']['pack_int16']:
+        ds = era5l_packing.pack_dataset(ds, PACK_SPECS)
+    return ds
+
+
+def make_category_template(ctx, key):
+    """某类别逐日文件的写出模板（era5l_nc_template），与 build_category_dataset + save_nc 的输出结构一致"""
+    grid = ctx.get('grid')
+    lat, lon = (new_lat, new_lon) if grid is None else (grid['lat'], grid['lon'])
+    packing = era5l_packing.pack_index([b['VarName'] for b in ctx['selected'][key]],
+                                       PACK_SPECS if ctx['opts']['pack_int16'] else {})
+    # 全球网格的坐标在 finalize() 中经 assign_coords 替换；区域网格保留 build_dataset 中的坐标
+    return era5l_nc_template.make_template(ctx['selected'][key], lat, lon, ctx['global_attrs'],
+                                           ENCODING_PROFILES[ctx['opts']['category_encoding'][key]],
+                                           packing, replaced_coords=grid is None, land=ctx.get('land_index'))
+
+
+def category_template(ctx, key):
+    """运行开始时预先计算的类别模板；ctx 中没有时（如基准测试）当场计算"""
+    templates = ctx.get('nc_templates') or {}
+    return templates[key] if key in templates else make_category_template(ctx, key)
+
+
+def category_arrays(key, full_bands, idx_to_position, ctx):
+    """类别各变量在 full_bands 中的切片 {变量名: (lat, lon) 视图}（不复制数据）"""
+    positions = category_positions(key, idx_to_position, ctx)
+    return {b['VarName']: full_bands[positions[b['Index']]] for b in ctx['selected'][key]}
+
+
+def timed_write_template(template, path, arrays):
+    """按模板原子写出 NetCDF 并返回写出耗时（秒）；位于模块顶层以便在写出进程中执行"""
+    t = time.time()
+    with atomic_output(path) as tmp:
+        era5l_nc_template.write(template, tmp, arrays)
+    return time.time() - t
+
+
+def category_writer(plan, ctx, key, full_bands, idx_to_position):
+    """
+    某类别的写出任务 (函数, 参数)：追加写入、按模板直接写出或经 xarray 写出；函数返回写出耗时（秒）
+    """
+    path, profile = plan['out_paths'][key], ctx['opts']['category_encoding'][key]
+    if key in plan['append']:
+        ds = build_category_dataset(key, full_bands, idx_to_position, ctx, plan['bands'][key])
+        return timed_append_nc, (ds, path, profile)
+    if ctx['opts']['nc_writer'] == 'direct':
+        return timed_write_template, (category_template(ctx, key), path,
+                                      category_arrays(key, full_bands, idx_to_position, ctx))
+    return timed_save_nc, (build_category_dataset(key, full_bands, idx_to_position, ctx, plan['bands'][key]),
+                           path, profile)
+
+
+def begin_output(plan, ctx, key):
+    """在运行日志中记录一个类别文件开始写出（未启用日志时不做任何事）"""
+    if ctx['opts']['journal_path']:
+        era5l_journal.record(ctx['opts']['journal_path'], 'start', plan['date'], key, plan['out_paths'][key])
+
+
+def record_output(plan, ctx, key):
+    """在运行日志、完成清单与引用索引片段中登记一个已完整写出的类别文件（均未启用时不做任何事）"""
+    if ctx['opts']['journal_path']:
+        era5l_journal.record(ctx['opts']['journal_path'], 'done', plan['date'], key, plan['out_paths'][key])
+    manifest_path = ctx['opts']['manifest_path']
+    if manifest_path:
+        era5l_manifest.record(manifest_path, [{
+            'path': plan['out_paths'][key], 'date': plan['date'], 'category': key,
+            'variables': plan['append'].get(key, []) + [b['VarName'] for b in plan['bands'][key]],
+            'encoding': ctx['opts']['category_encoding'][key],
+        }])
+    if ctx['opts']['ref_index']:
+        spec = next(spec for spec in CATEGORY_SPECS if spec['Key'] == key)
+        try:
+            era5l_refindex.write_fragment(plan['out_paths'][key], ctx['out_dirs'][key], spec['FileTag'], plan['date'])
+        except Exception as e:  # 输出本身已完整写出，片段可之后用 ref-index 子命令补建
+            print(f"  [WARN] {spec['Name']} 引用片段生成失败: {e}")
+
+
+def write_label(plan, spec):
+    """写出日志中的动作描述：新建文件或向已有文件追加若干变量"""
+    key = spec['Key']
+    if key in plan['append']:
+        return f"追加 {spec['Name']} ({len(plan['bands'][key])} 个变量)"
+    return f"写出 {spec['Name']}"
+
+
+def note_category(plan, ctx, key, build_s, write_s, bytes_written):
+    """记录一个类别的构建/写出指标"""
+    rows, cols = output_shape(ctx)
+    points = rows * cols if ctx.get('land_index') is None else len(ctx['land_index'])
+    bytes_raw = len(plan['bands'][key]) * points * 4
+    era5l_metrics.add_category(plan.get('metrics'), key, bytes_raw, build_s, write_s, bytes_written,
+                               ctx['opts']['category_encoding'][key])
+
+
+def write_day(plan, ctx, full_bands, idx_to_position):
+    """构建与写出阶段：仅对需要的类别构建 Dataset 并写出 NetCDF，打印各类别写出耗时"""
+    if ctx['opts']['output_backend'] == 'zarr':
+        return write_day_zarr(plan, ctx, full_bands, idx_to_position)
+    if ctx['opts']['output_backend'] == 'cube':
+        return write_day_cube(plan, ctx, full_bands, idx_to_position)
+    if ctx['opts']['parallel_writers']:
+        return write_day_parallel(plan, ctx, full_bands, idx_to_position)
+
+    for spec in CATEGORY_SPECS:
+        key = spec['Key']
+        if not plan['need'][key]:
+            print(f"  {spec['Name']} 已存在，跳过写出。")
+            continue
+        t = time.time()
+        writer, args = category_writer(plan, ctx, key, full_bands, idx_to_position)
+        build_time = time.time() - t
+        path = plan['out_paths'][key]
+        size_before = os.path.getsize(path) if key in plan['append'] else 0
+        begin_output(plan, ctx, key)
+        write_time = writer(*args)
+        record_output(plan, ctx, key)
+        note_category(plan, ctx, key, build_time, write_time, os.path.getsize(path) - size_before)
+        print(f"  {write_label(plan, spec)} 完成，耗时: {write_time:.2f}秒")
+        del args; gc.collect()  # 及时释放内存
+
+
+def write_day_zarr(plan, ctx, full_bands, idx_to_position):
+    """Zarr 后端：将需要的类别写入各自存储中当日的 time 切片（无需构建 xarray 对象）"""
+    for spec in CATEGORY_SPECS:
+        key = spec['Key']
+        if not plan['need'][key]:
+            print(f"  {spec['Name']} 已存在，跳过写出。")
+            continue
+        t = time.time()
+        positions = category_positions(key, idx_to_position, ctx, plan['bands'][key])
+        arrays = {b['VarName']: full_bands[positions[b['Index']]] for b in plan['bands'][key]}
+        era5l_zarr.write_day(plan['out_paths'][key], plan['date'], arrays)
+        note_category(plan, ctx, key, 0.0, time.time() - t, None)  # 存储为目录，不统计写出字节
+        print(f"  写出 {spec['Name']} (Zarr) 完成，耗时: {time.time() - t:.2f}秒")
+
+
+def write_day_cube(plan, ctx, full_bands, idx_to_position):
+    """cube 后端：将需要的类别写入各自月/年文件中当日的 time 切片"""
+    opts = ctx['opts']
+    for spec in CATEGORY_SPECS:
+        key = spec['Key']
+        if not plan['need'][key]:
+            print(f"  {spec['Name']} 已存在，跳过写出。")
+            continue
+        t = time.time()
+        path = plan['out_paths'][key]
+        size_before = os.path.getsize(path) if os.path.isfile(path) else 0
+        positions = category_positions(key, idx_to_position, ctx)
+        arrays = {b['VarName']: full_bands[positions[b['Index']]] for b in ctx['selected'][key]}
+        era5l_cube.write_day(plan['out_paths'][key], plan['date'], opts['cube_period'], spec['Bands'],
+                             ctx['selected'][key], arrays, new_lat, new_lon, ctx['global_attrs'],
+                             ENCODING_PROFILES[opts['category_encoding'][key]])
+        note_category(plan, ctx, key, 0.0, time.time() - t, os.path.getsize(path) - size_before)
+        print(f"  写出 {spec['Name']} (cube) 完成，耗时: {time.time() - t:.2f}秒")
+
+
+# 写出进程构建类别输出所需的运行上下文项（不含各日的规划与输出目录）
+WRITER_CTX_KEYS = ('selected', 'opts', 'global_attrs', 'grid', 'land_index')
+
+
+def write_category_shared(shm_name, shape, idx_to_position, plan, ctx, key):
+    """
+    写出进程中执行：映射主进程的共享内存波段缓冲区，构建并写出一个类别，返回写出耗时（秒）
+
+    Dataset / 模板切片均为共享缓冲区的视图，写出进程中不再保存波段数据的副本。
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return _write_category_from(np.ndarray(shape, dtype=np.float32, buffer=shm.buf), idx_to_position,
+                                    plan, ctx, key)
+    finally:
+        try:
+            shm.close()
+        except BufferError:  # 异常回溯仍引用缓冲区视图，映射随其释放
+            pass
+
+
+def _write_category_from(full_bands, idx_to_position, plan, ctx, key):
+    """构建并写出一个类别，返回构建与写出耗时（秒）；波段视图只在本函数内引用"""
+    t = time.time()
+    writer, args = category_writer(plan, ctx, key, full_bands, idx_to_position)
+    writer(*args)
+    return time.time() - t
+
+
+def write_day_parallel(plan, ctx, full_bands, idx_to_position):
+    """
+    并行写出：当日波段复制到一块共享内存，各类别提交到其输出根目录所在设备的写出进程，
+    写出进程映射共享内存后构建 Dataset 或模板切片并写出
+
+    任务只传递共享内存名称、规划与上下文，波段数据不经 pickle 复制；全部类别结束后释放共享内存。
+    等待全部类别结束后再汇报；任一类别失败时抛出第一个异常，交由上层统一清理。
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(full_bands.nbytes, 1))
+    shared = np.ndarray(full_bands.shape, dtype=np.float32, buffer=shm.buf)
+    shared[...] = full_bands
+    del shared
+    futures = {}
+    first_error = None
+    try:
+        for spec in CATEGORY_SPECS:
+            key = spec['Key']
+            if not plan['need'][key]:
+                print(f"  {spec['Name']} 已存在，跳过写出。")
+                continue
+            writer_ctx = {k: ctx.get(k) for k in WRITER_CTX_KEYS}
+            if key in (ctx.get('nc_templates') or {}):
+                writer_ctx['nc_templates'] = {key: ctx['nc_templates'][key]}
+            writer_plan = {k: plan[k] for k in ('date', 'out_paths', 'bands', 'append')}
+            pool = get_writer_pool(ctx['out_dirs'][key])
+            path = plan['out_paths'][key]
+            size_before = os.path.getsize(path) if key in plan['append'] else 0
+            begin_output(plan, ctx, key)
+            fut = pool.submit(write_category_shared, shm.name, full_bands.shape, idx_to_position,
+                              writer_plan, writer_ctx, key)
+            futures[fut] = (spec, time.time(), size_before)
+
+        for fut in as_completed(futures):
+            spec, submit_time, size_before = futures[fut]
+            try:
+                write_time = fut.result()
+            except Exception as e:
+                print(f"  写出 {spec['Name']} 失败。", file=sys.stderr)
+                first_error = first_error or e
+                continue
+            latency = time.time() - submit_time
+            record_output(plan, ctx, spec['Key'])
+            # 构建在写出进程中完成，计入写出耗时
+            note_category(plan, ctx, spec['Key'], 0.0, write_time,
+                          os.path.getsize(plan['out_paths'][spec['Key']]) - size_before)
+            print(f"  {write_label(plan, spec)} 完成，耗时: {write_time:.2f}秒 (含排队 {latency:.2f}秒)")
+    finally:
+        wait(futures)  # 已提交的任务结束后才能删除共享内存
+        shm.close()
+        shm.unlink()
+    gc.collect()
+    if first_error is not None:
+        raise first_error
+
+
+def output_sources(key, band_list, apply_evap_swap):
+    """
+    各输出变量的数据来源波段
+
+    Returns:
+        [(band, 来源波段索引)]；APPLY_EVAP_SWAP 时蒸发类 Es<-Ew, Ew<-Et, Et<-Es，其余变量来源即自身
+    """
+    sources = [(b, b['Index']) for b in band_list]
+    if key == 'evap' and apply_evap_swap:
+        by_name = {b['VarName']: b['Index'] for b in EVAP_BANDS}  # 只选其中部分变量时来源仍在完整变量表中
+        remap = {'Es': by_name['Ew'], 'Ew': by_name['Et'], 'Et': by_name['Es']}
+        sources = [(b, remap.get(b['VarName'], idx)) for b, idx in sources]
+    return sources
+
+
+def create_stream_nc(path, template, strip_rows, profile='default'):
+    """
+    按类别模板预先创建条带流式写出的 NetCDF 文件（变量、属性与 xarray 全量路径的输出一致）
+
+    数据变量按条带高度分块（压缩方案的分块行数能整除条带高度时沿用方案分块），
+    每个条带写入后即构成完整的块，压缩不必等待整幅数据；
+    块缓存只保留一个条带的块，写满即压缩落盘，避免 HDF5 默认缓存累积多个条带。
+    模板中的打包变量创建为 int16，写入前由调用方打包。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    strip_rows = min(strip_rows, GRID_HEIGHT)
+    chunks = ENCODING_PROFILES[profile].get('chunksizes')
+    if not chunks or strip_rows % chunks[0]:
+        chunks = (strip_rows, GRID_WIDTH // 2)
+    n_chunks = -(-GRID_WIDTH // chunks[1]) * (strip_rows // chunks[0])
+    return era5l_nc_template.create(template, path, tuple(chunks), (strip_rows * GRID_WIDTH * 4, n_chunks + 1))
+
+
+def stream_day(plan, ctx, tif_list):
+    """
+    条带流式处理单日：按纬度条带窗口读取两块 tif，逐条带缩放后直接写入预先创建的 NetCDF 变量
+
+    峰值内存取决于 STREAM_STRIP_ROWS 而非全球网格大小；写出数值与全量路径逐位一致。
+    各文件写入同目录的临时文件，关闭后原子重命名；失败时删除临时文件后重新抛出异常。
+
+    Returns:
+        (read_time, write_time)
+    """
+    opts = ctx['opts']
+    strip_rows = int(opts['stream_strip_rows'])
+    needed_indices = plan['needed_indices']
+    evap_index_set = {b['Index'] for b in EVAP_BANDS}
+    evap_positions = [i for i, idx in enumerate(needed_indices) if idx in evap_index_set]
+    idx_to_position = {idx: i for i, idx in enumerate(needed_indices)}
+    read_time = 0.0
+    category_write = {}  # Key -> 写出耗时（含关闭时刷新剩余块）
+    # 各条带复用同一个缓冲区，两块 tif 的窗口直接读入其左右两半
+    strip_buf = np.empty((len(needed_indices), min(strip_rows, GRID_HEIGHT), GRID_WIDTH), dtype=np.float32)
+
+    files = {}  # Key -> (nc, [(变量, 条带中的位置, 打包参数)], 临时文件)
+    try:
+        for spec in CATEGORY_SPECS:
+            key = spec['Key']
+            if not plan['need'][key]:
+                print(f"  {spec['Name']} 已存在，跳过写出。")
+                continue
+            template = category_template(ctx, key)
+            packing = {v['name']: v['pack'] for v in template['variables']}
+            begin_output(plan, ctx, key)
+            tmp = era5l_journal.temp_path(plan['out_paths'][key])
+            nc = create_stream_nc(tmp, template, strip_rows, opts['category_encoding'][key])
+            targets = [(nc.variables[b['VarName']], idx_to_position[src], packing[b['VarName']])
+                       for b, src in output_sources(key, ctx['selected'][key], opts['apply_evap_swap'])]
+            files[key] = (nc, targets, tmp)
+
+        # GDAL 块缓存默认占物理内存的 5%，这里限制为约两个块行（按块高 256 行估计）的解码数据（rasterio 按字节设置）
+        gdal_cache_mb = max(64, len(needed_indices) * 2 * max(strip_rows, 256) * GRID_WIDTH * 4 // 2**20)
+        with rasterio.Env(GDAL_CACHEMAX=gdal_cache_mb * 2**20), \
+                rasterio.open(tif_list[0]) as s1, rasterio.open(tif_list[1]) as s2, \
+                ThreadPoolExecutor(max_workers=2) as executor:
+            for row in range(0, GRID_HEIGHT, strip_rows):
+                height = min(strip_rows, GRID_HEIGHT - row)
+                t = time.time()
+                strip = strip_buf[:, :height]
+                future_s1 = executor.submit(s1.read, needed_indices, window=Window(0, row, s1.width, height),
+                                            out=strip[:, :, :s1.width])
+                future_s2 = executor.submit(s2.read, needed_indices, window=Window(0, row, s2.width, height),
+                                            out=strip[:, :, s1.width:])
+                future_s1.result()
+                future_s2.result()
+                if evap_positions:
+                    strip[evap_positions] *= -1000.0
+                read_time += time.time() - t
+
+                for key, (nc, targets, _tmp) in files.items():
+                    t = time.time()
+                    for var, pos, pack in targets:
+                        var[row:row + height, :] = strip[pos] if pack is None else era5l_packing.pack_band(strip[pos], *pack)
+                    category_write[key] = category_write.get(key, 0.0) + time.time() - t
+
+        for spec in CATEGORY_SPECS:
+            key = spec['Key']
+            if key in files:
+                t = time.time()
+                nc, _targets, tmp = files[key]
+                nc.close()
+                os.replace(tmp, plan['out_paths'][key])
+                del files[key]
+                category_write[key] += time.time() - t
+                record_output(plan, ctx, key)
+                note_category(plan, ctx, key, 0.0, category_write[key], os.path.getsize(plan['out_paths'][key]))
+                print(f"  写出 {spec['Name']} 完成。")
+        write_time = sum(category_write.values())
+    except Exception:
+        for key, (nc, _targets, tmp) in files.items():
+            try:
+                nc.close()
+            except Exception:
+                pass
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        raise
+    return read_time, write_time
+
+
+def lazy_day(plan, ctx, tif_list):
+    """
+    dask 惰性模式处理单日：构建惰性全球网格，各类别 to_netcdf(compute=False) 后合并为一次计算
+
+    读取与写出在计算中交织，各类别的写出耗时按总耗时平分记录。
+    各类别写入临时文件，全部计算完成后原子重命名；失败时删除临时文件后重新抛出异常。
+
+    Returns:
+        读取与写出总耗时（秒）
+    """
+    opts = ctx['opts']
+    evap_index_set = {b['Index'] for b in EVAP_BANDS}
+    full_bands, idx_to_position = era5l_dask.lazy_day_bands(tif_list, plan['needed_indices'], evap_index_set,
+                                                            opts['dask_chunk_rows'])
+    writes, written = [], []
+    try:
+        for spec in CATEGORY_SPECS:
+            key = spec['Key']
+            if not plan['need'][key]:
+                print(f"  {spec['Name']} 已存在，跳过写出。")
+                continue
+            ds = build_category_dataset(key, full_bands, idx_to_position, ctx)
+            begin_output(plan, ctx, key)
+            tmp = era5l_journal.temp_path(plan['out_paths'][key])
+            os.makedirs(os.path.dirname(tmp), exist_ok=True)
+            written.append((spec, tmp))
+            writes.append(save_nc(ds, tmp, opts['category_encoding'][key], compute=False))
+        t = time.time()
+        era5l_dask.compute_writes(writes, opts['dask_scheduler'])
+        elapsed = time.time() - t
+        for spec, tmp in written:
+            os.replace(tmp, plan['out_paths'][spec['Key']])
+    except Exception:
+        for _spec, tmp in written:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        raise
+    for spec, _tmp in written:
+        key = spec['Key']
+        record_output(plan, ctx, key)
+        note_category(plan, ctx, key, 0.0, elapsed / len(written), os.path.getsize(plan['out_paths'][key]))
+        print(f"  写出 {spec['Name']} 完成。")
+    return elapsed
+
+
+def cleanup_failed_day(plan):
+    # 不删除已存在的历史产物；仅清理本轮新写入的半成品
+    for key, f in plan['out_paths'].items():
+        if not plan['need'][key]:
+            continue
+        try:
+            if os.path.isfile(f) and os.path.getsize(f)==0:
+                os.remove(f)
+            tmp = era5l_journal.temp_path(f)
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+        except Exception:
+            pass
+
+
+# 主进程中的月/年累加器 {(Key, 周期, 周期首日): 状态}；聚合已写出的周期为 None
+_aggregate_states = {}
+
+
+def aggregate_memory_bytes(ctx):
+    """
+    流式聚合常驻内存的估算（字节），超出 MEMORY_BUDGET_GB 时抛出 ValueError
+
+    逐日累加时各类别每个周期同时各有一个累加器，并与单日处理的读取缓冲区同时存在；
+    从日文件补读时各周期依次写出，同一时刻只有一个类别一个周期的累加器。
+    """
+    opts, selected = ctx['opts'], ctx['selected']
+    shape = output_shape(ctx)
+    if ctx['aggregate_in_memory']:
+        n_vars = sum(len(bands) for bands in selected.values())
+        state = era5l_aggregate.state_bytes(n_vars * len(opts['aggregate_periods']), shape)
+        needed = {src for key, bands in selected.items() for _b, src in output_sources(key, bands, opts['apply_evap_swap'])}
+        day = estimate_day_bytes(len(needed), *read_shape(ctx), day_copies(opts))
+    else:
+        state = era5l_aggregate.state_bytes(max(len(bands) for bands in selected.values()), shape)
+        day = 0
+    budget = opts['memory_budget_gb'] * 1024**3
+    if state + day > budget:
+        raise ValueError(f"流式聚合累加器约 {state / 1024**3:.1f} GB，加上单日处理约 {day / 1024**3:.1f} GB，"
+                         f"超出内存预算 MEMORY_BUDGET_GB={opts['memory_budget_gb']:g}；"
+                         f"请减少聚合的变量或周期 (AGGREGATE_PERIODS)，或分多次运行")
+    return state
+
+
+def aggregate_path(out_dirs, spec, d, period):
+    """d 所在月/年的聚合输出路径（<类别输出目录>/aggregates，月聚合按 yyyy 子目录存放）"""
+    root = os.path.join(out_dirs[spec['Key']], 'aggregates')
+    if period == 'month':
+        return os.path.join(root, str(d.year), f"ERA5_Land_Monthly_{spec['FileTag']}_{d:%Y%m}.nc")
+    return os.path.join(root, f"ERA5_Land_Annual_{spec['FileTag']}_{d:%Y}.nc")
+
+
+def aggregate_state_path(out_dirs, spec, d, period):
+    """d 所在月/年的累加器检查点路径"""
+    return os.path.join(out_dirs[spec['Key']], 'aggregates', 'checkpoints',
+                        f"{spec['FileTag']}_{period}_{era5l_aggregate.period_label(d, period)}.npz")
+
+
+def open_aggregate(ctx, spec, period, d):
+    """
+    取得 d 所在周期的累加器：已在内存中直接返回，否则载入检查点或新建
+
+    Returns:
+        累加器状态；该周期的聚合输出已存在时返回 None
+    """
+    state_key = (spec['Key'], period, era5l_cube.period_start(d, period))
+    if state_key not in _aggregate_states:
+        state = None
+        if not os.path.isfile(aggregate_path(ctx['out_dirs'], spec, d, period)):
+            names = [b['VarName'] for b in ctx['selected'][spec['Key']]]
+            path = aggregate_state_path(ctx['out_dirs'], spec, d, period)
+            state = era5l_aggregate.load_state(path, names, output_shape(ctx))
+            if state is None:
+                if os.path.isfile(path):
+                    print(f'  检查点 {path} 的变量或网格与本次运行不一致，重新累加')
+                state = era5l_aggregate.new_state(names, output_shape(ctx))
+        _aggregate_states[state_key] = state
+    return _aggregate_states[state_key]
+
+
+def aggregate_day(plan, ctx, full_bands, idx_to_position):
+    """
+    将当日新写出的各类别整幅数据累加到所在月/年的累加器；周期最后一天累加后即写出该周期
+
+    已存在或增量追加的类别不在此累加，由 finish_aggregate 在周期结束时从日文件补读。
+    """
+    d, opts = plan['date'], ctx['opts']
+    for spec in CATEGORY_SPECS:
+        key = spec['Key']
+        if not plan['need'][key] or key in plan['append']:
+            continue
+        positions = category_positions(key, idx_to_position, ctx)
+        arrays = [full_bands[positions[b['Index']]] for b in ctx['selected'][key]]
+        for period in opts['aggregate_periods']:
+            state = open_aggregate(ctx, spec, period, d)
+            if state is None:
+                continue
+            era5l_aggregate.update(state, d, arrays)
+            if era5l_aggregate.is_last_day(d, period):
+                finish_aggregate(ctx, spec, period, d)
+            elif state['pending'] >= opts['aggregate_checkpoint_days']:
+                era5l_aggregate.save_state(state, aggregate_state_path(ctx['out_dirs'], spec, d, period))
+
+
+def finish_aggregate(ctx, spec, period, d):
+    """
+    写出 d 所在周期的聚合并删除检查点
+
+    累加器中缺少的日期（跳过、增量追加、在工作进程中写出或上次检查点之后中断的日期）从已有日文件补读；
+    日文件也不存在的日期不计入，写出的 days_aggregated 属性记录实际天数。
+    """
+    key = spec['Key']
+    state = open_aggregate(ctx, spec, period, d)
+    if state is None:
+        return
+    band_list = ctx['selected'][key]
+    days = era5l_aggregate.period_days(d, period)
+    label = era5l_aggregate.period_label(d, period)
+    backfilled = 0
+    for day in days:
+        path = out_path_for(ctx['out_dirs'], spec, day)
+        if day in state['dates'] or not os.path.isfile(path):
+            continue
+        with xr.open_dataset(path) as ds:
+            if any(b['VarName'] not in ds for b in band_list):
+                continue
+            arrays = [ds[b['VarName']].values.astype(np.float32) for b in band_list]
+        era5l_aggregate.update(state, day, arrays)
+        backfilled += 1
+
+    grid = ctx.get('grid')
+    lat, lon = (new_lat, new_lon) if grid is None else (grid['lat'], grid['lon'])
+    attrs = dict(ctx['global_attrs'], aggregation_period=period, period=label,
+                 days_in_period=len(days), days_aggregated=len(state['dates']),
+                 ProcessingStatus=f'Aggregated on {dt.datetime.now():%Y-%m-%d %H:%M:%S}')
+    ds = era5l_aggregate.build_dataset(era5l_aggregate.statistics(state), band_list, lat, lon, attrs)
+    write_s = timed_save_nc(ds, aggregate_path(ctx['out_dirs'], spec, d, period), ctx['opts']['category_encoding'][key])
+    checkpoint = aggregate_state_path(ctx['out_dirs'], spec, d, period)
+    if os.path.isfile(checkpoint):
+        os.remove(checkpoint)
+    _aggregate_states[(key, period, era5l_cube.period_start(d, period))] = None
+    missing = len(days) - len(state['dates'])
+    print(f"  {spec['Name']} {label} 聚合写出：{len(state['dates'])}/{len(days)} 天（从日文件补读 {backfilled} 天"
+          + (f'，缺少 {missing} 天' if missing else '') + f'），耗时: {write_s:.2f}秒')
+
+
+def finish_aggregates(ctx, date_vec):
+    """
+    运行结束时：写出结束日不晚于本次范围末日且尚未输出的周期，其余周期的累加器保存检查点
+    """
+    opts = ctx['opts']
+    for spec in CATEGORY_SPECS:
+        if not ctx['selected'][spec['Key']]:
+            continue
+        for period in opts['aggregate_periods']:
+            for start in sorted({era5l_cube.period_start(d, period) for d in date_vec}):
+                if era5l_aggregate.period_days(start, period)[-1] <= date_vec[-1]:
+                    finish_aggregate(ctx, spec, period, start)
+                    continue
+                state = _aggregate_states.get((spec['Key'], period, start))
+                if state is not None and state['pending']:
+                    era5l_aggregate.save_state(state, aggregate_state_path(ctx['out_dirs'], spec, start, period))
+                    print(f"  {spec['Name']} {era5l_aggregate.period_label(start, period)} 未结束，"
+                          f"已累加 {len(state['dates'])} 天，保存检查点")
+    _aggregate_states.clear()
+
+
+def resolve_land_index(plan, ctx):
+    """
+    陆地格点存储：确定本次运行的陆地格点索引并打印陆地占比与每个变量的数据量
+
+    LAND_MASK_PATH 指向的文件存在时读取；否则读取 plan 当日所需波段，以有效值并集为掩膜（区域/粗化后的输出网格），
+    设置了 LAND_MASK_PATH 时保存供之后的运行复用。
+    """
+    path = ctx['opts']['land_mask_path']
+    grid = ctx.get('grid')
+    shape = output_shape(ctx)
+    if path and os.path.isfile(path):
+        mask = era5l_land.load_mask(path)
+        if mask.shape != shape:
+            raise ValueError(f'掩膜 {path} 的网格 {mask.shape} 与输出网格 {shape} 不一致')
+        source = path
+    else:
+        loaded = load_day(plan, ctx)
+        if loaded is None:
+            raise FileNotFoundError(f"{plan['date']:%Y-%m-%d} 无法读取，不能由数据计算陆地掩膜")
+        full_bands, _ = loaded
+        mask = era5l_land.mask_from_bands(full_bands)
+        source = f"{plan['date']:%Y-%m-%d} 所读 {len(full_bands)} 个波段的有效值"
+        del full_bands, loaded
+        if path:
+            era5l_land.save_mask(path, mask, *((new_lat, new_lon) if grid is None else (grid['lat'], grid['lon'])))
+            source += f'（已保存到 {path}）'
+    index = era5l_land.land_index(mask)
+    total = shape[0] * shape[1]
+    print(f'陆地格点存储: 掩膜来自 {source}；陆地格点 {len(index)} / {total} ({len(index) / total:.1%})，'
+          f'每个 float32 变量 {len(index) * 4 / 1024**2:.1f} MB（整幅 {total * 4 / 1024**2:.1f} MB）')
+    return index
+
+
+def combine_ref_indexes(out_dirs, keys=None):
+    """
+    按类别将引用片段合并为引用索引（只读片段，不打开日文件）
+
+    Args:
+        out_dirs: 各类别输出根目录 {Key: 目录}
+        keys: 类别 Key 列表，默认全部
+
+    Returns:
+        写出的索引路径列表
+    """
+    written = []
+    for spec in CATEGORY_SPECS:
+        if keys and spec['Key'] not in keys:
+            continue
+        t0 = time.time()
+        path, n_days, skipped = era5l_refindex.combine(out_dirs[spec['Key']], spec['FileTag'])
+        if path is None:
+            continue
+        print(f"  {spec['Name']} 引用索引: {path}，{n_days} 天，耗时: {time.time()-t0:.2f}秒")
+        for day, reason in skipped:
+            print(f'    [WARN] {day} 未纳入索引：{reason}')
+        written.append(path)
+    return written
+
+
+def rebuild_ref_indexes(out_dirs, keys=None, workers=4, force=False):
+    """
+    由已有日文件重建引用索引：并行生成缺失或早于日文件的片段，删除日文件已不存在的片段，再合并
+
+    Args:
+        out_dirs: 各类别输出根目录 {Key: 目录}
+        keys: 类别 Key 列表，默认全部
+        workers: 生成片段的进程数
+        force: 为 True 时重新生成全部片段
+
+    Returns:
+        写出的索引路径列表
+    """
+    era5l_refindex.require_kerchunk()
+    tasks = []
+    for spec in CATEGORY_SPECS:
+        key = spec['Key']
+        if keys and key not in keys:
+            continue
+        out_dir = out_dirs[key]
+        nc_files = glob.glob(os.path.join(glob.escape(out_dir), '*', '*', f"ERA5_Land_Daily_{spec['FileTag']}_????????.nc"))
+        dates = set()
+        for path in nc_files:
+            d = dt.datetime.strptime(os.path.basename(path)[-11:-3], '%Y%m%d')
+            dates.add(d)
+            if force or era5l_refindex.fragment_stale(path, era5l_refindex.fragment_path(out_dir, spec['FileTag'], d)):
+                tasks.append((path, out_dir, spec['FileTag'], d))
+        orphans = [p for p in glob.glob(os.path.join(glob.escape(os.path.join(out_dir, 'refs')), '*', f"{spec['FileTag']}_*.json"))
+                   if dt.datetime.strptime(os.path.basename(p)[-13:-5], '%Y%m%d') not in dates]
+        for path in orphans:
+            os.remove(path)
+        print(f"  {spec['Name']}: {len(nc_files)} 个日文件，需生成 {sum(t[2] == spec['FileTag'] for t in tasks)} 个片段"
+              + (f'，删除 {len(orphans)} 个日文件已不存在的片段' if orphans else ''))
+
+    t0 = time.time()
+    fail = 0
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(era5l_refindex.write_fragment, *task): task for task in tasks}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                fail += 1
+                print(f'  [WARN] {futures[future][0]} 片段生成失败: {e}')
+    if tasks:
+        print(f'  生成片段 {len(tasks) - fail} 个（失败 {fail} 个），耗时: {time.time()-t0:.2f}秒')
+    return combine_ref_indexes(out_dirs, keys)
+
+
+def rechunk_timeseries(out_dirs, start_dt, end_dt, keys=None, chunks=RECHUNK_CHUNKS, memory_gb=RECHUNK_MEMORY_GB,
+                       workers=1):
+    """
+    将日期范围内各类别的逐日 NetCDF 重排为按时间方向分块的时间序列存储 (era5l_rechunk)
+
+    存储覆盖整个日期范围，缺失的日期为 NaN；再次运行时整体重建（新增日期后需按新的范围重新运行）。
+
+    Args:
+        out_dirs: 各类别输出根目录 {Key: 目录}
+        start_dt, end_dt: 起止日期（含）
+        keys: 类别 Key 列表；None 为全部
+        chunks: 目标分块 (time, lat, lon)
+        memory_gb: 内存预算 (GB)
+        workers: 并行重排的变量数（进程数）
+
+    Returns:
+        写出的存储路径列表
+    """
+    dates = [start_dt + dt.timedelta(days=i) for i in range((end_dt - start_dt).days + 1)]
+    written = []
+    for spec in CATEGORY_SPECS:
+        key = spec['Key']
+        if keys and key not in keys:
+            continue
+        files = [out_path_for(out_dirs, spec, d) for d in dates]
+        if not any(os.path.isfile(f) for f in files):
+            print(f"  {spec['Name']}: 日期范围内没有日文件，跳过")
+            continue
+        path = era5l_rechunk.store_path(out_dirs[key], spec['FileTag'])
+        t = time.time()
+        info = era5l_rechunk.build(path, dates, files, chunks, int(memory_gb * 1024**3), workers)
+        passes = ('单遍' if info['single_pass'] else
+                  f"两遍 (每次读取 {info['block_days']} 天，中间块 {info['scratch_chunks']}，"
+                  f"读取 {info['pass1_s']:.1f}秒，重排 {info['pass2_s']:.1f}秒)")
+        print(f"  {spec['Name']}: {info['present']}/{len(dates)} 天，{len(info['variables'])} 个变量，分块 {info['chunks']}，"
+              f"{passes}，每进程峰值约 {info['peak_bytes'] / 1024**3:.2f} GB，耗时 {time.time() - t:.1f}秒 -> {path}")
+        written.append(path)
+    return written
+
+
+def monthly_climatology(out_dirs, keys=None, years=None, category_encoding=None):
+    """
+    由月聚合文件按 Chan 合并公式计算多年逐月气候态（不读取日文件）
+
+    Args:
+        out_dirs: 各类别输出根目录 {Key: 目录}
+        keys: 类别 Key 列表，默认全部
+        years: (起始年, 结束年)，默认使用全部已有月聚合
+        category_encoding: 各类别的压缩方案 {Key: 方案名}，未列出的类别使用 CATEGORY_ENCODING
+
+    Returns:
+        写出的文件路径列表
+    """
+    encoding = build_options(category_encoding=dict(CATEGORY_ENCODING, **(category_encoding or {})))['category_encoding']
+    written = []
+    for spec in CATEGORY_SPECS:
+        key = spec['Key']
+        if keys and key not in keys:
+            continue
+        root = os.path.join(out_dirs[key], 'aggregates')
+        by_month = {}
+        for path in sorted(glob.glob(os.path.join(glob.escape(root), '*', f"ERA5_Land_Monthly_{spec['FileTag']}_*.nc"))):
+            ym = os.path.basename(path)[-9:-3]
+            if years and not years[0] <= int(ym[:4]) <= years[1]:
+                continue
+            by_month.setdefault(int(ym[4:]), []).append(path)
+        for month, paths in sorted(by_month.items()):
+            names = None
+            for path in paths:  # 只统计各年均有的变量
+                with xr.open_dataset(path) as ds:
+                    have = [b['VarName'] for b in spec['Bands'] if f"{b['VarName']}_mean" in ds]
+                    lat, lon = ds['lat'].values, ds['lon'].values
+                names = have if names is None else [n for n in names if n in have]
+            stats = {}
+            for name in names:
+                acc = None
+                for path in paths:
+                    acc = era5l_aggregate.merge(acc, era5l_aggregate.read_statistics(path, [name])[name])
+                stats[name] = era5l_aggregate.merged_statistics(acc)
+            year_list = sorted({os.path.basename(p)[-9:-5] for p in paths})
+            attrs = dict(make_global_attrs(), aggregation_period='month-of-year climatology', month=month,
+                         years=' '.join(year_list))
+            ds = era5l_aggregate.build_dataset(stats, [b for b in spec['Bands'] if b['VarName'] in names],
+                                               lat, lon, attrs)
+            out = os.path.join(root, 'climatology', f"ERA5_Land_MonthlyClim_{spec['FileTag']}_{month:02d}.nc")
+            write_s = timed_save_nc(ds, out, encoding[key])
+            print(f"  {spec['Name']} {month:02d} 月气候态：{len(year_list)} 年，{len(names)} 个变量，耗时: {write_s:.2f}秒")
+            written.append(out)
+    return written
+
+
+def run_qc(plan, ctx, full_bands, idx_to_position):
+    """
+    写出前检查当日各输出变量（按 APPLY_EVAP_SWAP 重映射后的来源）并追加 QC 记录
+
+    启用 fail-fast (QC_FAIL_FAST) 且有 error 时抛出 era5l_qc.QCFailed，当日不写出。
+    """
+    opts = ctx['opts']
+    categories = {}
+    for key, need in plan['need'].items():
+        if need:
+            positions = category_positions(key, idx_to_position, ctx, plan['bands'][key])
+            categories[key] = {b['VarName']: full_bands[positions[b['Index']]] for b in plan['bands'][key]}
+    # 接缝只存在于全球网格：两块 tif 在 GRID_WIDTH // 2 列处相接，经度 ±180° 处首尾相接
+    seam_cols = (GRID_WIDTH // 2, 0) if ctx.get('grid') is None else ()
+    record = era5l_qc.check_day(plan['date'], categories, QC_RANGES, opts['qc_limits'], seam_cols)
+    record['run'] = ctx['qc_run']
+    era5l_qc.append(opts['qc_report_path'], record)
+    era5l_qc.print_day(record)
+    if opts['qc_fail_fast'] and record['status'] == 'error':
+        raise era5l_qc.QCFailed(era5l_qc.failure_message(record))
+
+
+def qc_stop(ctx, error):
+    """记录一个未通过 QC 的日期（未写出）；累计达到 QC_FAIL_FAST 天时返回 True，调用方停止运行"""
+    ctx['qc_failed'].append(str(error))
+    print(f'  {error}，不写出。', file=sys.stderr)
+    if len(ctx['qc_failed']) < ctx['opts']['qc_fail_fast']:
+        return False
+    print(f"QC fail-fast：已有 {len(ctx['qc_failed'])} 天未通过检查，停止运行（详见 {ctx['opts']['qc_report_path']}）",
+          file=sys.stderr)
+    return True
+
+
+def process_one_day(plan, ctx, prefetched=None):
+    """
+    处理单日：读取所需波段，仅对需要的类别构建并写出 NetCDF
+
+    该函数位于模块顶层，可直接提交给进程池在工作进程中执行。
+
+    Args:
+        plan: plan_day() 的返回值
+        ctx: 运行上下文 {'base_input_dir', 'out_dirs', 'selected', 'global_attrs', 'opts'}
+        prefetched: 预读阶段的结果 (loaded, read_time, error)；为 None 时在本函数内读取
+
+    Returns:
+        'ok' 或 'fail'；启用 QC fail-fast 且当日未通过检查时，记录指标后抛出 era5l_qc.QCFailed
+    """
+    opts = ctx['opts']
+    if opts['stream_strip_rows'] and prefetched is None:
+        mode = 'stream'
+    elif opts['dask_lazy'] and prefetched is None:
+        mode = 'lazy'
+    else:
+        mode = opts['output_backend']
+    plan['metrics'] = era5l_metrics.new_day(plan['date'], mode)
+    profile_dir = os.path.dirname(os.path.abspath(opts['metrics_path'])) if opts['metrics_path'] else os.getcwd()
+    t = time.time()
+    qc_failed = None
+    with era5l_metrics.profiled(opts['profile_mode'] if plan.get('profile') else None, profile_dir, plan['date']):
+        try:
+            status = run_day_stages(plan, ctx, prefetched)
+        except era5l_qc.QCFailed as e:
+            status, qc_failed = 'fail', e
+    if opts['metrics_path'] or opts['prometheus_textfile']:
+        metrics = plan['metrics']
+        rows, cols = read_shape(ctx)
+        metrics['bytes_read'] = len(plan['needed_indices']) * rows * cols * 4 if status == 'ok' else 0
+        metrics['input_bytes'] = sum(os.path.getsize(f) for f in plan.get('tif_list', ()) if os.path.isfile(f))
+        era5l_metrics.finish_day(metrics, status, time.time() - t)
+        era5l_metrics.emit(metrics, opts['metrics_path'], opts['prometheus_textfile'])
+    if qc_failed is not None:
+        raise qc_failed
+    return status
+
+
+def run_day_stages(plan, ctx, prefetched=None):
+    """process_one_day 的主体：读取、构建、写出，并将读取耗时记入 plan['metrics']"""
+    d = plan['date']
+    print(f'\n=== {d:%Y-%m-%d} ===')
+
+    try:
+        day_start_time = time.time()
+        if ctx['opts']['stream_strip_rows'] and prefetched is None:
+            tif_list = day_tif_list(plan, ctx)
+            if len(tif_list) != 2:
+                print(f'  [{d:%Y-%m-%d}] 未找到2块tif（找到{len(tif_list)}），跳过。')
+                return 'fail'
+            print(f"  条带流式处理中 (每条带 {ctx['opts']['stream_strip_rows']} 行) …")
+            read_time, write_time = stream_day(plan, ctx, tif_list)
+            plan['metrics']['read_s'] = read_time
+            day_total_time = time.time() - day_start_time
+            print(f'  读取耗时: {read_time:.2f}秒, 写出耗时: {write_time:.2f}秒, 本日总耗时: {day_total_time:.2f}秒')
+            print(f'  [{d:%Y-%m-%d}] 本日完成。')
+            return 'ok'
+
+        if ctx['opts']['dask_lazy'] and prefetched is None:
+            tif_list = day_tif_list(plan, ctx)
+            if len(tif_list) != 2:
+                print(f'  [{d:%Y-%m-%d}] 未找到2块tif（找到{len(tif_list)}），跳过。')
+                return 'fail'
+            print(f"  dask 惰性读写中 (每块 {ctx['opts']['dask_chunk_rows']} 行，{ctx['opts']['dask_scheduler']} 调度) …")
+            elapsed = lazy_day(plan, ctx, tif_list)
+            day_total_time = time.time() - day_start_time
+            print(f'  读取与写出耗时: {elapsed:.2f}秒, 本日总耗时: {day_total_time:.2f}秒')
+            print(f'  [{d:%Y-%m-%d}] 本日完成。')
+            return 'ok'
+
+        if prefetched is None:
+            print('  读取所需波段中 (使用并行I/O) …')
+            read_start_time = time.time()
+            loaded = load_day(plan, ctx)
+            read_time = time.time() - read_start_time
+        else:
+            loaded, read_time, error = prefetched
+            if error is not None:
+                raise error
+        if loaded is None:
+            return 'fail'
+        full_bands, idx_to_position = loaded
+        del loaded
+        plan['metrics']['read_s'] = read_time
+        print(f'  波段读取完成 (并行I/O)，耗时: {read_time:.2f}秒')
+        if ctx['opts']['qc_report_path']:
+            run_qc(plan, ctx, full_bands, idx_to_position)
+
+        process_start_time = time.time()
+        write_day(plan, ctx, full_bands, idx_to_position)
+        if ctx.get('aggregate_in_memory'):
+            aggregate_day(plan, ctx, full_bands, idx_to_position)
+
+        # 释放主要数据结构
+        del full_bands
+        gc.collect()
+
+        process_time = time.time() - process_start_time
+        day_total_time = time.time() - day_start_time
+        print(f'  处理耗时: {process_time:.2f}秒, 本日总耗时: {day_total_time:.2f}秒')
+        print(f'  [{d:%Y-%m-%d}] 本日完成。')
+        return 'ok'
+
+    except era5l_qc.QCFailed:
+        raise  # 尚未写出任何类别，无需清理
+    except Exception:
+        print(f'  [{d:%Y-%m-%d}] 失败，执行清理。', file=sys.stderr)
+        traceback.print_exc()
+        cleanup_failed_day(plan)
+        return 'fail'
+
+
+def run_days_claimed(plans, ctx):
+    """
+    分布式模式：按日期顺序在共享目录中认领 (日期, 类别) 单元，只处理本进程认领到的类别
+
+    认领前后各按输出文件检查一次（其他工作进程可能已完成或刚刚完成），某日一个类别都未认领到时跳过该日；
+    持有的锁由心跳线程按租约的 1/3 间隔续期，当日处理结束（成功或失败）后释放。
+    各工作进程持续认领直到日期范围内没有可认领的单元，吞吐量随工作进程数增加。
+
+    Returns:
+        {'ok': n, 'fail': n, 'claimed': 认领的单元数, 'others': 由其他工作进程处理（或正在处理）的单元数}
+    """
+    opts = ctx['opts']
+    os.makedirs(opts['claim_dir'], exist_ok=True)
+    owner = era5l_claims.worker_id()
+    held = set()
+    stop = era5l_claims.start_heartbeat(held, opts['claim_lease_s'] / 3, owner)
+    counts = {'ok': 0, 'fail': 0, 'claimed': 0, 'others': 0}
+    print(f"分布式认领: {opts['claim_dir']}，工作进程 {owner}，租约 {opts['claim_lease_s']} 秒")
+    stop_run = False
+    try:
+        for plan in plans:
+            d = plan['date']
+            current = plan_day(d, ctx['out_dirs'], ctx['selected'], opts)
+            locks = {}
+            for key in [k for k, need in current['need'].items() if need]:
+                path = era5l_claims.try_claim(opts['claim_dir'], d, key, opts['claim_lease_s'], owner)
+                if path is None:
+                    counts['others'] += 1
+                    continue
+                locks[key] = path
+                held.add(path)
+            if not locks:
+                continue
+            try:
+                # 只规划认领到的类别；认领前刚完成的类别在此被排除
+                claimed = {key: (bands if key in locks else []) for key, bands in ctx['selected'].items()}
+                day_plan = plan_day(d, ctx['out_dirs'], claimed, opts)
+                if not any(day_plan['need'].values()):
+                    continue
+                day_plan['tif_list'] = plan['tif_list']
+                day_plan['profile'] = plan.get('profile', False)
+                counts['claimed'] += sum(day_plan['need'].values())
+                print(f"  [{d:%Y-%m-%d}] 认领: {', '.join(k for k, need in day_plan['need'].items() if need)}")
+                try:
+                    status = process_one_day(day_plan, ctx)
+                except era5l_qc.QCFailed as e:
+                    status = 'fail'
+                    stop_run = qc_stop(ctx, e)
+                counts['ok' if status == 'ok' else 'fail'] += 1
+                if stop_run:
+                    break
+            finally:
+                # 心跳已移除被接管的锁，只释放仍持有的
+                for path in locks.values():
+                    if path in held:
+                        era5l_claims.release(path, owner, held)
+    finally:
+        stop.set()
+        for path in list(held):
+            era5l_claims.release(path, owner, held)
+    print(f"认领统计：本进程处理 {counts['claimed']} 个单元，{counts['others']} 个单元由其他工作进程处理或正在处理")
+    return counts
+
+
+def run_days_parallel(plans, ctx):
+    """
+    按日多进程并行处理，带内存预算调度
+
+    仅当某日的估算内存 (estimate_day_bytes) 与在途日期之和不超过 MEMORY_BUDGET_GB 时才提交该日；
+    否则等待已提交的日期完成后再继续。单日估算即超出预算时，待其他日期全部完成后单独运行。
+
+    Returns:
+        {'ok': n, 'fail': n}
+    """
+    opts = ctx['opts']
+    # 各日期已在独立进程中写出，不再为每个工作进程另建写出进程
+    ctx = dict(ctx, opts=dict(opts, parallel_writers=False))
+    n_workers = max(1, int(opts['parallel_days']))
+    budget = int(opts['memory_budget_gb'] * 1024**3)
+    counts = {'ok': 0, 'fail': 0}
+    pending = deque(plans)
+    in_flight = {}  # future -> (plan, est_bytes)
+    used = 0
+
+    print(f'并行模式：{n_workers} 个工作进程，内存预算 {opts["memory_budget_gb"]:.1f} GB')
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=era5l_read_plan.ensure_cache_mb,
+                             initargs=(ctx.get('gdal_cache_mb'),)) as pool:
+        while pending or in_flight:
+            # 按日期顺序准入：内存预算允许且有空闲进程时提交
+            while pending and len(in_flight) < n_workers:
+                plan = pending[0]
+                est = plan['est_bytes']
+                if in_flight and used + est > budget:
+                    break
+                if est > budget:
+                    print(f"  警告：{plan['date']:%Y-%m-%d} 估算内存 {est/1024**3:.1f} GB 超出预算，单独运行。")
+                pending.popleft()
+                in_flight[pool.submit(process_one_day, plan, ctx)] = (plan, est)
+                used += est
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                plan, est = in_flight.pop(fut)
+                used -= est
+                try:
+                    status = fut.result()
+                except era5l_qc.QCFailed as e:
+                    status = 'fail'
+                    if qc_stop(ctx, e):
+                        pending.clear()  # 不再提交新的日期，已提交的日期照常完成
+                except Exception:
+                    # 工作进程异常退出（如被系统因内存不足终止）
+                    print(f"  [{plan['date']:%Y-%m-%d}] 工作进程异常。", file=sys.stderr)
+                    traceback.print_exc()
+                    status = 'fail'
+                counts[status] += 1
+    return counts
+
+
+def run_days_pipelined(plans, ctx):
+    """
+    串行模式下的两级流水线：预读线程提前读取后续日期的波段放入深度为 PREFETCH_DEPTH 的队列，
+    主线程同时构建并写出当前日期，使 GeoTIFF 读取与 NetCDF 压缩写出相互重叠。
+
+    预读数据与正在写出的数据（含并行写出的共享内存副本，按 plan['est_bytes'] 计）合计不超过 PREFETCH_MEMORY_GB
+    （单日即超出时待队列清空后再读）。
+    两个阶段分别统计自身耗时与阻塞时间：预读阶段的阻塞表示写出跟不上，写出阶段的等待表示读取跟不上。
+
+    Returns:
+        {'ok': n, 'fail': n}
+    """
+    opts = ctx['opts']
+    depth = max(1, int(opts['prefetch_depth']))
+    mem_limit = int(opts['prefetch_memory_gb'] * 1024**3)
+    q = queue.Queue(maxsize=depth)
+    cond = threading.Condition()
+    held = {'bytes': 0}  # 已读入内存、尚未写出完成的数据量
+    stop = threading.Event()
+    stats = {'read': 0.0, 'read_stall': 0.0, 'write': 0.0, 'write_wait': 0.0}
+    counts = {'ok': 0, 'fail': 0}
+
+    def prefetch():
+        for plan in plans:
+            nbytes = plan['est_bytes']
+            stall_start = time.time()
+            with cond:
+                while held['bytes'] and held['bytes'] + nbytes > mem_limit and not stop.is_set():
+                    cond.wait()
+                held['bytes'] += nbytes
+            stall = time.time() - stall_start
+            if stop.is_set():
+                break
+
+            read_start = time.time()
+            loaded = error = None
+            try:
+                loaded = load_day(plan, ctx)
+            except Exception as e:
+                error = e
+            read_time = time.time() - read_start
+
+            put_start = time.time()
+            q.put((plan, nbytes, (loaded, read_time, error)))
+            stall += time.time() - put_start
+            stats['read'] += read_time
+            stats['read_stall'] += stall
+            print(f"  [预读] {plan['date']:%Y-%m-%d} 读取 {read_time:.2f}秒，阻塞 {stall:.2f}秒")
+            del loaded
+        q.put(None)
+
+    print(f'流水线模式：预读队列深度 {depth}，预读内存上限 {opts["prefetch_memory_gb"]:.1f} GB')
+    reader = threading.Thread(target=prefetch, name='era5l-prefetch', daemon=True)
+    reader.start()
+    try:
+        while True:
+            wait_start = time.time()
+            item = q.get()
+            wait_time = time.time() - wait_start
+            if item is None:
+                break
+            plan, nbytes, prefetched = item
+            del item
+            stats['write_wait'] += wait_time
+
+            write_start = time.time()
+            stop_run = False
+            try:
+                status = process_one_day(plan, ctx, prefetched)
+            except era5l_qc.QCFailed as e:
+                status = 'fail'
+                stop_run = qc_stop(ctx, e)
+            del prefetched
+            stats['write'] += time.time() - write_start
+            print(f"  [{plan['date']:%Y-%m-%d}] 写出阶段等待预读: {wait_time:.2f}秒")
+            counts[status] += 1
+
+            with cond:
+                held['bytes'] -= nbytes
+                cond.notify_all()
+            if stop_run:
+                break
+    finally:
+        # 中断时唤醒并排空，使预读线程能尽快退出
+        stop.set()
+        with cond:
+            cond.notify_all()
+        while reader.is_alive():
+            try:
+                q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    print(f"流水线统计：读取 {stats['read']:.2f}秒 (阻塞 {stats['read_stall']:.2f}秒)，"
+          f"构建写出 {stats['write']:.2f}秒 (等待预读 {stats['write_wait']:.2f}秒)")
+    return counts
+
+
+def run_era5l_multi(base_input_dir, out_dirs, start_dt, end_dt, selected, **options):
+    """
+    非交互式处理入口：按日期范围将 GeoTIFF 转换为各类别 NetCDF
+
+    Args:
+        base_input_dir: 基础输入目录 (其下为 yyyy/mm 子目录)
+        out_dirs: 各类别输出根目录 {Key: 目录}
+        start_dt, end_dt: 起止日期 (含)
+        selected: 各类别已选变量 {Key: 波段列表}，未选类别为空列表或缺省
+        options: 覆盖模块级可配置项，见 build_options()
+
+    Returns:
+        {'ok': n, 'skip': n, 'fail': n}
+    """
+    opts = build_options(**options)
+    selected = {spec['Key']: list(selected.get(spec['Key']) or []) for spec in CATEGORY_SPECS}
+    ctx = {
+        'base_input_dir': base_input_dir,
+        'out_dirs': out_dirs,
+        'selected': selected,
+        'global_attrs': make_global_attrs(),
+        'opts': opts,
+        'grid': None,
+    }
+    if opts['region_bbox'] is not None or opts['coarsen_factor'] != 1:
+        grid = era5l_region.make_grid(opts['region_bbox'], opts['coarsen_factor'], new_lat, new_lon, GRID_WIDTH // 2)
+        ctx['grid'] = grid
+        ctx['global_attrs'].update({
+            'geospatial_lat_min': float(grid['lat'].min()), 'geospatial_lat_max': float(grid['lat'].max()),
+            # 跨越 180° 经线时东界换算回 -180..180，lon_min > lon_max（ACDD 约定）
+            'geospatial_lon_min': float(grid['lon'][0]),
+            'geospatial_lon_max': float((grid['lon'][-1] + 180) % 360 - 180),
+            'coarsen_factor': opts['coarsen_factor'],
+        })
+        print(f"区域输出: 行 {grid['rows']}，列 {grid['cols']}，读取 {len(grid['windows'])} 块 tif 的窗口，"
+              f"输出网格 {grid['shape'][0]}x{grid['shape'][1]} ({0.1 * opts['coarsen_factor']:g}°)")
+
+    if opts['output_backend'] == 'netcdf':
+        # 各类别文件结构每日相同，模板只计算一次（直接写出与条带流式使用）
+        ctx['nc_templates'] = {key: make_category_template(ctx, key) for key in selected if selected[key]}
+
+    if opts['aggregate_periods']:
+        # 累加器只在主进程中：并行日期、条带流式与惰性模式的日数据不在主进程内存中，周期结束时从日文件补读
+        ctx['aggregate_in_memory'] = opts['parallel_days'] <= 1 and not opts['stream_strip_rows'] and not opts['dask_lazy']
+        state_bytes = aggregate_memory_bytes(ctx)
+        print(f"流式聚合 {'/'.join(opts['aggregate_periods'])}: 累加器约 {state_bytes / 1024**3:.1f} GB"
+              + ('' if ctx['aggregate_in_memory'] else '；当前模式下各日在周期结束时从日文件读回'))
+        _aggregate_states.clear()
+
+    date_vec = [start_dt + dt.timedelta(days=i) for i in range((end_dt - start_dt).days + 1)]
+    ok = skip = fail = 0
+    t0 = time.time()
+    print(f'将处理 {len(date_vec)} 天 …')
+    if opts['journal_path']:
+        era5l_journal.resume(opts['journal_path'])
+
+    done = present = None
+    if opts['output_backend'] == 'zarr':
+        # 创建/扩展各类别存储并一次性载入已完成日期，之后工作进程只做区域写入
+        done = {}
+        for spec in CATEGORY_SPECS:
+            key = spec['Key']
+            if not selected[key]:
+                continue
+            path = era5l_zarr.store_path(out_dirs[key], spec['FileTag'])
+            done[key] = era5l_zarr.prepare_store(path, spec['Bands'], selected[key], end_dt,
+                                                 new_lat, new_lon, ctx['global_attrs'])
+            last = era5l_zarr.last_complete(done[key])
+            print(f"  {spec['Name']} Zarr 存储: {path}，已完成 {len(done[key])} 天"
+                  + (f'，最近完成 {last:%Y-%m-%d}' if last else ''))
+            if opts['incremental_append']:
+                present = present or {}
+                present[key] = era5l_zarr.written_variables(path, selected[key])
+    elif opts['output_backend'] == 'cube':
+        # 每个周期文件只打开一次，载入已写入的日期
+        done = {}
+        for spec in CATEGORY_SPECS:
+            key = spec['Key']
+            if not selected[key]:
+                continue
+            done[key] = set()
+            periods = {}
+            for d in date_vec:
+                periods.setdefault(era5l_cube.cube_path(out_dirs[key], spec['FileTag'], d, opts['cube_period']), d)
+            for path, d in periods.items():
+                done[key] |= era5l_cube.load_done(path, selected[key], d, opts['cube_period'])
+            print(f"  {spec['Name']} cube: {len(periods)} 个周期文件，本次范围内已完成 {len(done[key])} 天")
+    elif opts['manifest_path']:
+        # 一次查询载入清单，代替逐日逐类别检查输出文件
+        done = era5l_manifest.load_done(opts['manifest_path'], selected)
+        print(f"  完成清单: {opts['manifest_path']}，已登记 "
+              + '，'.join(f"{spec['Name']} {len(done[spec['Key']])} 天" for spec in CATEGORY_SPECS if spec['Key'] in done))
+
+    plans = []
+    for d in date_vec:
+        plan = plan_day(d, out_dirs, selected, opts, done, present)
+        if not any(plan['need'].values()):
+            print(f'  {d:%Y-%m-%d}: 当日所有已选类别的产物均已存在（或未选择任何类别），跳过写出。')
+            skip += 1
+            continue
+        plans.append(plan)
+    if opts['incremental_append']:
+        partial = [(p, key) for p in plans for key in p['need']
+                   if p['need'][key] and len(p['bands'][key]) < len(selected[key])]
+        if partial:
+            n_vars = sum(len(p['bands'][key]) for p, key in partial)
+            print(f'  增量追加: {len(partial)} 个类别输出缺少已选变量，共补写 {n_vars} 个变量（只读取对应波段）')
+
+    # 每个所需月目录只列一次，处理开始前报告缺失/不完整的日期
+    index = era5l_input_index.build_index(base_input_dir, [p['date'] for p in plans], opts['input_index_cache'])
+    missing, incomplete = era5l_input_index.check(index, [p['date'] for p in plans])
+    if missing or incomplete:
+        print(f'  输入缺失 {len(missing)} 天，不完整 {len(incomplete)} 天，这些日期不处理：')
+        for d in missing:
+            print(f'    {d:%Y-%m-%d}: 未找到 tif')
+        for d, n in incomplete.items():
+            print(f'    {d:%Y-%m-%d}: 找到 {n} 块 tif（应为 2 块）')
+        fail += len(missing) + len(incomplete)
+        plans = [p for p in plans if p['date'] in index and p['date'] not in incomplete]
+    for plan in plans:
+        plan['tif_list'] = era5l_input_index.day_tifs(index, plan['date'])
+        if ctx['grid'] is not None:
+            plan['est_bytes'] = estimate_day_bytes(len(plan['needed_indices']), *read_shape(ctx), day_copies(opts))
+    if plans and not opts['stream_strip_rows']:
+        # GDAL 块缓存为进程全局设置：按所需波段最多的一日估算，在读取开始前设置一次（并行日期的工作进程在初始化时设置）
+        largest = max(plans, key=lambda p: len(p['needed_indices']))
+        try:
+            ctx['gdal_cache_mb'] = era5l_read_plan.cache_mb_for(largest['tif_list'], len(largest['needed_indices']),
+                                                                opts['read_strategy'])
+        except (OSError, rasterio.errors.RasterioError) as e:
+            print(f"  [WARN] 无法读取 {largest['date']:%Y-%m-%d} 的 tif 文件头估算块缓存，沿用当前设置: {e}")
+        else:
+            era5l_read_plan.ensure_cache_mb(ctx['gdal_cache_mb'])
+    if opts['profile_mode'] and plans:
+        target = dt.datetime.strptime(opts['profile_day'], '%Y%m%d') if opts['profile_day'] else plans[0]['date']
+        for plan in plans:
+            plan['profile'] = plan['date'] == target
+    if opts['qc_report_path']:
+        ctx['qc_run'] = era5l_qc.run_id()
+        ctx['qc_failed'] = []
+        print(f"数据质量检查: {opts['qc_report_path']}（运行 {ctx['qc_run']}）"
+              + (f"，{opts['qc_fail_fast']} 天未通过即停止" if opts['qc_fail_fast'] else ''))
+    if opts['land_gather'] and plans:
+        ctx['land_index'] = resolve_land_index(plans[0], ctx)
+        if 'nc_templates' in ctx:  # 模板中的数据变量改为陆地向量
+            ctx['nc_templates'] = {key: make_category_template(ctx, key) for key in selected if selected[key]}
+
+    try:
+        if opts['claim_dir']:
+            counts = run_days_claimed(plans, ctx)
+            ok += counts['ok']
+            fail += counts['fail']
+        elif opts['parallel_days'] > 1 and len(plans) > 1:
+            counts = run_days_parallel(plans, ctx)
+            ok += counts['ok']
+            fail += counts['fail']
+        elif opts['prefetch_depth'] > 0 and not opts['stream_strip_rows'] and not opts['dask_lazy'] and len(plans) > 1:
+            counts = run_days_pipelined(plans, ctx)
+            ok += counts['ok']
+            fail += counts['fail']
+        else:
+            for plan in plans:
+                stop_run = False
+                try:
+                    status = process_one_day(plan, ctx)
+                except era5l_qc.QCFailed as e:
+                    status = 'fail'
+                    stop_run = qc_stop(ctx, e)
+                if status == 'ok':
+                    ok += 1
+                else:
+                    fail += 1
+                if stop_run:
+                    break
+    finally:
+        shutdown_writer_pools()
+    if opts['qc_report_path']:
+        print()
+        era5l_qc.finish_run(opts['qc_report_path'], ctx['qc_run'], len(ctx['qc_failed']),
+                            stopped=bool(opts['qc_fail_fast']) and len(ctx['qc_failed']) >= opts['qc_fail_fast'])
+    if opts['aggregate_periods']:
+        finish_aggregates(ctx, date_vec)
+    if opts['ref_index'] and ok:
+        combine_ref_indexes(out_dirs, [key for key in selected if selected[key]])
+
+    print('\n==== 总结 ====')
+    print(f'成功: {ok} 跳过: {skip} 失败: {fail} 用时: {(time.time()-t0)/60:.2f} 分钟')
+    return {'ok': ok, 'skip': skip, 'fail': fail}
+
+
+def benchmark_encodings(base_input_dir, d, work_dir, keys=None, profiles=None, box=(20.0, 50.0, 100.0, 140.0),
+                        pack=False, land=False):
+    """
+    在样例日上比较各压缩/分块方案：写入数据量、写出耗时、文件大小与区域读取耗时
+
+    Args:
+        base_input_dir: 基础输入目录
+        d: 样例日期 (datetime)
+        work_dir: 临时输出目录，各方案的文件写入其同名子目录
+        keys: 参与比较的类别 Key 列表，默认全部
+        profiles: 参与比较的方案名称列表，默认 ENCODING_PROFILES 全部
+        box: 区域读取范围 (lat_min, lat_max, lon_min, lon_max)，默认东亚；框内没有格点时报错，
+             框内没有陆地格点时陆地格点存储方案的区域读取耗时报告为 nan
+        pack: True 时每个方案再以 int16 打包 (PACK_INT16) 写出一次（名称后缀 +int16），并报告各打包变量的往返误差
+        land: True 时以上每种写法再以陆地格点存储 (LAND_GATHER) 写出一次（名称后缀 +land），
+              并报告各类别相对整幅写出的数据量、写出耗时与文件大小的节省
+
+    Returns:
+        [{'profile', 'category', 'data_mb', 'write_s', 'size_mb', 'region_read_s'}]
+
+    Raises:
+        ValueError: 区域框内没有格点
+    """
+    rows = np.where((new_lat >= box[0]) & (new_lat <= box[1]))[0]
+    cols = np.where((new_lon >= box[2]) & (new_lon <= box[3]))[0]
+    if rows.size == 0 or cols.size == 0:
+        raise ValueError(f'区域框 {tuple(box)} 内没有格点（顺序为 lat_min lat_max lon_min lon_max）')
+    r0, r1, c0, c1 = rows.min(), rows.max() + 1, cols.min(), cols.max() + 1
+    keys = keys or [spec['Key'] for spec in CATEGORY_SPECS]
+    profiles = profiles or list(ENCODING_PROFILES)
+    selected = {spec['Key']: (spec['Bands'] if spec['Key'] in keys else []) for spec in CATEGORY_SPECS}
+    variants = [(profile, False) for profile in profiles] + ([(profile, True) for profile in profiles] if pack else [])
+    variants = [v + (False,) for v in variants] + ([v + (True,) for v in variants] if land else [])
+
+    tif_list = find_day_tifs(base_input_dir, d)
+    if len(tif_list) != 2:
+        raise FileNotFoundError(f'{d:%Y-%m-%d} 未找到2块tif（找到{len(tif_list)}）')
+    needed_indices = sorted({b['Index'] for key in keys for b in selected[key]})
+    era5l_read_plan.ensure_cache_mb(era5l_read_plan.cache_mb_for(tif_list, len(needed_indices)))
+    full_bands, idx_to_position = read_day_bands(tif_list, needed_indices, {b['Index'] for b in EVAP_BANDS})
+
+    land_index = None
+    if land:
+        mask = (era5l_land.load_mask(LAND_MASK_PATH) if LAND_MASK_PATH and os.path.isfile(LAND_MASK_PATH)
+                else era5l_land.mask_from_bands(full_bands))
+        land_index = era5l_land.land_index(mask)
+        # 区域框内的陆地格点在向量中位于一段连续范围内（C 顺序），读取该范围后再筛选
+        r, c = np.divmod(land_index, GRID_WIDTH)
+        in_box = np.flatnonzero((r >= r0) & (r < r1) & (c >= c0) & (c < c1))
+        print(f'陆地格点 {len(land_index)} / {mask.size} ({len(land_index) / mask.size:.1%})')
+        if in_box.size == 0:
+            print(f'区域框 {tuple(box)} 内没有陆地格点，陆地格点存储方案不测区域读取（报告为 nan）')
+        print()
+
+    results = []
+    print(f"{'方案':<24}{'类别':<16}{'数据(MB)':>10}{'写出(秒)':>10}{'大小(MB)':>10}{'区域读取(秒)':>14}")
+    packed_paths = {}
+    for profile, packed, gathered in variants:
+        name = profile + ('+int16' if packed else '') + ('+land' if gathered else '')
+        ctx = {'selected': selected, 'global_attrs': make_global_attrs(), 'opts': build_options(pack_int16=packed),
+               'land_index': land_index if gathered else None}
+        for spec in CATEGORY_SPECS:
+            key = spec['Key']
+            if key not in keys:
+                continue
+            path = os.path.join(work_dir, name, f"ERA5_Land_Daily_{spec['FileTag']}_{d:%Y%m%d}.nc")
+            if os.path.isfile(path):
+                os.remove(path)
+            if packed and not gathered:
+                packed_paths[key] = path
+            ds = build_category_dataset(key, full_bands, idx_to_position, ctx)
+            data_mb = sum(ds[v].nbytes for v in ds.data_vars) / 1024**2
+            write_s = timed_save_nc(ds, path, profile)
+            del ds
+
+            t = time.time()
+            if gathered and in_box.size == 0:
+                region_read_s = float('nan')
+            else:
+                with netCDF4.Dataset(path) as nc:
+                    for b in selected[key]:
+                        if gathered:
+                            nc.variables[b['VarName']][in_box.min():in_box.max() + 1]
+                        else:
+                            nc.variables[b['VarName']][r0:r1, c0:c1]
+                region_read_s = time.time() - t
+
+            size_mb = os.path.getsize(path) / 1024**2
+            results.append({'profile': name, 'category': spec['Name'], 'data_mb': data_mb, 'write_s': write_s,
+                            'size_mb': size_mb, 'region_read_s': region_read_s})
+            print(f"{name:<24}{spec['Name']:<16}{data_mb:>10.1f}{write_s:>10.2f}{size_mb:>10.1f}{region_read_s:>14.3f}")
+
+    print('\n合计：')
+    for name in dict.fromkeys(r['profile'] for r in results):
+        rs = [r for r in results if r['profile'] == name]
+        print(f"{name:<24}数据 {sum(r['data_mb'] for r in rs):.1f}MB  写出 {sum(r['write_s'] for r in rs):.2f}秒  "
+              f"大小 {sum(r['size_mb'] for r in rs):.1f}MB  区域读取 {sum(r['region_read_s'] for r in rs):.3f}秒")
+
+    if land:
+        print('\n陆地格点存储相对整幅写出的节省（数据量 = 进入压缩的内存数据，写出 = 压缩与写盘耗时）：')
+        by_name = {(r['profile'], r['category']): r for r in results}
+        for (name, category), r in by_name.items():
+            if name.endswith('+land'):
+                base = by_name[(name[:-len('+land')], category)]
+                print(f"{name:<24}{category:<16}数据 {1 - r['data_mb'] / base['data_mb']:>6.1%}  "
+                      f"写出 {1 - r['write_s'] / base['write_s']:>6.1%}  大小 {1 - r['size_mb'] / base['size_mb']:>6.1%}")
+
+    if packed_paths:
+        # 往返误差：读回最后一个方案的打包文件，与打包前的数据比较
+        print('\nint16 打包往返误差（仅统计有效范围内的格点）：')
+        original, decoded = {}, {}
+        for key, path in packed_paths.items():
+            positions = category_positions(key, idx_to_position, ctx)
+            with xr.open_dataset(path) as ds:
+                for b in selected[key]:
+                    if b['VarName'] in PACK_SPECS:
+                        original[b['VarName']] = full_bands[positions[b['Index']]]
+                        decoded[b['VarName']] = ds[b['VarName']].values
+        era5l_packing.roundtrip_report(original, decoded, PACK_SPECS)
+    return results
+
+
+def benchmark_writers(base_input_dir, d, work_dir, keys=None, profile=None, repeats=3, pack=False):
+    """
+    在样例日上比较 xarray 写出与模板直接写出 (NC_WRITER='direct')：各类别构建+写出耗时，并核对两者的文件结构与数据
+
+    Args:
+        base_input_dir: 基础输入目录
+        d: 样例日期 (datetime)
+        work_dir: 临时输出目录，两种方式的文件分别写入 xarray / direct 子目录
+        keys: 参与比较的类别 Key 列表，默认全部
+        profile: 压缩方案名称，默认使用 CATEGORY_ENCODING 中各类别的方案
+        repeats: 每种方式重复次数，取最短耗时
+        pack: 是否启用 int16 打包 (PACK_INT16)
+
+    Returns:
+        [{'category', 'xarray_s', 'direct_s', 'template_s', 'diffs'}]
+    """
+    keys = keys or [spec['Key'] for spec in CATEGORY_SPECS]
+    selected = {spec['Key']: (spec['Bands'] if spec['Key'] in keys else []) for spec in CATEGORY_SPECS}
+    encoding = {key: profile or CATEGORY_ENCODING[key] for key in CATEGORY_ENCODING}
+    ctx = {'selected': selected, 'global_attrs': make_global_attrs(),
+           'opts': build_options(pack_int16=pack, category_encoding=encoding)}
+
+    tif_list = find_day_tifs(base_input_dir, d)
+    if len(tif_list) != 2:
+        raise FileNotFoundError(f'{d:%Y-%m-%d} 未找到2块tif（找到{len(tif_list)}）')
+    needed_indices = sorted({b['Index'] for key in keys for b in selected[key]})
+    era5l_read_plan.ensure_cache_mb(era5l_read_plan.cache_mb_for(tif_list, len(needed_indices)))
+    full_bands, idx_to_position = read_day_bands(tif_list, needed_indices, {b['Index'] for b in EVAP_BANDS})
+
+    results = []
+    print(f"{'类别':<16}{'xarray(秒)':>12}{'direct(秒)':>12}{'节省':>8}{'模板(毫秒)':>12}  文件结构")
+    for spec in CATEGORY_SPECS:
+        key = spec['Key']
+        if key not in keys:
+            continue
+        name = f"ERA5_Land_Daily_{spec['FileTag']}_{d:%Y%m%d}.nc"
+        path_x, path_d = os.path.join(work_dir, 'xarray', name), os.path.join(work_dir, 'direct', name)
+        t = time.time()
+        template = make_category_template(ctx, key)
+        template_s = time.time() - t
+
+        xarray_s = direct_s = float('inf')
+        for _ in range(repeats):
+            t = time.time()
+            timed_save_nc(build_category_dataset(key, full_bands, idx_to_position, ctx), path_x, encoding[key])
+            xarray_s = min(xarray_s, time.time() - t)
+            t = time.time()
+            timed_write_template(template, path_d, category_arrays(key, full_bands, idx_to_position, ctx))
+            direct_s = min(direct_s, time.time() - t)
+
+        diffs = era5l_nc_template.compare_files(path_x, path_d)
+        results.append({'category': spec['Name'], 'xarray_s': xarray_s, 'direct_s': direct_s,
+                        'template_s': template_s, 'diffs': diffs})
+        print(f"{spec['Name']:<16}{xarray_s:>12.3f}{direct_s:>12.3f}{1 - direct_s / xarray_s:>8.0%}"
+              f"{template_s * 1000:>12.1f}  {'一致' if not diffs else f'{len(diffs)} 处不同'}")
+        for diff in diffs:
+            print(f'    {diff}')
+
+    total_x, total_d = sum(r['xarray_s'] for r in results), sum(r['direct_s'] for r in results)
+    print(f"\n合计：xarray {total_x:.2f}秒，direct {total_d:.2f}秒（每日节省 {total_x - total_d:.2f}秒）")
+    return results
+
+
 def process_era5l_data_multi():
     # ========= GUI 路径选择 =========
     print('正在启动路径选择对话框...')
@@ -66,11 +2417,7 @@ def process_era5l_data_multi():
     print(f'已选择输出目录: {BASE_OUTPUT_DIR}')
 
     # 构建各个输出子目录路径
-    OUT_EVAP = os.path.join(BASE_OUTPUT_DIR, 'Evaporation_Flux', 'ERA5L')
-    OUT_VEG  = os.path.join(BASE_OUTPUT_DIR, 'Vegetation')
-    OUT_RAD  = os.path.join(BASE_OUTPUT_DIR, 'Radiation')
-    OUT_SOIL = os.path.join(BASE_OUTPUT_DIR, 'SoilMoisture')
-    OUT_ROPR = os.path.join(BASE_OUTPUT_DIR, 'Precipitation_Runoff')
+    out_dirs = default_out_dirs(BASE_OUTPUT_DIR)
 
     root.destroy()  # 销毁tkinter窗口
 
@@ -170,87 +2517,6 @@ def process_era5l_data_multi():
     if user_wants_ropr: print('  ✓ Runoff+Precip (径流+降水)')
     print()
 
-    # ========= 变量表 =========
-    evap_bands = [
-        {'Index': 35, 'VarName': 'Es', 'LongName': 'Evaporation from bare soil', 'Units': 'mm day-1'},
-        {'Index': 36, 'VarName': 'Ew', 'LongName': 'Evaporation from open water surfaces excluding oceans', 'Units': 'mm day-1'},
-        {'Index': 37, 'VarName': 'Ec', 'LongName': 'Evaporation from the top of canopy', 'Units': 'mm day-1'},
-        {'Index': 38, 'VarName': 'Et', 'LongName': 'Evaporation from vegetation transpiration', 'Units': 'mm day-1'},
-        {'Index': 39, 'VarName': 'Ep', 'LongName': 'Potential evaporation', 'Units': 'mm day-1'},
-        {'Index': 44, 'VarName': 'E',  'LongName': 'Total evaporation', 'Units': 'mm day-1'}
-    ]
-    veg_bands = [
-        {'Index': 49,  'VarName': 'lai_high',     'LongName': 'Leaf area index of high vegetation (half of total green leaf area)', 'Units': '1'},
-        {'Index': 50,  'VarName': 'lai_low',      'LongName': 'Leaf area index of low vegetation (half of total green leaf area)',  'Units': '1'},
-        {'Index': 147, 'VarName': 'lai_high_min', 'LongName': 'Daily minimum leaf_area_index_high_vegetation', 'Units': '1'},
-        {'Index': 148, 'VarName': 'lai_high_max', 'LongName': 'Daily maximum leaf_area_index_high_vegetation', 'Units': '1'},
-        {'Index': 149, 'VarName': 'lai_low_min',  'LongName': 'Daily minimum leaf_area_index_low_vegetation',  'Units': '1'},
-        {'Index': 150, 'VarName': 'lai_low_max',  'LongName': 'Daily maximum leaf_area_index_low_vegetation',  'Units': '1'},
-    ]
-    rad_bands = [
-        {'Index': 28,  'VarName': 'albedo',      'LongName': 'Forecast albedo', 'Units': '1'},
-        {'Index': 29,  'VarName': 'lhf_sum',     'LongName': 'Surface latent heat flux sum', 'Units': 'J m-2'},
-        {'Index': 30,  'VarName': 'nsr_sum',     'LongName': 'Surface net solar radiation sum', 'Units': 'J m-2'},
-        {'Index': 31,  'VarName': 'ntr_sum',     'LongName': 'Surface net thermal radiation sum', 'Units': 'J m-2'},
-        {'Index': 32,  'VarName': 'shf_sum',     'LongName': 'Surface sensible heat flux sum', 'Units': 'J m-2'},
-        {'Index': 33,  'VarName': 'srd_sum',     'LongName': 'Surface solar radiation downwards sum', 'Units': 'J m-2'},
-        {'Index': 34,  'VarName': 'trd_sum',     'LongName': 'Surface thermal radiation downwards sum', 'Units': 'J m-2'},
-        {'Index': 105, 'VarName': 'albedo_min',  'LongName': 'Daily minimum forecast albedo', 'Units': '1'},
-        {'Index': 106, 'VarName': 'albedo_max',  'LongName': 'Daily maximum forecast albedo', 'Units': '1'},
-        {'Index': 107, 'VarName': 'lhf_min',     'LongName': 'Daily minimum surface latent heat flux', 'Units': 'J m-2'},
-        {'Index': 108, 'VarName': 'lhf_max',     'LongName': 'Daily maximum surface latent heat flux', 'Units': 'J m-2'},
-        {'Index': 109, 'VarName': 'nsr_min',     'LongName': 'Daily minimum surface net solar radiation', 'Units': 'J m-2'},
-        {'Index': 110, 'VarName': 'nsr_max',     'LongName': 'Daily maximum surface net solar radiation', 'Units': 'J m-2'},
-        {'Index': 111, 'VarName': 'ntr_min',     'LongName': 'Daily minimum surface net thermal radiation', 'Units': 'J m-2'},
-        {'Index': 112, 'VarName': 'ntr_max',     'LongName': 'Daily maximum surface net thermal radiation', 'Units': 'J m-2'},
-        {'Index': 113, 'VarName': 'shf_min',     'LongName': 'Daily minimum surface sensible heat flux', 'Units': 'J m-2'},
-        {'Index': 114, 'VarName': 'shf_max',     'LongName': 'Daily maximum surface sensible heat flux', 'Units': 'J m-2'},
-        {'Index': 115, 'VarName': 'srd_min',     'LongName': 'Daily minimum surface solar radiation downwards', 'Units': 'J m-2'},
-        {'Index': 116, 'VarName': 'srd_max',     'LongName': 'Daily maximum surface solar radiation downwards', 'Units': 'J m-2'},
-        {'Index': 117, 'VarName': 'trd_min',     'LongName': 'Daily minimum surface thermal radiation downwards', 'Units': 'J m-2'},
-        {'Index': 118, 'VarName': 'trd_max',     'LongName': 'Daily maximum surface thermal radiation downwards', 'Units': 'J m-2'},
-    ]
-    soil_bands = [
-        {'Index': 4,  'VarName': 'stl1', 'LongName': 'Soil temperature level 1 (0-7 cm)',   'Units': 'K'},
-        {'Index': 5,  'VarName': 'stl2', 'LongName': 'Soil temperature level 2 (7-28 cm)',  'Units': 'K'},
-        {'Index': 6,  'VarName': 'stl3', 'LongName': 'Soil temperature level 3 (28-100 cm)','Units': 'K'},
-        {'Index': 7,  'VarName': 'stl4', 'LongName': 'Soil temperature level 4 (100-289 cm)','Units': 'K'},
-        {'Index': 57, 'VarName': 'stl1_min', 'LongName': 'Daily minimum soil temperature level 1', 'Units': 'K'},
-        {'Index': 58, 'VarName': 'stl1_max', 'LongName': 'Daily maximum soil temperature level 1', 'Units': 'K'},
-        {'Index': 59, 'VarName': 'stl2_min', 'LongName': 'Daily minimum soil temperature level 2', 'Units': 'K'},
-        {'Index': 60, 'VarName': 'stl2_max', 'LongName': 'Daily maximum soil temperature level 2', 'Units': 'K'},
-        {'Index': 61, 'VarName': 'stl3_min', 'LongName': 'Daily minimum soil temperature level 3', 'Units': 'K'},
-        {'Index': 62, 'VarName': 'stl3_max', 'LongName': 'Daily maximum soil temperature level 3', 'Units': 'K'},
-        {'Index': 63, 'VarName': 'stl4_min', 'LongName': 'Daily minimum soil temperature level 4', 'Units': 'K'},
-        {'Index': 64, 'VarName': 'stl4_max', 'LongName': 'Daily maximum soil temperature level 4', 'Units': 'K'},
-        {'Index': 24, 'VarName': 'vsw1', 'LongName': 'Volumetric soil water layer 1 (0-7 cm)',    'Units': 'm3 m-3'},
-        {'Index': 25, 'VarName': 'vsw2', 'LongName': 'Volumetric soil water layer 2 (7-28 cm)',   'Units': 'm3 m-3'},
-        {'Index': 26, 'VarName': 'vsw3', 'LongName': 'Volumetric soil water layer 3 (28-100 cm)', 'Units': 'm3 m-3'},
-        {'Index': 27, 'VarName': 'vsw4', 'LongName': 'Volumetric soil water layer 4 (100-289 cm)','Units': 'm3 m-3'},
-        {'Index': 97,  'VarName': 'vsw1_min', 'LongName': 'Daily minimum volumetric soil water layer 1', 'Units': 'm3 m-3'},
-        {'Index': 98,  'VarName': 'vsw1_max', 'LongName': 'Daily maximum volumetric soil water layer 1', 'Units': 'm3 m-3'},
-        {'Index': 99,  'VarName': 'vsw2_min', 'LongName': 'Daily minimum volumetric soil water layer 2', 'Units': 'm3 m-3'},
-        {'Index': 100, 'VarName': 'vsw2_max', 'LongName': 'Daily maximum volumetric soil water layer 2', 'Units': 'm3 m-3'},
-        {'Index': 101, 'VarName': 'vsw3_min', 'LongName': 'Daily minimum volumetric soil water layer 3', 'Units': 'm3 m-3'},
-        {'Index': 102, 'VarName': 'vsw3_max', 'LongName': 'Daily maximum volumetric soil water layer 3', 'Units': 'm3 m-3'},
-        {'Index': 103, 'VarName': 'vsw4_min', 'LongName': 'Daily minimum volumetric soil water layer 4', 'Units': 'm3 m-3'},
-        {'Index': 104, 'VarName': 'vsw4_max', 'LongName': 'Daily maximum volumetric soil water layer 4', 'Units': 'm3 m-3'},
-    ]
-    ropr_bands = [
-        {'Index': 40,  'VarName': 'ro',     'LongName': 'Runoff (total)',          'Units': 'm'},
-        {'Index': 42,  'VarName': 'ro_sub', 'LongName': 'Sub-surface runoff',      'Units': 'm'},
-        {'Index': 43,  'VarName': 'ro_sfc', 'LongName': 'Surface runoff',          'Units': 'm'},
-        {'Index': 48,  'VarName': 'tp',     'LongName': 'Total precipitation',     'Units': 'm'},
-        {'Index': 129, 'VarName': 'ro_min',     'LongName': 'Daily minimum runoff',              'Units': 'm'},
-        {'Index': 130, 'VarName': 'ro_max',     'LongName': 'Daily maximum runoff',              'Units': 'm'},
-        {'Index': 133, 'VarName': 'ro_sub_min', 'LongName': 'Daily minimum sub-surface runoff',  'Units': 'm'},
-        {'Index': 134, 'VarName': 'ro_sub_max', 'LongName': 'Daily maximum sub-surface runoff',  'Units': 'm'},
-        {'Index': 135, 'VarName': 'ro_sfc_min', 'LongName': 'Daily minimum surface runoff',      'Units': 'm'},
-        {'Index': 136, 'VarName': 'ro_sfc_max', 'LongName': 'Daily maximum surface runoff',      'Units': 'm'},
-        {'Index': 145, 'VarName': 'tp_min',     'LongName': 'Daily minimum total precipitation', 'Units': 'm'},
-        {'Index': 146, 'VarName': 'tp_max',     'LongName': 'Daily maximum total precipitation', 'Units': 'm'},
-    ]
-
     # ========= 变量粒度选择（新增） =========
     # 为每个已选类别提供具体变量的复选框，默认全选，可自定义取消
     print('正在启动变量选择对话框 (可细化到具体变量)…')
@@ -301,11 +2567,11 @@ def process_era5l_data_multi():
         tk.Button(btn_frame, text='全选', command=select_all, width=8).pack(side='left', padx=4)
         tk.Button(btn_frame, text='全不选', command=unselect_all, width=8).pack(side='left', padx=4)
 
-    if user_wants_evap: build_category_block('Evaporation (蒸发)', evap_bands, evap_var_list)
-    if user_wants_veg:  build_category_block('Vegetation (植被)',   veg_bands,  veg_var_list)
-    if user_wants_rad:  build_category_block('Radiation (辐射)',    rad_bands,  rad_var_list)
-    if user_wants_soil: build_category_block('Soil (土壤)',         soil_bands, soil_var_list)
-    if user_wants_ropr: build_category_block('Runoff+Precip (径流+降水)', ropr_bands, ropr_var_list)
+    if user_wants_evap: build_category_block('Evaporation (蒸发)', EVAP_BANDS, evap_var_list)
+    if user_wants_veg:  build_category_block('Vegetation (植被)',   VEG_BANDS,  veg_var_list)
+    if user_wants_rad:  build_category_block('Radiation (辐射)',    RAD_BANDS,  rad_var_list)
+    if user_wants_soil: build_category_block('Soil (土壤)',         SOIL_BANDS, soil_var_list)
+    if user_wants_ropr: build_category_block('Runoff+Precip (径流+降水)', ROPR_BANDS, ropr_var_list)
 
     # 确认按钮：收集选择结果
     def confirm_variables():
@@ -330,229 +2596,158 @@ def process_era5l_data_multi():
 
     print('\n具体变量选择汇总：')
     if user_wants_evap:
-        print(f"  Evaporation: 已选 {len(selected_evap_bands)}/{len(evap_bands)} 个变量")
+        print(f"  Evaporation: 已选 {len(selected_evap_bands)}/{len(EVAP_BANDS)} 个变量")
     if user_wants_veg:
-        print(f"  Vegetation:  已选 {len(selected_veg_bands)}/{len(veg_bands)} 个变量")
+        print(f"  Vegetation:  已选 {len(selected_veg_bands)}/{len(VEG_BANDS)} 个变量")
     if user_wants_rad:
-        print(f"  Radiation:   已选 {len(selected_rad_bands)}/{len(rad_bands)} 个变量")
+        print(f"  Radiation:   已选 {len(selected_rad_bands)}/{len(RAD_BANDS)} 个变量")
     if user_wants_soil:
-        print(f"  Soil:        已选 {len(selected_soil_bands)}/{len(soil_bands)} 个变量")
+        print(f"  Soil:        已选 {len(selected_soil_bands)}/{len(SOIL_BANDS)} 个变量")
     if user_wants_ropr:
-        print(f"  Runoff+Precip: 已选 {len(selected_ropr_bands)}/{len(ropr_bands)} 个变量")
+        print(f"  Runoff+Precip: 已选 {len(selected_ropr_bands)}/{len(ROPR_BANDS)} 个变量")
     print()
 
-    global_attrs = {
-        'title': 'ERA5-Land daily data from 1950 to present',
-        'long_title': 'hourly-daily sum/24',
-        'Conventions': 'CF-1.6',
-        'Conventions_help': 'http://cfconventions.org/Data/cf-standard-names/docs/guidelines.html',
-        'CreationDate': dt.datetime.now().strftime('%d-%b-%Y %H:%M:%S'),
-        'CreatedBy': 'Changming Li & Assistant - Python 扩展版',
-        'Download_source': 'https://cds.climate.copernicus.eu/cdsapp#!/dataset/reanalysis-era5-land?tab=overview',
-        'contact_info': 'licm@scut.edu.cn'
+    selected = {
+        'evap': selected_evap_bands,
+        'veg':  selected_veg_bands,
+        'rad':  selected_rad_bands,
+        'soil': selected_soil_bands,
+        'ropr': selected_ropr_bands,
     }
-    lat_initial = np.linspace(90, -90, 1800)
-    lon_initial = np.linspace(-180, 180, 3600)
-    new_lat = np.arange(89.95, -90.0, -0.1)
-    new_lon = np.arange(-179.95, 180.0, 0.1)
-
-    date_vec = [start_dt + dt.timedelta(days=i) for i in range((end_dt - start_dt).days + 1)]
-    ok = skip = fail = 0
-    t0 = time.time()
-    print(f'将处理 {len(date_vec)} 天 …')
-
-    for d in date_vec:
-        y, m = d.year, d.month
-        ds_date = d.strftime('%Y%m%d')
-        print(f'\n=== {d:%Y-%m-%d} ===')
-
-        out_evap_nc = os.path.join(OUT_EVAP, str(y), f'{m:02d}', f'ERA5_Land_Daily_ET_{ds_date}.nc')
-        out_veg_nc  = os.path.join(OUT_VEG,  str(y), f'{m:02d}', f'ERA5_Land_Daily_Vegetation_{ds_date}.nc')
-        out_rad_nc  = os.path.join(OUT_RAD,  str(y), f'{m:02d}', f'ERA5_Land_Daily_Radiation_{ds_date}.nc')
-        out_soil_nc = os.path.join(OUT_SOIL, str(y), f'{m:02d}', f'ERA5_Land_Daily_Soil_{ds_date}.nc')
-        out_ropr_nc = os.path.join(OUT_ROPR, str(y), f'{m:02d}', f'ERA5_Land_Daily_RunoffPrecip_{ds_date}.nc')
-
-        # —— 按需判断每个类别是否需要写出（结合用户选择和文件存在性） ——
-        need_evap = user_wants_evap and selected_evap_bands and (not os.path.isfile(out_evap_nc))
-        need_veg  = user_wants_veg  and selected_veg_bands  and (not os.path.isfile(out_veg_nc))
-        need_rad  = user_wants_rad  and selected_rad_bands  and (not os.path.isfile(out_rad_nc))
-        need_soil = user_wants_soil and selected_soil_bands and (not os.path.isfile(out_soil_nc))
-        need_ropr = user_wants_ropr and selected_ropr_bands and (not os.path.isfile(out_ropr_nc))
-
-        if not any([need_evap, need_veg, need_rad, need_soil, need_ropr]):
-            print('  当日所有已选类别的产物均已存在（或未选择任何类别），跳过写出。')
-            skip += 1
-            continue
-
-        # 依据“需要”的类别汇总所需波段索引，避免不必要读取
-        bands_by_cat = []
-        if need_evap: bands_by_cat += selected_evap_bands
-        if need_veg:  bands_by_cat += selected_veg_bands
-        if need_rad:  bands_by_cat += selected_rad_bands
-        if need_soil: bands_by_cat += selected_soil_bands
-        if need_ropr: bands_by_cat += selected_ropr_bands
-        needed_indices = sorted(set([b['Index'] for b in bands_by_cat]))
-        evap_index_set = {b['Index'] for b in selected_evap_bands}
-
-        try:
-            day_start_time = time.time()
-            in_dir = os.path.join(BASE_INPUT_DIR, str(y), f'{m:02d}')
-            tif_list = sorted(glob.glob(os.path.join(in_dir, f'ERA5_LAND_DAILY_{ds_date}*.tif')))
-            if len(tif_list) != 2:
-                print(f'  未找到2块tif（找到{len(tif_list)}），跳过。')
-                fail += 1
-                continue
-
-            print('  读取所需波段中 (使用并行I/O) …')
-            read_start_time = time.time()
-
-            # 定义辅助函数：读取单个TIF文件的指定波段
-            def read_tif_bands(tif_path, band_indices):
-                """
-                读取指定TIF文件的所需波段
-
-                Args:
-                    tif_path: TIF文件路径
-                    band_indices: 需要读取的波段索引列表
-
-                Returns:
-                    读取到的波段数据 (n_bands, height, width)
-                """
-                with rasterio.open(tif_path) as src:
-                    bands = src.read(band_indices)
-                return bands
-
-            # 使用 ThreadPoolExecutor 并行读取两个TIF文件
-            with ThreadPoolExecutor(max_workers=2) as executor:
-                # 并行提交两个读取任务
-                future_s1 = executor.submit(read_tif_bands, tif_list[0], needed_indices)
-                future_s2 = executor.submit(read_tif_bands, tif_list[1], needed_indices)
-
-                # 获取两个future的结果
-                s1_bands = future_s1.result()  # shape: (n_bands, height, width)
-                s2_bands = future_s2.result()  # shape: (n_bands, height, width)
-
-            # 拼接两个半球数据
-            full_bands = np.concatenate((s1_bands, s2_bands), axis=2).astype(np.float32)
-
-            # 向量化处理蒸发数据的缩放 - 性能优化
-            evap_positions = [i for i, idx in enumerate(needed_indices) if idx in evap_index_set]
-            if evap_positions:
-                full_bands[evap_positions] *= -1000.0
-
-            # 构建索引映射
-            idx_to_position = {idx: i for i, idx in enumerate(needed_indices)}
-
-            # 函数：从全数据中提取指定波段的数据
-            def get_band_data(band_idx):
-                return full_bands[idx_to_position[band_idx]]
-
-            read_time = time.time() - read_start_time
-            print(f'  波段读取完成 (并行I/O)，耗时: {read_time:.2f}秒')
-            
-            process_start_time = time.time()
-
-            def build_dataset(band_list):
-                data_vars = {}
-                for b in band_list:
-                    # 使用优化后的数据访问方式
-                    data_vars[b['VarName']] = xr.DataArray(
-                        get_band_data(b['Index']), dims=['lat','lon'], name=b['VarName'],
-                        attrs={'long_name': b['LongName'], 'units': b['Units']}
-                    )
-                ds = xr.Dataset(data_vars,
-                                coords={'lat': ('lat', lat_initial), 'lon': ('lon', lon_initial)},
-                                attrs={'Conventions':'CF-1.6'})
-                ds['lat'].attrs = {'units':'degrees_north', 'long_name':'latitude'}
-                ds['lon'].attrs = {'units':'degrees_east',  'long_name':'longitude'}
-                return ds
-
-            def finalize(ds):
-                ds = ds.assign_coords(lat=('lat', new_lat), lon=('lon', new_lon))
-                ds.attrs.update(global_attrs)
-                ds.attrs['ProcessingStatus'] = f'Finalized on {dt.datetime.now():%Y-%m-%d %H:%M:%S}'
-                return ds
-
-            # —— 仅对需要的类别构建与写出 ——
-            def save_nc(ds, path):
-                os.makedirs(os.path.dirname(path), exist_ok=True)
-                enc = {v:{'zlib':True,'complevel':5} for v in ds.data_vars}
-                ds.to_netcdf(path, encoding=enc)
-
-            if need_evap:
-                ds_evap = finalize(build_dataset(selected_evap_bands))
-                if APPLY_EVAP_SWAP:
-                    # 优化：使用numpy操作进行交换，避免深拷贝
-                    es_data = ds_evap['Es'].values.copy()
-                    ew_data = ds_evap['Ew'].values.copy()
-                    et_data = ds_evap['Et'].values.copy()
-                    ds_evap['Es'].values = ew_data
-                    ds_evap['Ew'].values = et_data
-                    ds_evap['Et'].values = es_data
-                    del es_data, ew_data, et_data  # 释放临时数组
-                save_nc(ds_evap, out_evap_nc)
-                print('  写出 Evap 完成。')
-                del ds_evap; gc.collect()  # 及时释放内存
-            else:
-                print('  Evap 已存在，跳过写出。')
-
-            if need_veg:
-                ds_veg = finalize(build_dataset(selected_veg_bands))
-                save_nc(ds_veg, out_veg_nc)
-                print('  写出 Vegetation 完成。')
-                del ds_veg; gc.collect()  # 及时释放内存
-            else:
-                print('  Vegetation 已存在，跳过写出。')
-
-            if need_rad:
-                ds_rad = finalize(build_dataset(selected_rad_bands))
-                save_nc(ds_rad, out_rad_nc)
-                print('  写出 Radiation 完成。')
-                del ds_rad; gc.collect()  # 及时释放内存
-            else:
-                print('  Radiation 已存在，跳过写出。')
-
-            if need_soil:
-                ds_soil = finalize(build_dataset(selected_soil_bands))
-                save_nc(ds_soil, out_soil_nc)
-                print('  写出 Soil 完成。')
-                del ds_soil; gc.collect()  # 及时释放内存
-            else:
-                print('  Soil 已存在，跳过写出。')
-
-            if need_ropr:
-                ds_ropr = finalize(build_dataset(selected_ropr_bands))
-                save_nc(ds_ropr, out_ropr_nc)
-                print('  写出 Runoff+Precip 完成。')
-                del ds_ropr; gc.collect()  # 及时释放内存
-            else:
-                print('  Runoff+Precip 已存在，跳过写出。')
-
-            # 释放主要数据结构
-            del full_bands
-            gc.collect()
-            
-            process_time = time.time() - process_start_time
-            day_total_time = time.time() - day_start_time
-            print(f'  处理耗时: {process_time:.2f}秒, 本日总耗时: {day_total_time:.2f}秒')
-            
-            ok += 1
-            print('  本日完成。')
-
-        except Exception:
-            print('  失败，执行清理。', file=sys.stderr)
-            traceback.print_exc()
-            # 不删除已存在的历史产物；仅清理本轮新写入的半成品
-            for f in [out_evap_nc, out_veg_nc, out_rad_nc, out_soil_nc, out_ropr_nc]:
-                try:
-                    if os.path.isfile(f) and os.path.getsize(f)==0:
-                        os.remove(f)
-                except Exception:
-                    pass
-            fail += 1
-
-    print('\n==== 总结 ====')
-    print(f'成功: {ok} 跳过: {skip} 失败: {fail} 用时: {(time.time()-t0)/60:.2f} 分钟')
+    run_era5l_multi(BASE_INPUT_DIR, out_dirs, start_dt, end_dt, selected)
+
+
+def main(argv=None):
+    """命令行入口：不带参数时启动交互式处理，子命令用于辅助工具"""
+    parser = argparse.ArgumentParser(description='ERA5-Land GeoTIFF -> NetCDF (Multi-Category)')
+    sub = parser.add_subparsers(dest='command')
+
+    p = sub.add_parser('bench-encoding', help='在样例日上比较各压缩/分块方案')
+    p.add_argument('--input', required=True, help='基础输入目录 (其下为 yyyy/mm 子目录)')
+    p.add_argument('--date', required=True, help='样例日期 yyyymmdd')
+    p.add_argument('--work-dir', required=True, help='临时输出目录')
+    p.add_argument('--categories', nargs='+', choices=[spec['Key'] for spec in CATEGORY_SPECS])
+    p.add_argument('--profiles', nargs='+', choices=sorted(ENCODING_PROFILES))
+    p.add_argument('--pack', action='store_true', help='同时比较 int16 打包 (PACK_INT16) 并报告往返误差')
+    p.add_argument('--land', action='store_true', help='同时比较陆地格点存储 (LAND_GATHER) 并报告各类别的节省')
+    p.add_argument('--box', nargs=4, type=float, metavar=('LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX'),
+                   default=(20.0, 50.0, 100.0, 140.0), help='区域读取范围（默认东亚）')
+
+    p = sub.add_parser('bench-writer', help='比较 xarray 写出与模板直接写出 (NC_WRITER) 并核对文件结构')
+    p.add_argument('--input', required=True, help='基础输入目录 (其下为 yyyy/mm 子目录)')
+    p.add_argument('--date', required=True, help='样例日期 yyyymmdd')
+    p.add_argument('--work-dir', required=True, help='临时输出目录')
+    p.add_argument('--categories', nargs='+', choices=[spec['Key'] for spec in CATEGORY_SPECS])
+    p.add_argument('--profile', choices=sorted(ENCODING_PROFILES), help='压缩方案（默认按 CATEGORY_ENCODING）')
+    p.add_argument('--repeats', type=int, default=3, help='每种方式重复次数')
+    p.add_argument('--pack', action='store_true', help='启用 int16 打包 (PACK_INT16)')
+
+    p = sub.add_parser('worker', help='非交互处理日期范围；配合 --claim-dir 可在多台机器/多个进程上分布式运行')
+    p.add_argument('--input', required=True, help='基础输入目录 (其下为 yyyy/mm 子目录)')
+    p.add_argument('--output', required=True, help='基础输出目录（与交互式流程选择的目录相同）')
+    p.add_argument('--start', required=True, help='开始日期 yyyymmdd')
+    p.add_argument('--end', required=True, help='结束日期 yyyymmdd')
+    p.add_argument('--categories', nargs='+', choices=[spec['Key'] for spec in CATEGORY_SPECS],
+                   help='处理的类别（全部变量），默认全部')
+    p.add_argument('--claim-dir', help='共享锁目录 (CLAIM_DIR)；所有工作进程须使用同一目录')
+    p.add_argument('--lease', type=float, default=CLAIM_LEASE_S, help='认领租约（秒）')
+
+    p = sub.add_parser('manifest-verify', help='并行复核完成清单中登记的输出')
+    p.add_argument('--manifest', required=True, help='清单路径 (SQLite)')
+    p.add_argument('--checksum', action='store_true', help='计算校验和：已有的比较，尚无的保存为基准（默认只比较文件大小与修改时间）')
+    p.add_argument('--workers', type=int, default=8, help='并行线程数')
+    p.add_argument('--prune', action='store_true', help='删除失效记录，下次运行时重新生成')
+
+    p = sub.add_parser('metrics-summary', help='汇总指标 JSONL 中各阶段耗时的 p50/p95')
+    p.add_argument('--metrics', required=True, help='指标文件 (METRICS_PATH)')
+
+    p = sub.add_parser('qc-report', help='汇总 QC 报告 (QC_REPORT_PATH) 中某次运行的检查结果')
+    p.add_argument('--report', required=True, help='QC 报告 (JSONL)')
+    p.add_argument('--run', help='运行标识（默认最后一次运行）')
+
+    p = sub.add_parser('manifest-scan', help='将已有的逐日输出登记到完成清单')
+    p.add_argument('--manifest', required=True, help='清单路径 (SQLite)')
+    p.add_argument('--output', required=True, help='基础输出目录（与交互式流程选择的目录相同）')
+    p.add_argument('--workers', type=int, default=8, help='并行线程数')
+
+    p = sub.add_parser('aggregate-climatology', help='由月聚合 (AGGREGATE_PERIODS) 合并多年逐月气候态')
+    p.add_argument('--output', required=True, help='基础输出目录（与交互式流程选择的目录相同）')
+    p.add_argument('--categories', nargs='+', choices=[spec['Key'] for spec in CATEGORY_SPECS])
+    p.add_argument('--years', nargs=2, type=int, metavar=('FIRST', 'LAST'), help='参与合并的年份范围（含）')
+    p.add_argument('--profile', choices=sorted(ENCODING_PROFILES), help='压缩方案（默认按 CATEGORY_ENCODING）')
+
+    p = sub.add_parser('ref-index', help='由已有日文件并行重建各类别的引用索引 (REF_INDEX)')
+    p.add_argument('--output', required=True, help='基础输出目录（与交互式流程选择的目录相同）')
+    p.add_argument('--categories', nargs='+', choices=[spec['Key'] for spec in CATEGORY_SPECS])
+    p.add_argument('--workers', type=int, default=4, help='生成片段的进程数')
+    p.add_argument('--force', action='store_true', help='重新生成全部片段（默认只生成缺失或早于日文件的片段）')
+
+    p = sub.add_parser('rechunk', help='将逐日输出重排为按时间方向分块的时间序列存储（站点长序列提取）')
+    p.add_argument('--output', required=True, help='基础输出目录（与交互式流程选择的目录相同）')
+    p.add_argument('--start', required=True, help='开始日期 yyyymmdd')
+    p.add_argument('--end', required=True, help='结束日期 yyyymmdd')
+    p.add_argument('--categories', nargs='+', choices=[spec['Key'] for spec in CATEGORY_SPECS])
+    p.add_argument('--chunks', nargs=3, type=int, metavar=('TIME', 'LAT', 'LON'),
+                   help='目标分块，TIME 为 0 表示整个日期范围（默认 RECHUNK_CHUNKS）')
+    p.add_argument('--memory-gb', type=float, default=RECHUNK_MEMORY_GB, help='内存预算 (GB)')
+    p.add_argument('--workers', type=int, default=1, help='并行重排的变量数（进程数）')
+
+    p = sub.add_parser('extract-points', help='从时间序列存储提取站点（最近格点）的逐日序列')
+    p.add_argument('--store', required=True, help='时间序列存储 (rechunk 的输出)')
+    p.add_argument('--points', required=True, help='站点 CSV，含 lat、lon 列，可选 name 列')
+    p.add_argument('--out', required=True, help='输出文件：.nc 写出 NetCDF，其他扩展名写出 CSV（长表）')
+    p.add_argument('--vars', nargs='+', help='变量名（默认全部）')
+    p.add_argument('--start', help='开始日期 yyyymmdd')
+    p.add_argument('--end', help='结束日期 yyyymmdd')
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        process_era5l_data_multi()
+    elif args.command == 'bench-encoding':
+        benchmark_encodings(args.input, dt.datetime.strptime(args.date, '%Y%m%d'), args.work_dir,
+                            args.categories, args.profiles, box=tuple(args.box), pack=args.pack, land=args.land)
+    elif args.command == 'bench-writer':
+        benchmark_writers(args.input, dt.datetime.strptime(args.date, '%Y%m%d'), args.work_dir,
+                          args.categories, args.profile, args.repeats, args.pack)
+    elif args.command == 'worker':
+        keys = args.categories or [spec['Key'] for spec in CATEGORY_SPECS]
+        selected = {spec['Key']: spec['Bands'] for spec in CATEGORY_SPECS if spec['Key'] in keys}
+        counts = run_era5l_multi(args.input, default_out_dirs(args.output), dt.datetime.strptime(args.start, '%Y%m%d'),
+                                 dt.datetime.strptime(args.end, '%Y%m%d'), selected,
+                                 claim_dir=args.claim_dir, claim_lease_s=args.lease)
+        sys.exit(1 if counts['fail'] else 0)
+    elif args.command == 'manifest-verify':
+        era5l_manifest.verify(args.manifest, args.checksum, args.workers, args.prune)
+    elif args.command == 'metrics-summary':
+        era5l_metrics.summarize(args.metrics)
+    elif args.command == 'qc-report':
+        era5l_qc.summarize(args.report, args.run)
+    elif args.command == 'manifest-scan':
+        era5l_manifest.scan(args.manifest, default_out_dirs(args.output),
+                            {spec['FileTag']: spec['Key'] for spec in CATEGORY_SPECS}, args.workers)
+    elif args.command == 'aggregate-climatology':
+        encoding = {key: args.profile for key in CATEGORY_ENCODING} if args.profile else None
+        monthly_climatology(default_out_dirs(args.output), args.categories, args.years, encoding)
+    elif args.command == 'ref-index':
+        rebuild_ref_indexes(default_out_dirs(args.output), args.categories, args.workers, args.force)
+    elif args.command == 'rechunk':
+        chunks = RECHUNK_CHUNKS if args.chunks is None else (args.chunks[0] or None, args.chunks[1], args.chunks[2])
+        rechunk_timeseries(default_out_dirs(args.output), dt.datetime.strptime(args.start, '%Y%m%d'),
+                           dt.datetime.strptime(args.end, '%Y%m%d'), args.categories, chunks, args.memory_gb,
+                           args.workers)
+    elif args.command == 'extract-points':
+        with open(args.points, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        t = time.time()
+        ds = era5l_rechunk.extract_points(args.store, [float(r['lat']) for r in rows], [float(r['lon']) for r in rows],
+                                          args.vars, args.start, args.end,
+                                          [r['name'] for r in rows] if rows and 'name' in rows[0] else None)
+        if args.out.endswith('.nc'):
+            ds.to_netcdf(args.out)
+        else:
+            ds.to_dataframe().to_csv(args.out)
+        print(f"提取 {ds.sizes['point']} 个站点 x {ds.sizes['time']} 天 x {len(ds.data_vars)} 个变量，"
+              f"耗时 {time.time() - t:.2f}秒 -> {args.out}")
 
 if __name__ == '__main__':
-    process_era5l_data_multi()
+    main()
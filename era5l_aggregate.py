@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 月/年聚合的流式累加器
+--------------------------------------------------------------------
+- 每个 (类别, 周期) 一个累加器，逐格点保存 count / Welford 均值与离差平方和 (M2) / min / max，
+  每日整幅数据在写出后直接累加，无需之后重新读取日文件；缺测 (NaN) 不计入
+- 累加器可保存为 .npz 检查点（先写临时文件再原子重命名），记录已累加的日期，重新运行时据此续算
+- 周期结束时输出 <变量>_mean / _std（样本标准差）/ _min / _max / _count；
+  多个周期的结果可按 Chan 合并公式精确合并（merge），用于由月聚合计算多年逐月气候态
+
+累加器状态为 float32（count 为 int16），每个变量每个格点 18 字节，全球网格约 117 MB。
+"""
+
+import os
+import datetime as dt
+import warnings
+import numpy as np
+import xarray as xr
+
+import era5l_cube
+import era5l_journal
+
+AGGREGATE_PERIODS = ('month', 'year')
+STATS = ('mean', 'std', 'min', 'max', 'count')
+STATE_BYTES_PER_CELL = 2 + 4 * 4   # count (int16) + mean / m2 / min / max (float32)
+
+
+def state_bytes(n_vars, shape):
+    """n_vars 个变量在 shape (lat, lon) 网格上的累加器大小（字节）"""
+    return n_vars * shape[0] * shape[1] * STATE_BYTES_PER_CELL
+
+
+def period_days(d, period):
+    """d 所在月/年的全部日期"""
+    start = era5l_cube.period_start(d, period)
+    return [start + dt.timedelta(days=i) for i in range(era5l_cube.period_length(d, period))]
+
+
+def is_last_day(d, period):
+    """d 是否为所在月/年的最后一天"""
+    return era5l_cube.period_start(d + dt.timedelta(days=1), period) != era5l_cube.period_start(d, period)
+
+
+def period_label(d, period):
+    return f'{d:%Y%m}' if period == 'month' else f'{d:%Y}'
+
+
+def new_state(names, shape):
+    """空累加器：names 为变量名列表，shape 为 (lat, lon)"""
+    n = len(names)
+    return {
+        'names': list(names),
+        'dates': set(),
+        'count': np.zeros((n,) + tuple(shape), dtype=np.int16),
+        'mean': np.zeros((n,) + tuple(shape), dtype=np.float32),
+        'm2': np.zeros((n,) + tuple(shape), dtype=np.float32),
+        'min': np.full((n,) + tuple(shape), np.inf, dtype=np.float32),
+        'max': np.full((n,) + tuple(shape), -np.inf, dtype=np.float32),
+        'pending': 0,  # 上次保存检查点之后累加的天数
+    }
+
+
+def update(state, d, arrays):
+    """
+    将某日数据累加到 state（该日已累加过时不做任何事）
+
+    Args:
+        state: new_state() / load_state() 的返回值
+        d: 日期
+        arrays: 与 state['names'] 顺序一致的 (lat, lon) float32 数组序列
+
+    Returns:
+        是否累加了该日
+    """
+    if d in state['dates']:
+        return False
+    for i, x in enumerate(arrays):
+        valid = ~np.isnan(x)
+        count, mean = state['count'][i], state['mean'][i]
+        count += valid
+        delta = np.where(valid, x - mean, 0)
+        mean += delta / np.maximum(count, 1)
+        state['m2'][i] += delta * np.where(valid, x - mean, 0)
+        np.fmin(state['min'][i], x, out=state['min'][i])
+        np.fmax(state['max'][i], x, out=state['max'][i])
+    state['dates'].add(d)
+    state['pending'] += 1
+    return True
+
+
+def statistics(state):
+    """{变量名: {'mean', 'std', 'min', 'max', 'count'}}；无有效值的格点为 NaN（std 需至少 2 个值）"""
+    out = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for i, name in enumerate(state['names']):
+            count = state['count'][i]
+            out[name] = {
+                'mean': np.where(count > 0, state['mean'][i], np.nan).astype(np.float32),
+                'std': np.where(count > 1, np.sqrt(state['m2'][i] / (count - 1)), np.nan).astype(np.float32),
+                'min': np.where(count > 0, state['min'][i], np.nan).astype(np.float32),
+                'max': np.where(count > 0, state['max'][i], np.nan).astype(np.float32),
+                'count': count,
+            }
+    return out
+
+
+def merge(acc, stats):
+    """
+    按 Chan 合并公式将一组统计量并入 acc（acc 为 None 时以 stats 初始化）
+
+    Args:
+        acc: {'count', 'mean', 'm2', 'min', 'max'} 或 None
+        stats: statistics() 格式的单个变量统计量（可由聚合文件读回）
+
+    Returns:
+        合并后的 acc
+    """
+    count = stats['count'].astype(np.int32)
+    mean = np.nan_to_num(stats['mean']).astype(np.float64)
+    m2 = np.nan_to_num(stats['std']).astype(np.float64) ** 2 * np.maximum(count - 1, 0)
+    if acc is None:
+        return {'count': count, 'mean': mean, 'm2': m2, 'min': stats['min'], 'max': stats['max']}
+    total = acc['count'] + count
+    delta = mean - acc['mean']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(total > 0, count / total, 0)
+    acc['m2'] = acc['m2'] + m2 + delta ** 2 * acc['count'] * ratio
+    acc['mean'] = acc['mean'] + delta * ratio
+    acc['count'] = total
+    acc['min'] = np.fmin(acc['min'], stats['min'])
+    acc['max'] = np.fmax(acc['max'], stats['max'])
+    return acc
+
+
+def merged_statistics(acc):
+    """merge() 结果转换为 statistics() 格式"""
+    count = acc['count']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'mean': np.where(count > 0, acc['mean'], np.nan).astype(np.float32),
+            'std': np.where(count > 1, np.sqrt(acc['m2'] / (count - 1)), np.nan).astype(np.float32),
+            'min': acc['min'].astype(np.float32),
+            'max': acc['max'].astype(np.float32),
+            'count': count.astype(np.int32),
+        }
+
+
+def build_dataset(stats, band_list, lat, lon, attrs):
+    """
+    聚合输出 Dataset：每个变量写出 <变量>_mean / _std / _min / _max / _count
+
+    Args:
+        stats: statistics() / merged_statistics() 的结果 {变量名: 统计量}
+        band_list: 变量表（提供 long_name / units）
+        lat, lon: 坐标
+        attrs: 全局属性
+    """
+    data_vars = {}
+    for b in band_list:
+        for stat in STATS:
+            units = '1' if stat == 'count' else b['Units']
+            long_name = 'number of valid days' if stat == 'count' else f"{stat} of daily {b['LongName']}"
+            data_vars[f"{b['VarName']}_{stat}"] = xr.DataArray(
+                stats[b['VarName']][stat], dims=['lat', 'lon'], attrs={'long_name': long_name, 'units': units})
+    ds = xr.Dataset(data_vars, coords={'lat': ('lat', lat), 'lon': ('lon', lon)}, attrs=dict(attrs))
+    ds['lat'].attrs = {'units': 'degrees_north', 'long_name': 'latitude'}
+    ds['lon'].attrs = {'units': 'degrees_east', 'long_name': 'longitude'}
+    return ds
+
+
+def read_statistics(path, names):
+    """从聚合文件读回各变量的统计量 {变量名: {'mean', 'std', 'min', 'max', 'count'}}"""
+    with xr.open_dataset(path) as ds:
+        return {name: {stat: ds[f'{name}_{stat}'].values for stat in STATS} for name in names}
+
+
+def save_state(state, path):
+    """原子保存检查点 (.npz)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = era5l_journal.temp_path(path)
+    dates = np.array(sorted(int(f'{d:%Y%m%d}') for d in state['dates']), dtype=np.int64)
+    with open(tmp, 'wb') as f:  # 传入文件对象，np.savez 不会追加 .npz 后缀
+        np.savez(f, names=np.array(state['names']), dates=dates, count=state['count'], mean=state['mean'],
+                 m2=state['m2'], min=state['min'], max=state['max'])
+    os.replace(tmp, path)
+    state['pending'] = 0
+
+
+def load_state(path, names, shape):
+    """
+    载入检查点；不存在或变量/网格与本次运行不一致时返回 None
+
+    Returns:
+        累加器状态或 None
+    """
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as f:
+        if list(f['names']) != list(names) or f['count'].shape[1:] != tuple(shape):
+            return None
+        state = {k: f[k] for k in ('count', 'mean', 'm2', 'min', 'max')}
+        state['dates'] = {dt.datetime.strptime(str(v), '%Y%m%d') for v in f['dates']}
+    state['names'] = list(names)
+    state['pending'] = 0
+    return state
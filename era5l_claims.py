@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多机分布式处理：在共享目录中以锁文件认领 (日期, 类别) 单元
+--------------------------------------------------------------------
+- 每个单元一个锁文件 <CLAIM_DIR>/<yyyymmdd>_<类别>.lock，以 O_CREAT | O_EXCL 创建，只有一个工作进程能成功；
+  内容为认领者（主机:进程号）与认领时间
+- 持有的锁由后台线程定期刷新修改时间（心跳）；修改时间超过租约的锁视为崩溃的工作进程遗留，
+  其他工作进程先将其改名（只有一个能改名成功）再重新创建，从而接管该单元；
+  改名后再次核对移走的锁，若其实是其他工作进程刚接管时新建的锁（检查与改名之间被抢先），则放回原处
+- 单元处理结束（成功或失败）后删除自己的锁文件（已被接管的锁属于接管者，不删除）；是否已完成仍以输出文件是否存在判断
+
+租约判断比较锁文件的修改时间与本机时钟，各节点需保持时钟同步 (NTP)，租约应远大于时钟偏差与单日处理时间的波动。
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+import datetime as dt
+
+
+def worker_id():
+    """当前工作进程的标识：主机名:进程号"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def lock_path(claim_dir, d, key):
+    return os.path.join(claim_dir, f'{d:%Y%m%d}_{key}.lock')
+
+
+def lock_owner(path):
+    """锁文件记录的认领者；锁不存在或内容不完整时返回 None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('owner')
+    except (OSError, ValueError):
+        return None
+
+
+def try_claim(claim_dir, d, key, lease_s, owner):
+    """
+    尝试认领一个单元
+
+    Args:
+        claim_dir: 共享锁目录
+        d: 日期
+        key: 类别 Key
+        lease_s: 租约（秒）；锁文件超过此时长未刷新即可被接管
+        owner: worker_id()
+
+    Returns:
+        认领成功时返回锁文件路径，否则返回 None
+    """
+    path = lock_path(claim_dir, d, key)
+    for _ in range(2):  # 接管过期锁后再尝试创建一次
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            if not _take_over_expired(path, lease_s, owner):
+                return None
+            continue
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'owner': owner, 'date': f'{d:%Y-%m-%d}', 'category': key,
+                       'claimed': dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, f)
+        return path
+    return None
+
+
+def _take_over_expired(path, lease_s, owner):
+    """
+    锁已过期时将其移走并返回 True（调用方随后重新创建）；未过期或被其他工作进程抢先接管时返回 False
+
+    检查修改时间与改名之间，其他工作进程可能已接管并新建了锁，此时改名移走的是新锁：
+    改名后重新检查移走的文件，修改时间在租约内或认领者已变化时放回原处并返回 False。
+    """
+    try:
+        age = time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return True  # 刚被释放
+    if age < lease_s:
+        return False
+    previous = lock_owner(path)
+    expired = f"{path}.{owner.replace(':', '_')}.expired"
+    try:
+        os.rename(path, expired)  # 同一时刻只有一个工作进程能改名成功
+    except FileNotFoundError:
+        return False
+    try:
+        fresh = time.time() - os.stat(expired).st_mtime < lease_s
+    except FileNotFoundError:
+        return False
+    if fresh or lock_owner(expired) != previous:
+        try:
+            os.link(expired, path)  # 不覆盖：期间若已有新锁，以新锁为准
+        except FileExistsError:
+            pass
+        os.remove(expired)
+        return False
+    os.remove(expired)
+    print(f'  接管过期的认领 {os.path.basename(path)}（{previous}，{age:.0f} 秒未续期）')
+    return True
+
+
+def release(path, owner, held=None):
+    """
+    释放锁并从 held 中移除；只删除 owner 自己的锁
+
+    租约过期后锁可能已被其他工作进程接管，此时锁文件属于接管者，删除它会让第三个工作进程
+    在接管者仍在写出时再次认领该单元，因此保留不动。
+    """
+    if held is not None:
+        held.discard(path)
+    if lock_owner(path) != owner:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def start_heartbeat(held, interval, owner):
+    """
+    启动心跳线程：每 interval 秒刷新 held 中各锁文件的修改时间
+
+    锁已被其他工作进程接管（租约过期）时打印警告并从 held 中移除；锁暂时不存在（其他工作进程
+    核对接管时短暂移走）时跳过本次刷新。
+    本进程仍会完成该单元，输出为原子写出，后写完的一方覆盖先写完的一方。
+
+    Returns:
+        threading.Event，set() 后心跳线程退出
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            for path in list(held):
+                owner_now = lock_owner(path)
+                if path not in held:  # 主线程刚释放
+                    continue
+                if owner_now is None:  # 暂时不存在或正在写入，下次再刷新
+                    continue
+                if owner_now != owner:
+                    print(f'  认领已失效（租约过期被接管）: {os.path.basename(path)}')
+                    held.discard(path)
+                    continue
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    pass
+
+    threading.Thread(target=beat, name='claim-heartbeat', daemon=True).start()
+    return stop
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 各类别的月/年堆叠 NetCDF 输出 (cube)
+--------------------------------------------------------------------
+- 每个类别每月（或每年）一个文件：ERA5_Land_Daily_<类别>_YYYYMM.nc / ERA5_Land_Daily_<类别>_YYYY.nc
+- 文件创建时即包含整个周期的 time 坐标（days since 周期首日），每天写入自身的 time 切片，
+  未处理的日期读出为 NaN，因此不完整的月份也可正常打开
+- complete 变量 (time, variable) 记录每天已写入的变量；规划阶段每个周期文件只打开一次，
+  代替逐日逐类别的 os.path.isfile 检查，重新运行时跳过已写入的日期
+- 每天写入时以追加模式打开、写完即关闭，避免进程中断时整个周期文件处于未关闭状态
+
+HDF5 不支持多个进程同时写同一文件，因此 cube 模式只在主进程中按日期顺序写出。
+
+与日文件不同，cube 是原地追加写入（没有临时文件与原子重命名：每天复制整个周期文件代价过高），
+写入过程中进程被杀可能损坏已有多日数据的周期文件。规划阶段 load_done 无法读取的周期文件
+会被改名为 <文件名>.damaged 移到一旁并视为空文件，本次运行重新生成范围内的日期；
+该周期中本次运行范围之外的日期与未选择的变量需另行重新运行补齐。
+"""
+
+import os
+import calendar
+import datetime as dt
+import numpy as np
+import netCDF4
+
+CUBE_PERIODS = ('month', 'year')
+
+
+def period_start(d, period):
+    return dt.datetime(d.year, d.month, 1) if period == 'month' else dt.datetime(d.year, 1, 1)
+
+
+def period_length(d, period):
+    """周期内的天数"""
+    if period == 'month':
+        return calendar.monthrange(d.year, d.month)[1]
+    return 366 if calendar.isleap(d.year) else 365
+
+
+def cube_path(out_dir, file_tag, d, period):
+    """某日所在周期文件的路径（月文件按 yyyy 子目录存放）"""
+    if period == 'month':
+        return os.path.join(out_dir, str(d.year), f'ERA5_Land_Daily_{file_tag}_{d:%Y%m}.nc')
+    return os.path.join(out_dir, f'ERA5_Land_Daily_{file_tag}_{d:%Y}.nc')
+
+
+def load_done(path, band_list, d, period):
+    """
+    读取周期文件中已选变量均已写入的日期
+
+    Args:
+        path: 周期文件路径（不存在时返回空集合）
+        band_list: 已选变量
+        d: 周期内任一日期
+        period: 'month' 或 'year'
+
+    Returns:
+        set: 已完成日期
+    """
+    if not os.path.isfile(path):
+        return set()
+    names = [b['VarName'] for b in band_list]
+    try:
+        with netCDF4.Dataset(path) as nc:
+            complete = nc.variables['complete']
+            slots = complete.getncattr('variables').split()
+            if any(n not in slots for n in names):
+                return set()
+            flags = complete[:, [slots.index(n) for n in names]]
+            for n in names:  # 读取各变量的元数据，尽早发现损坏
+                if n in nc.variables:
+                    nc.variables[n].chunking()
+    except (OSError, RuntimeError, KeyError, AttributeError, IndexError) as e:
+        damaged = set_aside(path)
+        print(f"  警告: 周期文件无法读取 ({e})，已移至 {damaged}，将重新生成")
+        return set()
+    start = period_start(d, period)
+    return {start + dt.timedelta(days=int(i)) for i in np.flatnonzero(np.asarray(flags).all(axis=1))}
+
+
+def set_aside(path):
+    """将损坏的周期文件改名为 <path>.damaged（覆盖此前移开的同名文件），返回新路径"""
+    damaged = f'{path}.damaged'
+    os.replace(path, damaged)
+    return damaged
+
+
+def _create_cube(path, category_bands, d, period, lat, lon, global_attrs):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    start = period_start(d, period)
+    n_time = period_length(d, period)
+    nc = netCDF4.Dataset(path, 'w', format='NETCDF4')
+    nc.createDimension('time', n_time)
+    nc.createDimension('lat', len(lat))
+    nc.createDimension('lon', len(lon))
+    nc.createDimension('variable', len(category_bands))
+    t = nc.createVariable('time', 'i4', ('time',))
+    t.setncatts({'units': f'days since {start:%Y-%m-%d}', 'calendar': 'standard', 'long_name': 'time'})
+    t[:] = np.arange(n_time, dtype='i4')
+    for name, values, units in (('lat', lat, 'degrees_north'), ('lon', lon, 'degrees_east')):
+        coord = nc.createVariable(name, 'f8', (name,))
+        coord.setncatts({'units': units, 'long_name': 'latitude' if name == 'lat' else 'longitude'})
+        coord[:] = values
+    complete = nc.createVariable('complete', 'i1', ('time', 'variable'), fill_value=False)
+    complete.setncatts({'long_name': 'variable written for this day (1) or not (0)',
+                        'variables': ' '.join(b['VarName'] for b in category_bands)})
+    complete[:] = 0
+    attrs = {'Conventions': 'CF-1.6'}
+    attrs.update(global_attrs)
+    attrs['ProcessingStatus'] = f'Created on {dt.datetime.now():%Y-%m-%d %H:%M:%S}'
+    nc.setncatts(attrs)
+    return nc
+
+
+def write_day(path, d, period, category_bands, band_list, arrays, lat, lon, global_attrs, encoding):
+    """
+    将某日的各变量写入周期文件中的 time 切片，并标记这些变量已写入
+
+    文件不存在时创建；已选变量在文件中不存在时追加为新变量。
+
+    Args:
+        path: 周期文件路径
+        d: 日期
+        period: 'month' 或 'year'
+        category_bands: 该类别完整变量表（决定 complete 的变量顺序）
+        band_list: 已选变量
+        arrays: {变量名: (lat, lon) 数组}
+        lat, lon: 坐标数组
+        global_attrs: 全局属性（仅创建时写入）
+        encoding: 压缩设置（ENCODING_PROFILES 中的一项）；chunksizes 为 (lat, lon)，time 方向固定为 1
+    """
+    if os.path.isfile(path):
+        nc = netCDF4.Dataset(path, 'a')
+    else:
+        nc = _create_cube(path, category_bands, d, period, lat, lon, global_attrs)
+    try:
+        settings = dict(encoding)
+        chunks = settings.pop('chunksizes', None) or (len(lat) // 2, len(lon) // 2)
+        for b in band_list:
+            if b['VarName'] not in nc.variables:
+                var = nc.createVariable(b['VarName'], 'f4', ('time', 'lat', 'lon'), fill_value=np.float32(np.nan),
+                                        chunksizes=(1,) + tuple(chunks), **settings)
+                var.setncatts({'long_name': b['LongName'], 'units': b['Units']})
+        ti = (d - period_start(d, period)).days
+        for name, data in arrays.items():
+            nc.variables[name][ti] = data
+        complete = nc.variables['complete']
+        slots = complete.getncattr('variables').split()
+        row = np.asarray(complete[ti]).copy()
+        row[[slots.index(name) for name in arrays]] = 1
+        complete[ti] = row
+    finally:
+        nc.close()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 单日数据的 dask 惰性构建
+--------------------------------------------------------------------
+- 每块半球 tif 表示为 (波段, 纬度, 经度) 的 dask 数组，每个块为一个纬度窗口内全部所需波段，
+  计算时才按窗口读取；两块半球沿经度拼接、蒸发波段 *-1000 缩放均为图中的惰性运算
+- 返回值与 read_day_bands() 的 (full_bands, idx_to_position) 形式相同，可直接交给 build_dataset()，
+  Es/Ew/Et 交换仍为索引重映射
+- 写出时各类别的 to_netcdf(compute=False) 合并为一次 dask.compute，同一窗口只读取一次，
+  块按窗口流经调度器，峰值内存取决于 DASK_CHUNK_ROWS 与并发数而非全球网格大小
+
+依赖 dask（conda install -c conda-forge dask），仅在 DASK_LAZY=True 时导入。
+"""
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+try:
+    import dask
+    import dask.array as da
+except ImportError:  # 仅在启用惰性模式时才需要
+    dask = None
+
+# xarray 写 NetCDF 的计算图中带有 HDF5 线程锁，无法发送到 processes 调度器的工作进程；
+# 需要多进程时使用 PARALLEL_DAYS（每个工作进程各自惰性处理一天）
+DASK_SCHEDULERS = ('threads', 'synchronous')
+
+
+def _require_dask():
+    if dask is None:
+        raise ImportError('惰性模式需要 dask：conda install -c conda-forge dask')
+
+
+def _read_window(path, band_indices, block_info=None):
+    """读取一个块：block_info 给出该块在整块 tif 中的行范围"""
+    _bands, (row0, row1), (col0, col1) = block_info[None]['array-location']
+    with rasterio.open(path) as src:
+        return src.read(band_indices, window=Window(col0, row0, col1 - col0, row1 - row0))
+
+
+def lazy_tile(path, band_indices, chunk_rows):
+    """
+    一块 tif 中所需波段的惰性数组
+
+    Args:
+        path: tif 路径
+        band_indices: 所需波段索引（1 起）
+        chunk_rows: 每个块的纬度行数
+
+    Returns:
+        dask 数组 (len(band_indices), 高, 宽)，float32
+    """
+    _require_dask()
+    with rasterio.open(path) as src:
+        height, width = src.height, src.width
+    row_chunks = tuple(min(chunk_rows, height - r) for r in range(0, height, chunk_rows))
+    return da.map_blocks(_read_window, path, list(band_indices), dtype=np.float32,
+                         chunks=((len(band_indices),), row_chunks, (width,)), meta=np.empty((0, 0, 0), np.float32))
+
+
+def lazy_day_bands(tif_list, needed_indices, evap_index_set, chunk_rows):
+    """
+    惰性构建单日全球网格（西半球在左、东半球在右），蒸发波段乘以 -1000
+
+    Returns:
+        (full_bands, idx_to_position)：full_bands 为 dask 数组 (波段, 纬度, 经度)
+    """
+    tiles = [lazy_tile(path, needed_indices, chunk_rows) for path in tif_list]
+    mosaic = da.concatenate(tiles, axis=2)
+    scale = np.ones(len(needed_indices), dtype=np.float32)
+    scale[[i for i, idx in enumerate(needed_indices) if idx in evap_index_set]] = -1000.0
+    full_bands = mosaic * scale[:, None, None]
+    return full_bands, {idx: i for i, idx in enumerate(needed_indices)}
+
+
+def compute_writes(delayed_writes, scheduler='threads'):
+    """在一次 dask.compute 中执行多个 to_netcdf(compute=False) 写出，共享同一窗口的读取"""
+    _require_dask()
+    dask.compute(*delayed_writes, scheduler=scheduler)
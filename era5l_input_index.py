@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 输入目录索引
+--------------------------------------------------------------------
+- 每个 yyyy/mm 输入目录只列一次（os.scandir，多目录并行），代替逐日 glob
+- 建立 日期 -> [(tif 路径, 大小, 修改时间)] 的映射，运行开始前即可报告缺失或不完整（非 2 块）的日期
+- 可选缓存到 JSON 文件，按目录修改时间判断是否失效（增删、重命名文件会更新目录修改时间；
+  原地覆盖文件内容不会，此时请删除缓存文件）
+"""
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+TIF_PREFIX = 'ERA5_LAND_DAILY_'
+SCAN_WORKERS = 8      # 并行列目录的线程数（网络盘上可适当调大）
+
+
+def month_dir(base_input_dir, d):
+    """某日 tif 所在的 yyyy/mm 目录"""
+    return os.path.join(base_input_dir, str(d.year), f'{d.month:02d}')
+
+
+def scan_month(path):
+    """
+    列出一个月目录中的 tif（扩展名不区分大小写，与 glob 在 Windows 等不区分大小写的文件系统上一致）
+
+    Returns:
+        (目录修改时间 ns, {yyyymmdd: [[文件名, 大小, 修改时间], ...]})；目录不存在时为 (None, {})
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return None, {}
+    files = {}
+    for entry in sorted(entries, key=lambda e: e.name):
+        name = entry.name
+        if name.startswith(TIF_PREFIX) and name.lower().endswith('.tif') and entry.is_file():
+            st = entry.stat()
+            files.setdefault(name[len(TIF_PREFIX):len(TIF_PREFIX) + 8], []).append([name, st.st_size, st.st_mtime])
+    return mtime, files
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_path, cache):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    tmp = f'{cache_path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp, cache_path)
+
+
+def build_index(base_input_dir, dates, cache_path=None, workers=SCAN_WORKERS):
+    """
+    为给定日期建立输入索引，每个所需月目录只列一次
+
+    Args:
+        base_input_dir: 基础输入目录 (其下为 yyyy/mm 子目录)
+        dates: 需要的日期列表
+        cache_path: 缓存文件路径 (JSON)；None 表示不缓存
+        workers: 并行线程数
+
+    Returns:
+        {日期: [(tif 路径, 大小, 修改时间), ...]}，按文件名排序；无 tif 的日期不在其中
+    """
+    dirs = sorted({month_dir(base_input_dir, d) for d in dates})
+    cache = _load_cache(cache_path) if cache_path else {}
+    months, stale = {}, []
+    for path in dirs:
+        entry = cache.get(os.path.abspath(path))
+        try:
+            current = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            current = None
+        if entry is not None and current is not None and entry['mtime'] == current:
+            months[path] = entry['files']
+        else:
+            stale.append(path)
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for path, (mtime, files) in zip(stale, executor.map(scan_month, stale)):
+                months[path] = files
+                if mtime is not None:
+                    cache[os.path.abspath(path)] = {'mtime': mtime, 'files': files}
+        if cache_path:
+            _save_cache(cache_path, cache)
+
+    index = {}
+    for d in dates:
+        path = month_dir(base_input_dir, d)
+        tiles = months[path].get(f'{d:%Y%m%d}')
+        if tiles:
+            index[d] = [(os.path.join(path, name), size, mtime) for name, size, mtime in tiles]
+    print(f'输入索引：{len(dirs)} 个月目录，重新列出 {len(stale)} 个，缓存命中 {len(dirs) - len(stale)} 个')
+    return index
+
+
+def check(index, dates, expected=2):
+    """
+    找出缺失（无 tif）与不完整（tif 数不等于 expected）的日期
+
+    Returns:
+        (缺失日期列表, {日期: 找到的块数})
+    """
+    missing = [d for d in dates if d not in index]
+    incomplete = {d: len(index[d]) for d in dates if d in index and len(index[d]) != expected}
+    return missing, incomplete
+
+
+def day_tifs(index, d):
+    """某日 tif 路径列表（已按文件名排序）"""
+    return [path for path, _size, _mtime in index.get(d, ())]
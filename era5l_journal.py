@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 处理流程的运行日志（断点续跑）
+--------------------------------------------------------------------
+- 每个 (日期, 类别) 输出单元开始写出时追加一条 start 记录，完整写出（临时文件已原子重命名）后追加一条 done 记录；
+  JSONL 格式，多个工作进程可同时追加（每条记录一次 write）
+- 重新运行时回放日志：有 start 无 done 的单元为上次中断时正在写出的单元，报告并随后重新生成；
+  日志中出现过的输出旁的临时文件按文件名中的 pid 找到写出它的 start 记录：主机为本机且该 pid 已退出时删除；
+  其他主机（共享目录上的工作进程）写出的临时文件本机无法判断其进程是否存活，保留并连同主机与 pid 列出，
+  需确认该主机上的进程已退出后手工删除；仍在运行的进程的临时文件保留不动
+
+输出均先写入同目录的临时文件 (<文件名>.<pid>.tmp) 再原子重命名，正式路径上不会出现写了一半的文件。
+"""
+
+import os
+import re
+import glob
+import json
+import socket
+import datetime as dt
+
+
+def temp_path(path):
+    """原子写出使用的临时文件（与正式文件同目录，保证 os.replace 为同一文件系统内的重命名）"""
+    return f'{path}.{os.getpid()}.tmp'
+
+
+def stale_temps(path):
+    """某输出遗留的临时文件（任意进程写出的）"""
+    return glob.glob(f'{glob.escape(path)}.*.tmp')
+
+
+def temp_pid(tmp):
+    """临时文件名中写出进程的 pid；无法解析时为 None"""
+    m = re.search(r'\.(\d+)\.tmp$', tmp)
+    return int(m.group(1)) if m else None
+
+
+def pid_alive(pid):
+    """本机上 pid 对应的进程是否仍在运行"""
+    if os.name == 'nt':  # Windows 上 os.kill 会结束进程，无法探测，按仍在运行处理
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # 进程存在但属于其他用户
+        return True
+    return True
+
+
+def record(journal_path, event, d, key, path):
+    """
+    追加一条日志记录
+
+    Args:
+        event: 'start'（开始写出）或 'done'（已完整写出）
+        d: 日期
+        key: 类别 Key
+        path: 正式输出路径
+    """
+    line = json.dumps({'event': event, 'date': f'{d:%Y-%m-%d}', 'category': key, 'path': path,
+                       'host': socket.gethostname(), 'pid': os.getpid(), 'time': dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')},
+                      ensure_ascii=False) + '\n'
+    with open(journal_path, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+def load(journal_path):
+    """
+    回放日志
+
+    Returns:
+        (done, inflight, writers)：done 为 {类别 Key: set(日期)}；inflight 为 {(日期, 类别 Key): 最后一条 start 记录}；
+        writers 为 {正式输出路径: {pid: 主机}}，来自全部 start 记录（旧日志没有 host 字段时主机为 None）
+    """
+    done, inflight, writers = {}, {}, {}
+    if not os.path.isfile(journal_path):
+        return done, inflight, writers
+    with open(journal_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                r = json.loads(line)
+            except ValueError:  # 中断时写了一半的最后一行
+                continue
+            unit = (dt.datetime.strptime(r['date'], '%Y-%m-%d'), r['category'])
+            if r['event'] == 'start':
+                inflight[unit] = r
+                writers.setdefault(r['path'], {})[r.get('pid')] = r.get('host')
+            else:
+                inflight.pop(unit, None)
+                done.setdefault(unit[1], set()).add(unit[0])
+    return done, inflight, writers
+
+
+def resume(journal_path):
+    """
+    运行开始时回放日志并清理上次中断遗留的临时文件
+
+    检查日志中出现过的所有输出（含已完成的单元：其他主机中断后本机已重新写完的情况）旁的临时文件，
+    按文件名中的 pid 找到写出它的 start 记录：
+    - 主机为本机（旧日志没有 host 字段时按本机处理）且该 pid 已退出：删除
+    - 主机为其他主机：本机无法判断其进程是否存活，保留并列出（主机、pid），确认后手工删除
+    - 写出进程仍在运行，或日志中没有该 pid 的 start 记录（未启用日志的运行写出）：保留并列出
+
+    是否跳过某单元仍按正式文件是否存在（或完成清单）判断：正式文件只会由写完的临时文件重命名而来，
+    存在即完整；原地追加中断留下的未完成变量带有标记，增量追加模式会补写。
+
+    Returns:
+        {'done': 日志中已完成的单元数, 'inflight': 上次中断时正在写出的单元数, 'removed': 删除的临时文件数,
+         'kept': 保留的临时文件数, 'foreign': [(临时文件, 主机, pid)] 其他主机遗留的临时文件}
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+    done, inflight, writers = load(journal_path)
+    host = socket.gethostname()
+    removed, kept, foreign = 0, [], []
+    for path, pids in sorted(writers.items()):
+        for tmp in stale_temps(path):
+            pid = temp_pid(tmp)
+            if pid not in pids:
+                kept.append(tmp)
+                continue
+            writer_host = pids[pid] or host
+            if writer_host != host:
+                foreign.append((tmp, writer_host, pid))
+                continue
+            if pid_alive(pid):
+                kept.append(tmp)
+                continue
+            try:
+                os.remove(tmp)
+                removed += 1
+            except FileNotFoundError:  # 写出进程刚好完成或清理
+                pass
+    summary = {'done': sum(len(v) for v in done.values()), 'inflight': len(inflight), 'removed': removed,
+               'kept': len(kept) + len(foreign), 'foreign': foreign}
+    print(f"  运行日志 {journal_path}: 已完成 {summary['done']} 个单元，"
+          f"上次中断时正在写出 {len(inflight)} 个单元（已清理临时文件 {removed} 个，将重新生成）")
+    for (d, key), r in sorted(inflight.items()):
+        print(f"    {d:%Y-%m-%d} {key}: {r['path']}")
+    if foreign:
+        print(f'  其他主机遗留的临时文件 {len(foreign)} 个（本机无法判断写出进程是否存活，确认已退出后请手工删除）:')
+        for tmp, writer_host, pid in foreign:
+            print(f'    {tmp}  ({writer_host}:{pid})')
+    if kept:
+        print(f'  保留 {len(kept)} 个临时文件（写出进程仍在运行或日志中无对应记录）:')
+        for tmp in kept:
+            print(f'    {tmp}')
+    return summary
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 陆地格点压缩存储（CF compression by gathering）
+--------------------------------------------------------------------
+- 陆地掩膜在运行开始时确定一次：读取掩膜文件（land_mask 或 ERA5 的 lsm 变量，>0 为陆地），
+  或取首日所读各波段有效值 (非 NaN) 的并集；展平后的陆地格点索引 (C 顺序，从 0 起) 供各日共用
+- 各变量写出前按索引抽取为一维陆地向量，打包、压缩与写盘的数据量约为整幅的 1/3
+- 文件中保留 lat / lon 维度与坐标，另写一维列表变量 land(land)，带属性 compress = "lat lon"，
+  数据变量的维度为 (land)，符合 CF「按收集压缩」约定，CF 工具可直接还原
+- 抽取时核对掩膜外是否有有效值，有则报告丢失的格点数（掩膜与数据不符）
+
+读取时用 scatter() / expand() 将陆地向量还原为 (lat, lon) 网格，海洋格点为 NaN。
+"""
+
+import os
+import numpy as np
+import xarray as xr
+import netCDF4
+
+import era5l_journal
+
+LAND_DIM = 'land'
+
+
+def mask_from_bands(bands):
+    """各波段有效值（非 NaN）的并集作为陆地掩膜"""
+    mask = None
+    for band in bands:
+        valid = ~np.isnan(band)
+        mask = valid if mask is None else mask | valid
+    return mask
+
+
+def load_mask(path):
+    """
+    读取掩膜文件：land_mask 变量，或 ERA5 陆海掩膜 lsm（陆地比例），值 > 0 的格点为陆地
+
+    Returns:
+        (lat, lon) bool 数组
+    """
+    with netCDF4.Dataset(path) as nc:
+        name = next((n for n in ('land_mask', 'lsm') if n in nc.variables), None)
+        if name is None:
+            raise ValueError(f'{path} 中没有 land_mask 或 lsm 变量')
+        values = np.squeeze(nc.variables[name][:].filled(np.nan))
+    if values.ndim != 2:
+        raise ValueError(f'{path} 的 {name} 不是二维网格: {values.shape}')
+    return np.nan_to_num(values) > 0
+
+
+def save_mask(path, mask, lat, lon):
+    """原子写出掩膜文件（land_mask: int8，1 为陆地），供之后的运行复用"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = era5l_journal.temp_path(path)
+    with netCDF4.Dataset(tmp, 'w', format='NETCDF4') as nc:
+        nc.createDimension('lat', len(lat))
+        nc.createDimension('lon', len(lon))
+        nc.createVariable('lat', 'f8', ('lat',))[:] = lat
+        nc.createVariable('lon', 'f8', ('lon',))[:] = lon
+        var = nc.createVariable('land_mask', 'i1', ('lat', 'lon'), zlib=True)
+        var.long_name = 'land mask used for compression by gathering'
+        var[:] = mask.astype(np.int8)
+    os.replace(tmp, path)
+
+
+def land_index(mask):
+    """展平（C 顺序）后的陆地格点索引，int32"""
+    return np.flatnonzero(mask).astype(np.int32)
+
+
+def chunk_length(chunksizes, n):
+    """一维陆地向量的块长度：与二维方案的块含相同格点数，不超过向量长度"""
+    return (int(min(np.prod(chunksizes), n)),)
+
+
+def index_encoding(encoding, n):
+    """列表变量 land 的压缩设置：沿用方案的 zlib 级别（索引递增，经 shuffle 后压缩率很高），不做量化"""
+    settings = {'zlib': True, 'complevel': encoding.get('complevel', 4), 'shuffle': True}
+    if 'chunksizes' in encoding:
+        settings['chunksizes'] = chunk_length(encoding['chunksizes'], n)
+    return settings
+
+
+def gather(data, index):
+    """
+    抽取陆地向量
+
+    Args:
+        data: (lat, lon) 数组
+        index: land_index() 的返回值
+
+    Returns:
+        (一维向量, 掩膜外的有效值个数)
+    """
+    vector = data.reshape(-1)[index]
+    lost = (data.size - np.count_nonzero(np.isnan(data))) - (vector.size - np.count_nonzero(np.isnan(vector)))
+    return vector, int(lost)
+
+
+def report_lost(lost, label):
+    """打印掩膜外被丢弃的有效值个数（掩膜与数据不符时）"""
+    if lost:
+        print(f"  [WARN] {label} 掩膜外有有效值被丢弃: " + ', '.join(f'{k} {n} 个格点' for k, n in lost.items()))
+
+
+def index_variable(index):
+    """列表变量 land(land) 的 DataArray"""
+    return xr.DataArray(index, dims=[LAND_DIM], attrs={'compress': 'lat lon', 'long_name': 'land point index'})
+
+
+def gather_dataset(ds, index):
+    """
+    将 ds 的 (lat, lon) 数据变量替换为陆地向量，保留 lat / lon 坐标、变量属性与编码
+
+    Returns:
+        (新 Dataset, {变量名: 掩膜外的有效值个数}（只含大于 0 的变量）)
+    """
+    data_vars, lost = {}, {}
+    for name, da in ds.data_vars.items():
+        vector, n = gather(np.asarray(da.values), index)
+        data_vars[name] = xr.DataArray(vector, dims=[LAND_DIM], attrs=da.attrs)
+        data_vars[name].encoding.update(da.encoding)
+        if n:
+            lost[name] = n
+    out = xr.Dataset(data_vars, coords={'lat': ds['lat'], 'lon': ds['lon'], LAND_DIM: index_variable(index)},
+                     attrs=ds.attrs)
+    return out, lost
+
+
+def scatter(vector, index, shape, fill=np.nan):
+    """
+    陆地向量还原为网格
+
+    Args:
+        vector: (..., land) 数组
+        index: 文件中 land 变量的值
+        shape: (lat, lon)
+        fill: 非陆地格点的值
+
+    Returns:
+        (..., lat, lon) 数组
+    """
+    vector = np.asarray(vector)
+    dtype = np.result_type(vector.dtype, np.float32) if fill is np.nan else vector.dtype
+    out = np.full(vector.shape[:-1] + (shape[0] * shape[1],), fill, dtype=dtype)
+    out[..., index] = vector
+    return out.reshape(vector.shape[:-1] + tuple(shape))
+
+
+def expand(ds):
+    """
+    将按收集压缩的 Dataset（如 xr.open_dataset 读取的陆地存储文件）还原为 (lat, lon) 网格
+
+    各数据变量读入内存后还原，海洋格点为 NaN；不含 compress 列表变量的 Dataset 原样返回。
+    """
+    lists = [name for name, var in ds.variables.items() if 'compress' in var.attrs]
+    if not lists:
+        return ds
+    name = lists[0]
+    dims = ds[name].attrs['compress'].split()
+    shape = tuple(ds.sizes[d] for d in dims)
+    index = ds[name].values
+    data_vars = {}
+    for var, da in ds.data_vars.items():
+        if name not in da.dims:
+            data_vars[var] = da
+            continue
+        lead = [d for d in da.dims if d != name]
+        values = scatter(da.transpose(*lead, name).values, index, shape)
+        data_vars[var] = xr.DataArray(values, dims=lead + dims, attrs=da.attrs)
+    coords = {k: v for k, v in ds.coords.items() if k != name and name not in v.dims}
+    return xr.Dataset(data_vars, coords=coords, attrs=ds.attrs)
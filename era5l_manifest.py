@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 输出完成清单 (SQLite)
+--------------------------------------------------------------------
+- 每个输出文件一条记录：日期、类别、变量集合、大小、修改时间、校验和、压缩方案、写出时间
+- 运行开始时一次性载入，代替逐日逐类别的 os.path.isfile 检查（网络盘上尤其慢）
+- 只有完整写出并关闭后的文件才会登记，因此中断留下的截断文件不会被当作已完成
+- 登记时只记录大小与修改时间（仅 stat），不重新读取刚写出的文件；校验和在 verify --checksum 时按需计算：
+  尚无校验和的记录在大小与修改时间一致时计算并保存为基准，已有校验和的记录重新计算比较
+- verify 并行复核已登记的输出（默认只比较大小与修改时间），prune 删除失效记录以便重新生成
+
+清单应放在本地磁盘上：SQLite 的文件锁在网络文件系统上不可靠。
+"""
+
+import os
+import re
+import hashlib
+import sqlite3
+import datetime as dt
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import netCDF4
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outputs (
+    path       TEXT PRIMARY KEY,
+    date       TEXT NOT NULL,
+    category   TEXT NOT NULL,
+    variables  TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    mtime_ns   INTEGER,
+    checksum   TEXT NOT NULL,
+    encoding   TEXT NOT NULL,
+    written_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_category_date ON outputs (category, date);
+'''
+
+
+@contextmanager
+def connect(manifest_path):
+    """打开（必要时创建）清单数据库，退出时提交并关闭；多个工作进程可同时写入"""
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    conn = sqlite3.connect(manifest_path, timeout=60)
+    try:
+        conn.executescript(_SCHEMA)
+        if 'mtime_ns' not in {row[1] for row in conn.execute('PRAGMA table_info(outputs)')}:
+            conn.execute('ALTER TABLE outputs ADD COLUMN mtime_ns INTEGER')  # 早期清单：修改时间为空，不比较
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def file_checksum(path, block_size=8 * 1024 * 1024):
+    """文件内容的 BLAKE2b 校验和（分块读取，hashlib 计算时释放 GIL，可多线程并行）"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_done(manifest_path, selected):
+    """
+    一次查询载入所有已登记输出，返回各类别中变量集合覆盖当前选择的日期
+
+    Args:
+        manifest_path: 清单路径
+        selected: {类别 Key: 已选变量列表}
+
+    Returns:
+        {类别 Key: set(日期)}
+    """
+    wanted = {key: {b['VarName'] for b in bands} for key, bands in selected.items() if bands}
+    done = {key: set() for key in wanted}
+    with connect(manifest_path) as conn:
+        for date, category, variables in conn.execute('SELECT date, category, variables FROM outputs'):
+            if category in wanted and wanted[category] <= set(variables.split(',')):
+                done[category].add(dt.datetime.strptime(date, '%Y%m%d'))
+    return done
+
+
+def record(manifest_path, rows):
+    """
+    登记已完整写出的输出
+
+    Args:
+        rows: [{'path', 'date', 'category', 'variables', 'encoding'}]，size 与 mtime_ns 由本函数读取（仅 stat）；
+              校验和留空，由 verify --checksum 计算
+    """
+    values = []
+    for r in rows:
+        st = os.stat(r['path'])
+        values.append((os.path.abspath(r['path']), f"{r['date']:%Y%m%d}", r['category'], ','.join(r['variables']),
+                       st.st_size, st.st_mtime_ns, '', r['encoding'], dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    with connect(manifest_path) as conn:
+        conn.executemany('INSERT OR REPLACE INTO outputs (path, date, category, variables, size, mtime_ns, checksum, '
+                         'encoding, written_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', values)
+
+
+def _check(row, checksum):
+    """
+    复核一条记录
+
+    Returns:
+        (路径, 状态, 新计算的校验和)；只有尚无校验和且大小与修改时间一致的记录返回新校验和，其余为 None
+    """
+    path, size, mtime_ns, digest = row
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path, 'missing', None
+    if st.st_size != size:
+        return path, 'size', None
+    if mtime_ns is not None and st.st_mtime_ns != mtime_ns:
+        return path, 'mtime', None
+    if not checksum:
+        return path, 'ok', None
+    current = file_checksum(path)
+    if not digest:
+        return path, 'ok', current
+    return (path, 'checksum', None) if current != digest else (path, 'ok', None)
+
+
+def verify(manifest_path, checksum=False, workers=8, prune=False):
+    """
+    并行复核已登记的输出
+
+    Args:
+        checksum: True 时计算校验和（读取全部内容）：已有校验和的记录比较，尚无的保存为之后复核的基准；
+                  默认只比较文件大小与修改时间（仅 stat）
+        workers: 并行线程数（网络盘上可适当调大）
+        prune: True 时删除失效记录，下次运行会重新生成对应输出
+
+    Returns:
+        {'ok': n, 'missing': n, 'size': n, 'mtime': n, 'checksum': n}
+    """
+    with connect(manifest_path) as conn:
+        rows = conn.execute('SELECT path, size, mtime_ns, checksum FROM outputs').fetchall()
+    counts = {'ok': 0, 'missing': 0, 'size': 0, 'mtime': 0, 'checksum': 0}
+    bad, computed = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, status, digest in executor.map(lambda r: _check(r, checksum), rows):
+            counts[status] += 1
+            if digest is not None:
+                computed.append((digest, path))
+            if status != 'ok':
+                bad.append(path)
+                print(f'  [{status}] {path}')
+    if computed:
+        with connect(manifest_path) as conn:
+            conn.executemany('UPDATE outputs SET checksum = ? WHERE path = ?', computed)
+        print(f'  保存 {len(computed)} 条记录的校验和基准。')
+    if prune and bad:
+        with connect(manifest_path) as conn:
+            conn.executemany('DELETE FROM outputs WHERE path = ?', [(p,) for p in bad])
+        print(f'  已删除 {len(bad)} 条失效记录。')
+    print(f"复核 {len(rows)} 条记录：正常 {counts['ok']}，缺失 {counts['missing']}，"
+          f"大小不符 {counts['size']}，修改时间不符 {counts['mtime']}，校验和不符 {counts['checksum']}")
+    return counts
+
+
+_OUTPUT_NAME = re.compile(r'^ERA5_Land_Daily_(?P<tag>[A-Za-z]+)_(?P<date>\d{8})\.nc$')
+
+
+def _inspect(path, category):
+    """打开文件读取变量列表（能完整打开即视为有效）；失败返回 None"""
+    try:
+        with netCDF4.Dataset(path) as nc:
+            variables = [v for v in nc.variables if v not in ('lat', 'lon')]
+    except Exception:
+        return None
+    name = _OUTPUT_NAME.match(os.path.basename(path))
+    return {'path': path, 'date': dt.datetime.strptime(name['date'], '%Y%m%d'), 'category': category,
+            'variables': variables, 'encoding': 'unknown'}
+
+
+def scan(manifest_path, out_dirs, tag_to_key, workers=8):
+    """
+    将已有的逐日输出登记到清单（启用清单前生成的文件），无法打开的文件不登记并列出
+
+    Args:
+        out_dirs: {类别 Key: 输出根目录}
+        tag_to_key: {文件名中的类别标识: 类别 Key}
+        workers: 并行线程数
+
+    Returns:
+        (登记数, 无法打开的文件列表)
+    """
+    candidates = []
+    for key, root in out_dirs.items():
+        for dirpath, _dirnames, filenames in os.walk(root):
+            for fn in filenames:
+                m = _OUTPUT_NAME.match(fn)
+                if m and tag_to_key.get(m['tag']) == key:
+                    candidates.append((os.path.join(dirpath, fn), key))
+    rows, broken = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (path, _key), row in zip(candidates, executor.map(lambda c: _inspect(*c), candidates)):
+            if row is None:
+                broken.append(path)
+                print(f'  [无法打开] {path}')
+            else:
+                rows.append(row)
+    for i in range(0, len(rows), 500):
+        record(manifest_path, rows[i:i + 500])
+    print(f'扫描 {len(candidates)} 个文件：登记 {len(rows)}，无法打开 {len(broken)}')
+    return len(rows), broken
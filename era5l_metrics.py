@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 处理流程的结构化指标与性能剖析
+--------------------------------------------------------------------
+- 每日一条 day 记录、每个写出类别一条 category 记录，以 JSONL 追加写入 METRICS_PATH，
+  多个工作进程可同时追加（每条记录一次 write）
+- 可选写出 Prometheus node-exporter textfile（最近完成一日的各项 gauge，先写临时文件再原子替换）
+- 可选在某一日外包裹 cProfile 或 tracemalloc，结果写入 .prof / .txt 文件
+- summarize() 汇总 JSONL 中各阶段耗时的 p50/p95
+
+字段说明：
+- read_s / build_s / write_s：读取、构建 Dataset、压缩写出耗时（HDF5 在写出时逐块压缩，压缩与写盘无法分开计时）
+- bytes_read：解码后读入内存的字节数；input_bytes：当日 tif 文件大小之和
+- bytes_raw / bytes_written / compression_ratio：类别未压缩大小、写出文件大小及二者之比
+- peak_rss_mb：当日峰值 RSS（Linux 上每日开始时重置进程峰值，其他平台为进程启动以来的峰值）
+"""
+
+import os
+import sys
+import json
+import time
+import datetime as dt
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def reset_peak_rss():
+    """重置进程峰值 RSS（仅 Linux 支持，其他平台不做任何事）"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """进程峰值 RSS (MB)；无法获取时返回 None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 2**20 if sys.platform == 'darwin' else rss / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+    except (ImportError, AttributeError):
+        return None
+
+
+def new_day(d, mode):
+    """开始一日的指标记录"""
+    reset_peak_rss()
+    return {'type': 'day', 'date': f'{d:%Y-%m-%d}', 'mode': mode, 'pid': os.getpid(),
+            'read_s': 0.0, 'build_s': 0.0, 'write_s': 0.0, 'bytes_read': 0, 'input_bytes': 0,
+            'bytes_written': 0, 'categories': []}
+
+
+def add_category(day, key, bytes_raw, build_s, write_s, bytes_written, encoding):
+    """
+    记录一个类别的构建/写出；day 为 None（未通过 process_one_day 调用）时不做任何事
+
+    Args:
+        bytes_raw: 该类别未压缩数据大小
+        bytes_written: 写出字节数；无法获得时为 None（如 Zarr 存储）
+    """
+    if day is None:
+        return
+    day['build_s'] += build_s
+    day['write_s'] += write_s
+    day['bytes_written'] += bytes_written or 0
+    day['categories'].append({
+        'type': 'category', 'date': day['date'], 'category': key, 'encoding': encoding,
+        'build_s': round(build_s, 4), 'write_s': round(write_s, 4),
+        'bytes_raw': bytes_raw, 'bytes_written': bytes_written,
+        'compression_ratio': round(bytes_raw / bytes_written, 3) if bytes_written else None,
+    })
+
+
+def finish_day(day, status, total_s):
+    day['status'] = status
+    day['total_s'] = round(total_s, 4)
+    for k in ('read_s', 'build_s', 'write_s'):
+        day[k] = round(day[k], 4)
+    rss = peak_rss_mb()
+    day['peak_rss_mb'] = round(rss, 1) if rss is not None else None
+    day['finished_at'] = dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def emit(day, metrics_path=None, textfile=None):
+    """将一日的记录追加到 JSONL，并更新 Prometheus textfile"""
+    categories = day['categories']
+    if metrics_path:
+        os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+        record = {k: v for k, v in day.items() if k != 'categories'}
+        lines = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in categories + [record])
+        with open(metrics_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+    if textfile:
+        write_textfile(day, textfile)
+
+
+def write_textfile(day, textfile):
+    """写出最近完成一日的 gauge（node-exporter textfile collector 格式）"""
+    ts = time.mktime(dt.datetime.strptime(day['date'], '%Y-%m-%d').timetuple())
+    lines = [
+        '# HELP era5l_day_seconds Stage duration of the last processed day.',
+        '# TYPE era5l_day_seconds gauge',
+    ]
+    for stage in ('read', 'build', 'write', 'total'):
+        lines.append(f'era5l_day_seconds{{stage="{stage}"}} {day[stage + "_s"]}')
+    lines += [
+        '# HELP era5l_day_bytes Bytes handled on the last processed day.',
+        '# TYPE era5l_day_bytes gauge',
+        f'era5l_day_bytes{{kind="read"}} {day["bytes_read"]}',
+        f'era5l_day_bytes{{kind="input"}} {day["input_bytes"]}',
+        f'era5l_day_bytes{{kind="written"}} {day["bytes_written"]}',
+        '# HELP era5l_day_ok Whether the last processed day succeeded.',
+        '# TYPE era5l_day_ok gauge',
+        f'era5l_day_ok {int(day["status"] == "ok")}',
+        '# HELP era5l_day_date_seconds Data date of the last processed day (unix time).',
+        '# TYPE era5l_day_date_seconds gauge',
+        f'era5l_day_date_seconds {ts:.0f}',
+    ]
+    if day['peak_rss_mb'] is not None:
+        lines += ['# HELP era5l_day_peak_rss_bytes Peak RSS while processing the last day.',
+                  '# TYPE era5l_day_peak_rss_bytes gauge',
+                  f'era5l_day_peak_rss_bytes {day["peak_rss_mb"] * 2**20:.0f}']
+    if day['categories']:
+        lines += ['# HELP era5l_category_compression_ratio Raw/written size per category on the last day.',
+                  '# TYPE era5l_category_compression_ratio gauge']
+        lines += [f'era5l_category_compression_ratio{{category="{c["category"]}"}} {c["compression_ratio"]}'
+                  for c in day['categories'] if c['compression_ratio'] is not None]
+    tmp = f'{textfile}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp, textfile)
+
+
+@contextmanager
+def profiled(mode, out_dir, d):
+    """
+    在 with 块外包裹性能剖析；mode 为 None 时不做任何事
+
+    Args:
+        mode: 'cprofile'（函数耗时，写出 .prof，可用 snakeviz 查看）或 'tracemalloc'（内存分配位置，写出 .txt）
+        out_dir: 结果目录
+        d: 日期（用于文件名）
+    """
+    if mode is None:
+        yield
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f'era5l_profile_{d:%Y%m%d}_{os.getpid()}')
+    if mode == 'cprofile':
+        import cProfile
+        import pstats
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(base + '.prof')
+            print(f'  性能剖析结果: {base}.prof，累计耗时前 15 项：')
+            pstats.Stats(prof).sort_stats('cumulative').print_stats(15)
+    else:
+        import tracemalloc
+        tracemalloc.start(25)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            top = snapshot.statistics('lineno')[:30]
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(f'traced peak: {peak / 2**20:.1f} MB\n')
+                f.writelines(f'{stat}\n' for stat in top)
+            print(f'  内存剖析结果: {base}.txt (跟踪峰值 {peak / 2**20:.1f}MB)')
+
+
+def summarize(metrics_path):
+    """
+    汇总 JSONL 指标：各阶段耗时的 p50/p95，以及各类别写出耗时与压缩比
+
+    Returns:
+        {名称: {'n', 'p50', 'p95'}}
+    """
+    days, cats = [], []
+    with open(metrics_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                r = json.loads(line)
+                (days if r['type'] == 'day' else cats).append(r)
+    ok_days = [r for r in days if r['status'] == 'ok']
+    series = {f'day.{k}': [r[k] for r in ok_days if r.get(k) is not None]
+              for k in ('read_s', 'build_s', 'write_s', 'total_s', 'peak_rss_mb')}
+    for key in sorted({c['category'] for c in cats}):
+        rows = [c for c in cats if c['category'] == key]
+        series[f'{key}.write_s'] = [c['write_s'] for c in rows]
+        series[f'{key}.compression_ratio'] = [c['compression_ratio'] for c in rows if c['compression_ratio']]
+
+    print(f'{metrics_path}: {len(days)} 天 (成功 {len(ok_days)}，失败 {len(days) - len(ok_days)})')
+    print(f"{'指标':<28}{'n':>6}{'p50':>12}{'p95':>12}")
+    summary = {}
+    for name, values in series.items():
+        if not values:
+            continue
+        p50, p95 = np.percentile(values, [50, 95])
+        summary[name] = {'n': len(values), 'p50': float(p50), 'p95': float(p95)}
+        print(f'{name:<28}{len(values):>6}{p50:>12.3f}{p95:>12.3f}')
+    total_read = sum(r['bytes_read'] for r in ok_days)
+    total_written = sum(r['bytes_written'] for r in ok_days)
+    print(f'读取 {total_read / 2**30:.2f} GiB，写出 {total_written / 2**30:.2f} GiB')
+    return summary
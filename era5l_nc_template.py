@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+逐日 NetCDF 的 netCDF4 直接写出（预先计算的文件模板）
+--------------------------------------------------------------------
+- 每个类别的模板在运行开始时计算一次：坐标数组与属性、各数据变量的类型/缺测值/压缩与分块设置/属性、
+  int16 打包参数、全局属性；各日的文件结构完全相同，只有 ProcessingStatus 时间戳不同
+- 每日输出按模板创建文件，波段缓冲区中的 float32 切片直接写入变量，不构建 xarray 对象、
+  不复制全局属性、不推断编码
+- 写出的文件头（变量顺序、类型、分块、过滤器、属性）与 xarray 路径一致，compare_files 逐项核对
+
+条带流式写出同样按模板创建文件，只是分块与块缓存按条带高度覆盖。
+陆地格点压缩存储 (era5l_land) 的模板中数据变量为一维 (land) 向量，另有列表变量 land(land)。
+"""
+
+import datetime as dt
+import numpy as np
+import netCDF4
+
+import era5l_packing
+import era5l_land
+
+QUANTIZE_KEYS = ('significant_digits', 'quantize_mode')
+
+
+def make_template(band_list, lat, lon, global_attrs, encoding, packing=None, replaced_coords=False, land=None):
+    """
+    计算一个类别的文件模板
+
+    Args:
+        band_list: 写出的变量表（按写出顺序）
+        lat, lon: 坐标数组
+        global_attrs: 全局属性
+        encoding: 压缩方案（ENCODING_PROFILES 中的一项）；chunksizes 超出网格时按网格裁剪
+        packing: era5l_packing.pack_index() 的返回值，其中的变量写为 int16
+        replaced_coords: 与 xarray 路径保持一致——坐标经 assign_coords 替换时（全球网格）不带属性且位于数据变量之后，
+                         否则带 units/long_name 并位于最前
+        land: 陆地格点索引 (era5l_land.land_index)；给定时数据变量写为一维陆地向量
+
+    Returns:
+        dict: shape / variables（[{'name', 'dtype', 'fill', 'settings', 'attrs', 'pack'}]）/ coords / coords_last / attrs /
+              land（None 或 {'index', 'settings'}）
+    """
+    packing = packing or {}
+    shape = (len(lat), len(lon))
+    variables = []
+    for b in band_list:
+        settings = dict(encoding)
+        if 'chunksizes' in settings:
+            settings['chunksizes'] = (era5l_land.chunk_length(settings['chunksizes'], len(land)) if land is not None
+                                      else tuple(min(c, n) for c, n in zip(settings['chunksizes'], shape)))
+        attrs = {'long_name': b['LongName'], 'units': b['Units']}
+        pack = packing.get(b['VarName'])
+        if pack is None:
+            dtype, fill = 'f4', np.float32(np.nan)
+        else:
+            params, i = pack
+            dtype, fill = 'i2', params['fill'][i]
+            settings = {k: v for k, v in settings.items() if k not in QUANTIZE_KEYS}
+            attrs.update(era5l_packing.var_attrs(params, i))
+        variables.append({'name': b['VarName'], 'dtype': dtype, 'fill': fill, 'settings': settings,
+                          'attrs': attrs, 'pack': pack})
+    coords = [
+        ('lat', np.asarray(lat, dtype=np.float64), {} if replaced_coords else {'units': 'degrees_north', 'long_name': 'latitude'}),
+        ('lon', np.asarray(lon, dtype=np.float64), {} if replaced_coords else {'units': 'degrees_east', 'long_name': 'longitude'}),
+    ]
+    attrs = {'Conventions': 'CF-1.6'}
+    attrs.update(global_attrs)
+    if land is not None:
+        land = {'index': land, 'settings': era5l_land.index_encoding(encoding, len(land))}
+    # xarray 按维度坐标 land、数据变量、其余坐标的顺序写出陆地存储文件
+    return {'shape': shape, 'variables': variables, 'coords': coords, 'coords_last': replaced_coords or land is not None,
+            'attrs': attrs, 'land': land}
+
+
+def create(template, path, chunks=None, cache=None):
+    """
+    按模板创建文件并定义全部变量（数据变量尚未写入）
+
+    Args:
+        template: make_template() 的返回值
+        path: 输出路径
+        chunks: 覆盖数据变量的 (lat, lon) 分块；None 使用模板中的设置
+        cache: 数据变量的块缓存 (字节数, 块数)；None 使用 netCDF 默认值
+
+    Returns:
+        以写模式打开的 netCDF4.Dataset；数据变量已关闭自动掩码与缩放，打包变量直接写入 int16 值
+    """
+    nc = netCDF4.Dataset(path, 'w', format='NETCDF4')
+    nc.createDimension('lat', template['shape'][0])
+    nc.createDimension('lon', template['shape'][1])
+    land = template.get('land')
+    if land is not None:
+        nc.createDimension(era5l_land.LAND_DIM, len(land['index']))
+    if not template['coords_last']:
+        _create_coords(nc, template)
+    if land is not None:
+        index = nc.createVariable(era5l_land.LAND_DIM, 'i4', (era5l_land.LAND_DIM,), **land['settings'])
+        index.setncatts(era5l_land.index_variable(land['index']).attrs)
+        index[:] = land['index']
+    dims = (era5l_land.LAND_DIM,) if land is not None else ('lat', 'lon')
+    for v in template['variables']:
+        settings = dict(v['settings'], chunksizes=chunks) if chunks else v['settings']
+        var = nc.createVariable(v['name'], v['dtype'], dims, fill_value=v['fill'], **settings)
+        var.set_auto_maskandscale(False)  # 数据按原样写入（缺测即 NaN / 打包缺测值），跳过逐元素的掩码检查
+        if cache is not None:
+            var.set_var_chunk_cache(size=cache[0], nelems=cache[1], preemption=1.0)
+        var.setncatts(v['attrs'])
+    if template['coords_last']:
+        _create_coords(nc, template)
+    attrs = dict(template['attrs'])
+    attrs['ProcessingStatus'] = f'Finalized on {dt.datetime.now():%Y-%m-%d %H:%M:%S}'
+    nc.setncatts(attrs)
+    return nc
+
+
+def _create_coords(nc, template):
+    for name, values, attrs in template['coords']:
+        coord = nc.createVariable(name, 'f8', (name,), fill_value=np.nan)
+        coord.setncatts(attrs)
+        coord[:] = values
+
+
+def write(template, path, arrays):
+    """
+    按模板写出一个完整文件
+
+    Args:
+        template: make_template() 的返回值
+        path: 输出路径
+        arrays: {变量名: (lat, lon) float32 数组}，可为波段缓冲区的视图；陆地存储时在此抽取陆地向量，打包变量在此打包
+    """
+    nc = create(template, path)
+    lost = {}
+    try:
+        for v in template['variables']:
+            data = arrays[v['name']]
+            if template.get('land') is not None:
+                data, n = era5l_land.gather(data, template['land']['index'])
+                if n:
+                    lost[v['name']] = n
+            if v['pack'] is not None:
+                data = era5l_packing.pack_band(data, *v['pack'])
+            nc.variables[v['name']][:] = data
+    finally:
+        nc.close()
+    era5l_land.report_lost(lost, path)
+
+
+def compare_files(path_a, path_b, ignore_attrs=('ProcessingStatus', 'CreationDate'), data=True):
+    """
+    逐项比较两个 NetCDF 文件：全局属性、变量顺序、类型、维度、分块、过滤器、变量属性（含顺序）与数据
+
+    Returns:
+        差异描述列表；为空表示一致
+    """
+    diffs = []
+    with netCDF4.Dataset(path_a) as a, netCDF4.Dataset(path_b) as b:
+        ga = {k: a.getncattr(k) for k in a.ncattrs() if k not in ignore_attrs}
+        gb = {k: b.getncattr(k) for k in b.ncattrs() if k not in ignore_attrs}
+        if list(ga) != list(gb) or any(str(ga[k]) != str(gb[k]) for k in ga):
+            diffs.append(f'全局属性不同: {ga} / {gb}')
+        if list(a.variables) != list(b.variables):
+            diffs.append(f'变量顺序不同: {list(a.variables)} / {list(b.variables)}')
+        for name in a.variables:
+            if name not in b.variables:
+                continue
+            va, vb = a.variables[name], b.variables[name]
+            for what, x, y in (('类型', va.dtype, vb.dtype), ('维度', va.dimensions, vb.dimensions),
+                               ('分块', va.chunking(), vb.chunking()), ('过滤器', va.filters(), vb.filters())):
+                if x != y:
+                    diffs.append(f'{name} {what}不同: {x} / {y}')
+            aa = {k: va.getncattr(k) for k in va.ncattrs()}
+            ab = {k: vb.getncattr(k) for k in vb.ncattrs()}
+            if list(aa) != list(ab) or any(not np.array_equal(aa[k], ab[k], equal_nan=np.issubdtype(np.asarray(aa[k]).dtype, np.floating))
+                                           for k in aa if k in ab):
+                diffs.append(f'{name} 属性不同: {aa} / {ab}')
+            if data:
+                va.set_auto_maskandscale(False)
+                vb.set_auto_maskandscale(False)
+                if not np.array_equal(va[:], vb[:], equal_nan=np.issubdtype(va.dtype, np.floating)):
+                    diffs.append(f'{name} 数据不同')
+    return diffs
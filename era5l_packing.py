@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 变量的 CF int16 打包 (scale_factor / add_offset / _FillValue)
+--------------------------------------------------------------------
+- 每个可打包变量在 PACK_SPECS 中给出有效范围、所需精度与缺测值；未列出的变量保持 float32
+- 打包参数按变量向量化计算：scale_factor 取精度，add_offset 取有效范围中点，
+  打包值落在 [-n, n]（n = 范围/精度/2），缺测值须在此区间之外（默认 -32768）
+- 超出有效范围的值裁剪到边界后打包，写出前逐波段向量化完成，缺测 (NaN) 写为缺测值
+- 写出的文件可直接用 xarray / netCDF4 读取，读取时自动还原为 float32
+
+int16 每个值 2 字节，进入 zlib 与写盘的数据量约为 float32 的一半。
+"""
+
+import numpy as np
+import xarray as xr
+
+INT16_MAX = np.iinfo(np.int16).max
+
+
+def pack_params(specs):
+    """
+    由打包元数据计算 CF 打包参数
+
+    Args:
+        specs: [{'ValidRange': (最小, 最大), 'Precision': 精度, 'FillValue': 缺测值}]
+
+    Returns:
+        dict: scale_factor / add_offset（float32 数组）、fill / valid_min / valid_max（int16 数组）、
+              lo / hi（有效范围，float32 数组）
+    """
+    lo = np.array([s['ValidRange'][0] for s in specs], dtype=np.float64)
+    hi = np.array([s['ValidRange'][1] for s in specs], dtype=np.float64)
+    precision = np.array([s['Precision'] for s in specs], dtype=np.float64)
+    fill = np.array([s['FillValue'] for s in specs], dtype=np.int64)
+    half_steps = np.ceil((hi - lo) / precision / 2)
+    bad = np.flatnonzero((hi <= lo) | (precision <= 0) | (half_steps > INT16_MAX))
+    if len(bad):
+        raise ValueError(f'打包参数无效（范围/精度超出 int16）：{[specs[i] for i in bad]}')
+    bad = np.flatnonzero(np.abs(fill) <= half_steps)
+    if len(bad):
+        raise ValueError(f'缺测值落在打包值范围内：{[specs[i] for i in bad]}')
+    return {
+        'scale_factor': precision.astype(np.float32),
+        'add_offset': ((lo + hi) / 2).astype(np.float32),
+        'fill': fill.astype(np.int16),
+        'valid_min': (-half_steps).astype(np.int16),
+        'valid_max': half_steps.astype(np.int16),
+        'lo': lo.astype(np.float32),
+        'hi': hi.astype(np.float32),
+    }
+
+
+def pack_band(data, params, i):
+    """
+    打包一个波段（numpy 或 dask 数组）
+
+    Args:
+        data: float32 (lat, lon) 数组
+        params: pack_params() 的返回值
+        i: 该变量在 params 中的位置
+
+    Returns:
+        int16 数组
+    """
+    clipped = np.clip(data, params['lo'][i], params['hi'][i])
+    packed = np.round((clipped - params['add_offset'][i]) / params['scale_factor'][i])
+    return np.where(np.isnan(data), params['fill'][i], packed).astype(np.int16)
+
+
+def var_attrs(params, i):
+    """写入打包变量的 CF 属性"""
+    return {'scale_factor': params['scale_factor'][i], 'add_offset': params['add_offset'][i],
+            'valid_min': params['valid_min'][i], 'valid_max': params['valid_max'][i]}
+
+
+def pack_index(names, specs):
+    """
+    {变量名: (params, i)}：names 中在 specs 内有定义的变量及其打包参数（一次向量化计算）
+    """
+    names = [name for name in names if name in specs]
+    params = pack_params([specs[name] for name in names]) if names else None
+    return {name: (params, i) for i, name in enumerate(names)}
+
+
+def pack_dataset(ds, specs):
+    """
+    将 ds 中在 specs 内有定义的数据变量替换为 int16 打包变量（其余变量不变）
+
+    打包变量带 scale_factor / add_offset / valid_min / valid_max 属性，缺测值记录在 encoding['_FillValue']。
+    """
+    for name, (params, i) in pack_index(list(ds.data_vars), specs).items():
+        da = ds[name]
+        packed = xr.DataArray(pack_band(da.data, params, i), dims=da.dims, attrs=dict(da.attrs, **var_attrs(params, i)))
+        packed.encoding['_FillValue'] = params['fill'][i]
+        ds[name] = packed
+    return ds
+
+
+def is_packed(da):
+    return 'scale_factor' in da.attrs and np.issubdtype(da.dtype, np.integer)
+
+
+def roundtrip_report(original, decoded, specs):
+    """
+    打包往返误差报告
+
+    Args:
+        original: {变量名: 打包前 float32 数组}
+        decoded: {变量名: 读回并还原后的 float32 数组}
+        specs: PACK_SPECS
+
+    Returns:
+        [{'var', 'precision', 'max_abs_err', 'rmse', 'clipped', 'nan_mismatch'}]；
+        误差只统计有效范围内的格点，clipped 为超出有效范围被裁剪的格点数
+    """
+    rows = []
+    print(f"{'变量':<14}{'精度':>10}{'最大误差':>12}{'RMSE':>12}{'裁剪格点':>10}{'缺测不一致':>10}")
+    for name, data in original.items():
+        spec = specs[name]
+        back = decoded[name]
+        valid = ~np.isnan(data)
+        inside = valid & (data >= spec['ValidRange'][0]) & (data <= spec['ValidRange'][1])
+        err = np.abs(back[inside].astype(np.float64) - data[inside])
+        row = {
+            'var': name, 'precision': spec['Precision'],
+            'max_abs_err': float(err.max()) if err.size else 0.0,
+            'rmse': float(np.sqrt(np.mean(err ** 2))) if err.size else 0.0,
+            'clipped': int(valid.sum() - inside.sum()),
+            'nan_mismatch': int((np.isnan(back) != ~valid).sum()),
+        }
+        rows.append(row)
+        print(f"{name:<14}{row['precision']:>10g}{row['max_abs_err']:>12.3g}{row['rmse']:>12.3g}"
+              f"{row['clipped']:>10}{row['nan_mismatch']:>10}")
+    return rows
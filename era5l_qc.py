@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 逐日输入的数据质量检查 (QC)
+--------------------------------------------------------------------
+- 在读入的波段缓冲区写出之前逐变量检查，每个变量按行条带只遍历一次（条带在 CPU 缓存内完成全部统计）：
+  缺测比例、最小/最大值；最小/最大值超出物理有效范围时再统计超出范围的格点数
+- 两块半球 tif 拼接处（经度 0° 与 ±180°）的接缝连续性：接缝两侧相邻列之差的平均绝对值，
+  与两侧 tif 内部相邻列之差的平均绝对值之比；某块 tif 来自错误日期时比值明显偏大
+- 变量间约束：X_min <= X <= X_max；蒸发经 *-1000 缩放后的负值比例（符号错误时大部分为负）；
+  Es/Ew/Et 顺序（Ew 为内陆水面蒸发，非零格点应最少，否则可能交换错误）
+- 每日一条记录以 JSONL 追加写入报告文件（多个工作进程可同时追加，每条记录一次 write），
+  运行结束时汇总本次运行的各项问题并追加一条 run 记录
+
+超过阈值的问题记为 error，其余记为 warn。启用 fail-fast 时有 error 的日期不写出（抛出 QCFailed），
+由调用方累计天数并决定是否停止运行。
+"""
+
+import os
+import json
+import time
+import datetime as dt
+import numpy as np
+
+# 阈值的键名：缺测比例、超出物理范围的格点比例、接缝差值与内部差值之比、违反 min/max 约束的格点比例、蒸发负值比例
+LIMIT_KEYS = ('nan_fraction', 'out_of_range', 'seam_ratio', 'bounds', 'evap_negative')
+BLOCK_ROWS = 120           # 条带高度：全球网格一条约 1.7 MB
+MIN_SEAM_PAIRS = 30        # 接缝两侧同时有效的格点少于此数时不计算比值（如 ±180° 处几乎全为海洋）
+BOUNDS_RTOL = 1e-4         # min/max 约束允许的相对误差
+EVAP_COMPONENTS = ('Es', 'Ew', 'Et')
+
+
+class QCFailed(Exception):
+    """启用 fail-fast 时某日的检查有 error"""
+
+
+def run_id():
+    """本次运行的标识（报告中区分不同运行的记录）"""
+    return f'{dt.datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}'
+
+
+def band_stats(x, valid_range=None, signs=False, block_rows=BLOCK_ROWS):
+    """
+    单个变量的统计量
+
+    Args:
+        x: (lat, lon) float32 数组
+        valid_range: (下限, 上限)；None 时不检查范围
+        signs: 是否统计非零与负值格点数（蒸发变量）
+
+    Returns:
+        dict: n / nan / min / max（无有效值时为 NaN）/ out（超出范围的格点数）/ nonzero / negative
+    """
+    n_nan = nonzero = negative = 0
+    lo, hi = np.float32(np.inf), np.float32(-np.inf)
+    for r in range(0, x.shape[0], block_rows):
+        strip = x[r:r + block_rows]
+        n = np.count_nonzero(np.isnan(strip))
+        n_nan += n
+        lo = np.fmin(lo, np.fmin.reduce(strip, axis=None))
+        hi = np.fmax(hi, np.fmax.reduce(strip, axis=None))
+        if signs:
+            nonzero += np.count_nonzero(strip) - n  # NaN 计为非零
+            negative += np.count_nonzero(strip < 0)
+    if n_nan == x.size:
+        lo = hi = np.nan
+    out = 0
+    if valid_range is not None and (lo < valid_range[0] or hi > valid_range[1]):
+        # 只在最小/最大值越界时统计越界格点数（正常数据不需要这一遍）
+        for r in range(0, x.shape[0], block_rows):
+            strip = x[r:r + block_rows]
+            out += np.count_nonzero((strip < valid_range[0]) | (strip > valid_range[1]))
+    return {'n': x.size, 'nan': n_nan, 'min': float(lo), 'max': float(hi), 'out': out,
+            'nonzero': nonzero, 'negative': negative}
+
+
+def seam_ratio(x, col):
+    """
+    第 col-1 列与第 col 列之间（col 为 0 时为最后一列与第一列之间）接缝的连续性
+
+    Returns:
+        接缝两侧之差的平均绝对值 / 两侧 tif 内部相邻列之差的平均绝对值；有效格点对不足 MIN_SEAM_PAIRS 时为 None
+    """
+    cols = np.take(x, [col - 2, col - 1, col, col + 1], axis=1, mode='wrap').astype(np.float64)
+    diff = np.abs(np.diff(cols, axis=1))  # (lat, 3)：左侧内部、接缝、右侧内部
+    seam = diff[:, 1][~np.isnan(diff[:, 1])]
+    inner = diff[:, [0, 2]][~np.isnan(diff[:, [0, 2]])]
+    if seam.size < MIN_SEAM_PAIRS or inner.size < MIN_SEAM_PAIRS:
+        return None
+    return float(seam.mean() / max(inner.mean(), np.finfo(np.float32).tiny))
+
+
+def bound_pairs(names):
+    """变量间 (较小者, 较大者) 约束：X_min <= X <= X_max；没有 X 时 X_min <= X_max"""
+    pairs = []
+    for name in names:
+        for suffix in ('_min', '_max'):
+            if not name.endswith(suffix):
+                continue
+            base = name[:-len(suffix)]
+            if base in names:
+                pairs.append((name, base) if suffix == '_min' else (base, name))
+            elif suffix == '_min' and base + '_max' in names:
+                pairs.append((name, base + '_max'))
+    return pairs
+
+
+def bound_violations(lower, upper, rtol=BOUNDS_RTOL, block_rows=BLOCK_ROWS):
+    """lower > upper（允许 rtol 的相对误差）的格点数；任一方为 NaN 的格点不计"""
+    n = 0
+    for r in range(0, lower.shape[0], block_rows):
+        up = upper[r:r + block_rows]
+        n += np.count_nonzero(lower[r:r + block_rows] > up + rtol * np.abs(up))
+    return n
+
+
+def _round(v):
+    return None if v is None or not np.isfinite(v) else float(f'{v:.4g}')
+
+
+def check_day(d, categories, ranges, limits, seam_cols=(), evap_key='evap'):
+    """
+    检查一日读入的各输出变量
+
+    Args:
+        d: 日期
+        categories: {类别 Key: {变量名: (lat, lon) 数组}}（输出变量，已按 APPLY_EVAP_SWAP 重映射来源）
+        ranges: {变量名: (下限, 上限)} 物理有效范围，未列出的变量不检查范围
+        limits: {LIMIT_KEYS 中的键: 阈值}
+        seam_cols: 两块 tif 拼接处的列号（接缝在该列与前一列之间）；空表示不检查接缝（区域网格）
+        evap_key: 蒸发类别的 Key（检查符号与 Es/Ew/Et 顺序）
+
+    Returns:
+        dict: date / status（'ok' / 'warn' / 'error'）/ qc_s / vars（'类别/变量' -> [缺测比例, 最小值, 最大值]）/
+              seam（'类别/变量' -> [各接缝比值]）/ issues（[{'level', 'check', 'var', 'value', 'limit'}]）
+    """
+    t = time.time()
+    issues, var_stats, seams = [], {}, {}
+
+    def issue(check, var, value, limit, warn):
+        if value > limit:
+            level = 'error'
+        elif warn and value > 0:
+            level = 'warn'
+        else:
+            return
+        issues.append({'level': level, 'check': check, 'var': var, 'value': _round(value), 'limit': limit})
+
+    for key, arrays in categories.items():
+        evap = {}
+        for name, x in arrays.items():
+            label = f'{key}/{name}'
+            s = band_stats(x, ranges.get(name), signs=key == evap_key)
+            var_stats[label] = [_round(s['nan'] / s['n']), _round(s['min']), _round(s['max'])]
+            valid = s['n'] - s['nan']
+            issue('nan_fraction', label, s['nan'] / s['n'], limits['nan_fraction'], warn=False)
+            if valid:
+                issue('out_of_range', label, s['out'] / valid, limits['out_of_range'], warn=True)
+                if key == evap_key:
+                    issue('evap_negative', label, s['negative'] / valid, limits['evap_negative'], warn=False)
+                    evap[name] = s['nonzero'] / valid
+            if seam_cols:
+                ratios = [seam_ratio(x, col) for col in seam_cols]
+                seams[label] = [_round(r) for r in ratios]
+                for r in ratios:
+                    if r is not None:
+                        issue('seam_ratio', label, r, limits['seam_ratio'], warn=False)
+        for lower, upper in bound_pairs(arrays):
+            valid = arrays[lower].size - np.count_nonzero(np.isnan(arrays[lower]))
+            if valid:
+                issue('bounds', f'{key}/{lower}<={upper}', bound_violations(arrays[lower], arrays[upper]) / valid,
+                      limits['bounds'], warn=True)
+        if all(name in evap for name in EVAP_COMPONENTS) and evap['Ew'] > min(evap['Es'], evap['Et']):
+            # 启发式：顺序错误时不一定超出任何阈值，只记为 warn
+            issues.append({'level': 'warn', 'check': 'evap_order', 'var': f'{evap_key}/Ew',
+                           'value': _round(evap['Ew']), 'limit': _round(min(evap['Es'], evap['Et']))})
+
+    levels = {i['level'] for i in issues}
+    status = 'error' if 'error' in levels else 'warn' if levels else 'ok'
+    record = {'type': 'day', 'date': f'{d:%Y-%m-%d}', 'status': status, 'qc_s': round(time.time() - t, 4),
+              'vars': var_stats, 'issues': issues}
+    if seams:
+        record['seam'] = seams
+    return record
+
+
+def append(path, record):
+    """追加一条记录（一次 write，多个工作进程可同时追加）"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+def print_day(record, max_lines=5):
+    """打印一日的检查结果（error 优先，最多 max_lines 项）"""
+    n_err = sum(i['level'] == 'error' for i in record['issues'])
+    n_warn = len(record['issues']) - n_err
+    result = '通过' if record['status'] == 'ok' else f'{n_err} 项错误，{n_warn} 项警告'
+    print(f"  QC: {len(record['vars'])} 个变量，耗时 {record['qc_s']:.2f}秒，{result}")
+    for i in sorted(record['issues'], key=lambda i: i['level'] != 'error')[:max_lines]:
+        print(f"    [{i['level'].upper()}] {i['check']} {i['var']}: {i['value']} (阈值 {i['limit']})")
+
+
+def failure_message(record):
+    """QCFailed 的说明：日期与前三项 error"""
+    errors = [f"{i['check']} {i['var']}={i['value']}" for i in record['issues'] if i['level'] == 'error']
+    more = f' 等 {len(errors)} 项' if len(errors) > 3 else ''
+    return f"{record['date']} QC 未通过: {'; '.join(errors[:3])}{more}"
+
+
+def load_run(path, run=None):
+    """
+    读取报告中某次运行的逐日记录
+
+    Args:
+        run: 运行标识；None 时取文件中最后一次运行
+
+    Returns:
+        (运行标识, [day 记录])
+    """
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    if run is None:
+        run = next((r.get('run') for r in reversed(records) if r['type'] == 'day'), None)
+    return run, [r for r in records if r['type'] == 'day' and r.get('run') == run]
+
+
+def summarize(path, run=None):
+    """
+    汇总某次运行：各状态的天数，各项检查的问题数与最严重的一项
+
+    Returns:
+        dict: run / days / ok / warn / error / checks（{检查: {'warn', 'error', 'worst', 'var', 'date'}}）
+    """
+    run, days = load_run(path, run)
+    checks = {}
+    for day in days:
+        for i in day['issues']:
+            c = checks.setdefault(i['check'], {'warn': 0, 'error': 0, 'worst': None, 'var': None, 'date': None})
+            c[i['level']] += 1
+            if i['value'] is not None and (c['worst'] is None or i['value'] > c['worst']):
+                c.update(worst=i['value'], var=i['var'], date=day['date'])
+    summary = {'run': run, 'days': len(days), **{s: sum(day['status'] == s for day in days)
+                                                  for s in ('ok', 'warn', 'error')}, 'checks': checks}
+    print(f"QC 报告 {path}（运行 {run}）：检查 {summary['days']} 天，通过 {summary['ok']}，"
+          f"警告 {summary['warn']}，错误 {summary['error']}")
+    if checks:
+        print(f"{'检查':<16}{'warn':>7}{'error':>7}  最严重")
+        for name, c in sorted(checks.items()):
+            print(f"{name:<16}{c['warn']:>7}{c['error']:>7}  {c['worst']} ({c['var']}, {c['date']})")
+    return summary
+
+
+def finish_run(path, run, failed_days=0, stopped=False):
+    """运行结束时汇总本次运行，并追加一条 run 记录"""
+    if not os.path.isfile(path):
+        return None
+    summary = summarize(path, run)
+    append(path, dict(summary, type='run', failed_days=failed_days, stopped=stopped,
+                      finished_at=dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    return summary
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land GeoTIFF 的按布局读取计划
+--------------------------------------------------------------------
+根据 tif 的波段排列（band / pixel 交错）、分块方式与所需波段比例选择读取策略：
+
+- 'bands'：src.read(所需波段)。波段交错时每个波段的块独立存储，只解码所需波段
+- 'windows'：按块行对齐的窗口逐条读取所需波段。像素交错时每个块包含全部波段，
+  GDAL 块缓存只需容纳一个块行，每个块只解码一次，而不会因缓存不足对每个波段重复解码
+- 'full'：读取全部波段再逐波段复制所需波段。像素交错且所需波段占比高时调用次数最少；
+  按块行对齐的窗口分段读取，每段全部波段不超过 FULL_READ_MAX_BYTES，临时数据不随整幅大小增长
+
+读取时打开 GDAL 多线程解压 (NUM_THREADS)；每次读取打印所选计划及实测吞吐量（解码后 MB/s）。
+
+GDAL 块缓存 (GDAL_CACHEMAX) 是进程全局的，读取线程并发时不能逐次修改：运行开始时由 cache_mb_for
+按最大的读取计划估算所需大小，ensure_cache_mb 在主进程与各工作进程初始化时设置一次（只调大不调小）。
+"""
+
+import os
+import re
+import time
+import numpy as np
+import rasterio
+from rasterio.enums import Interleaving
+from rasterio.env import get_gdal_config, set_gdal_config
+from rasterio.windows import Window
+
+READ_STRATEGIES = ('auto', 'bands', 'windows', 'full')
+FULL_READ_FRACTION = 0.6              # 像素交错时所需波段占比不低于此值才考虑 'full'
+FULL_READ_MAX_BYTES = 256 * 1024**2   # 'full' 每段读取的全部波段数据上限（两块 tif 并行读取时各一段）
+
+
+def describe(src):
+    """文件布局摘要，例如 'pixel 交错, 256x256 分块, DEFLATE, 150 波段'"""
+    block_h, block_w = src.block_shapes[0]
+    tiling = f'{block_h}x{block_w} 分块' if src.profile.get('tiled') else f'{block_h} 行条带'
+    interleave = src.interleaving.value.lower() if src.interleaving else 'band'
+    compression = src.compression.value if src.compression else '无压缩'
+    return f'{interleave} 交错, {tiling}, {compression}, {src.count} 波段'
+
+
+def plan_read(src, n_needed, window, strategy='auto'):
+    """
+    选择读取策略
+
+    Args:
+        src: 已打开的 rasterio 数据集
+        n_needed: 所需波段数
+        window: 读取窗口
+        strategy: 'auto' 或强制使用的策略
+
+    Returns:
+        dict: strategy / reason / cache_mb（需要的 GDAL 块缓存大小；None 表示沿用默认值）
+    """
+    block_h = src.block_shapes[0][0]
+    pixel = src.interleaving == Interleaving.pixel and src.count > 1
+    bands_per_block = src.count if pixel else 1
+    # 一个块行（窗口宽度范围内）解码后的大小，按两倍预留
+    block_row_mb = 2 * bands_per_block * block_h * int(window.width) * 4 / 2**20
+    # 'full' 至少需一次读取一个块行的全部波段
+    full_row_bytes = src.count * block_h * int(window.width) * 4
+
+    if strategy != 'auto':
+        reason = '配置指定'
+    elif not pixel:
+        strategy, reason = 'bands', '波段交错，只解码所需波段'
+    elif n_needed / src.count >= FULL_READ_FRACTION and full_row_bytes <= FULL_READ_MAX_BYTES:
+        strategy, reason = 'full', f'像素交错且所需波段占 {n_needed / src.count:.0%}'
+    else:
+        strategy, reason = 'windows', f'像素交错，仅需 {n_needed}/{src.count} 波段，按块行读取避免重复解码'
+    # 波段交错时块解码后即被复制走，不依赖缓存大小；其余策略需容纳一个块行
+    cache_mb = None if strategy == 'bands' else max(64, int(block_row_mb) + 1)
+    return {'strategy': strategy, 'reason': reason, 'cache_mb': cache_mb}
+
+
+def _physical_memory_bytes():
+    """物理内存大小（字节）；无法获取时返回 None"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):  # Windows 上没有 sysconf
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.virtual_memory().total
+
+
+def parse_cache_mb(value):
+    """
+    GDAL_CACHEMAX 取值换算为 MB
+
+    整数为字节数（rasterio 的 get_gdal_config 返回 GDALGetCacheMax64 的字节数）；字符串按 GDAL 的写法：
+    '5%' 为物理内存的百分比，'512MB' / '2GB' 带单位，不带单位的数字小于 100000 时为 MB、否则为字节。
+    None 或无法解析（含无法获取物理内存的百分比）时返回 None。
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value // 2**20
+    text = str(value).strip().upper()
+    m = re.fullmatch(r'(\d+(?:\.\d+)?)\s*(%|MB|GB)?', text)
+    if m is None:
+        return None
+    number, unit = float(m[1]), m[2]
+    if unit == '%':
+        total = _physical_memory_bytes()
+        return None if total is None else int(total * number / 100) // 2**20
+    if unit == 'GB':
+        return int(number * 1024)
+    if unit == 'MB' or number < 100000:
+        return int(number)
+    return int(number) // 2**20
+
+
+def current_cache_mb():
+    """GDAL 当前块缓存上限 (MB)；无法确定时返回 None"""
+    return parse_cache_mb(get_gdal_config('GDAL_CACHEMAX'))
+
+
+def ensure_cache_mb(cache_mb):
+    """
+    将本进程的 GDAL 块缓存上限调大到至少 cache_mb (MB)；cache_mb 为 None 或当前已足够时不修改
+
+    块缓存为进程全局设置，应在启动读取线程之前调用（主进程运行开始时、工作进程初始化时）；
+    rasterio 按字节设置 GDAL_CACHEMAX。
+
+    Returns:
+        设置后的上限 (MB)，未修改时为当前值
+    """
+    current = current_cache_mb()
+    if cache_mb is None or (current is not None and current >= cache_mb):
+        return current
+    set_gdal_config('GDAL_CACHEMAX', int(cache_mb) * 2**20)
+    return int(cache_mb)
+
+
+def cache_mb_for(paths, n_needed, strategy='auto'):
+    """
+    并发读取 paths 中各 tif（各 n_needed 个波段、整幅窗口）所需的块缓存 (MB)：各文件计划所需之和
+
+    只读取文件头；各计划均不依赖缓存大小（波段交错按波段读取）时返回 None。
+    """
+    total = 0
+    for path in paths:
+        with rasterio.open(path) as src:
+            plan = plan_read(src, n_needed, Window(0, 0, src.width, src.height), strategy)
+        total += plan['cache_mb'] or 0
+    return total or None
+
+
+def _read_windows(src, band_indices, window, out):
+    block_h = src.block_shapes[0][0]
+    row0, row_end = int(window.row_off), int(window.row_off + window.height)
+    row = row0
+    while row < row_end:
+        next_row = min(row_end, (row // block_h + 1) * block_h)  # 与块行边界对齐
+        src.read(band_indices, window=Window(window.col_off, row, window.width, next_row - row),
+                 out=out[:, row - row0:next_row - row0])
+        row = next_row
+
+
+def _read_full(src, band_indices, window, out):
+    """全部波段按块行对齐的窗口分段读取（每段不超过 FULL_READ_MAX_BYTES），逐波段复制所需波段到 out"""
+    block_h = src.block_shapes[0][0]
+    row_bytes = src.count * int(window.width) * 4
+    step = max(1, FULL_READ_MAX_BYTES // (row_bytes * block_h)) * block_h
+    row0, row_end = int(window.row_off), int(window.row_off + window.height)
+    row = row0
+    while row < row_end:
+        next_row = min(row_end, (row // block_h) * block_h + step)
+        data = src.read(window=Window(window.col_off, row, window.width, next_row - row))
+        for i, b in enumerate(band_indices):
+            out[i, row - row0:next_row - row0] = data[b - 1]
+        del data
+        row = next_row
+
+
+def read_bands(path, band_indices, out=None, window=None, strategy='auto', num_threads='ALL_CPUS', label=None):
+    """
+    按读取计划读取所需波段
+
+    Args:
+        path: tif 路径
+        band_indices: 所需波段索引（1 起）
+        out: 可选的预分配 float32 数组（可为更大数组的视图）
+        window: 读取窗口；None 为整块
+        strategy: 'auto' / 'bands' / 'windows' / 'full'
+        num_threads: GDAL 解压线程数（'ALL_CPUS' 或整数）
+        label: 日志中的名称；None 时不打印
+
+    Returns:
+        (n_bands, height, width) 数组
+    """
+    with rasterio.open(path, NUM_THREADS=str(num_threads)) as src:
+        window = window or Window(0, 0, src.width, src.height)
+        plan = plan_read(src, len(band_indices), window, strategy)
+        if out is None:
+            out = np.empty((len(band_indices), int(window.height), int(window.width)), dtype=np.float32)
+        t = time.time()
+        with rasterio.Env(GDAL_NUM_THREADS=str(num_threads)):
+            if plan['strategy'] == 'bands':
+                src.read(band_indices, window=window, out=out)
+            elif plan['strategy'] == 'windows':
+                _read_windows(src, band_indices, window, out)
+            else:
+                _read_full(src, band_indices, window, out)
+        elapsed = time.time() - t
+        if label is not None:
+            print(f"  读取计划 {label}: {plan['strategy']}（{plan['reason']}；{describe(src)}），"
+                  f"{out.nbytes / 2**20 / max(elapsed, 1e-6):.0f} MB/s")
+    return out
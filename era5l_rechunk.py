@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+逐日输出重排为按时间方向分块的 Zarr 存储（像元优先），用于长时间序列的单点提取
+--------------------------------------------------------------------
+- 每个类别一个存储 <类别输出目录>/timeseries/ERA5_Land_TimeSeries_<类别>.zarr，变量形状为 (time, lat, lon)，
+  分块如 (time=全部, lat=50, lon=50)：一个格点整个时间范围的逐日序列位于同一个块中
+- 逐日文件每天一幅 (lat, lon)，直接按目标分块写出需要同时持有全部日期；改为内存有界的两遍算法：
+  第一遍每次读取 B 天的整幅数据，写入中间存储（块为 B 天 x 若干个目标空间块）；
+  第二遍每次读取一个中间块空间范围内的全部时间，按目标块整块写出（不需要读-改-写）。
+  B 与中间块的空间大小均按内存预算确定，两遍的峰值内存都不超过预算
+- 全部日期一次即可放入预算时只做一遍，直接写出目标存储
+- 各变量在独立进程中重排（预算按进程数均分）；缺失的日期为 NaN，present 数组记录各日是否有日文件；
+  int16 打包的日文件读取时还原为 float32，陆地格点存储的日文件还原为网格
+- 先写入同目录的临时存储，完成后替换已有存储
+
+extract_points() 按最近格点提取多个站点的时间序列，只读取站点所在的块，每个块只读一次。
+依赖 zarr>=3（conda install -c conda-forge zarr），写出格式为 Zarr v2，可直接用 xr.open_zarr(path) 读取。
+"""
+
+import os
+import re
+import time
+import shutil
+import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import xarray as xr
+import netCDF4
+
+import era5l_journal
+import era5l_land
+
+try:
+    import zarr
+    import numcodecs
+except ImportError:  # 仅在重排与提取时才需要
+    zarr = None
+
+RECHUNK_COMPLEVEL = 5
+SCRATCH_COMPLEVEL = 1      # 中间存储只写读各一次，使用快速压缩
+SKIP_GLOBAL_ATTRS = ('ProcessingStatus',)
+
+
+def require_zarr():
+    if zarr is None:
+        raise ImportError('时间序列重排需要 zarr>=3：conda install -c conda-forge zarr')
+
+
+def store_path(out_dir, file_tag):
+    """某类别时间序列存储的路径"""
+    return os.path.join(out_dir, 'timeseries', f'ERA5_Land_TimeSeries_{file_tag}.zarr')
+
+
+def plan_layout(n_time, shape, chunks, memory_bytes):
+    """
+    确定目标分块与两遍算法的块大小
+
+    Args:
+        n_time: 天数
+        shape: (lat, lon)
+        chunks: 目标分块 (time, lat, lon)；time 为 None 表示整个时间范围一个块
+        memory_bytes: 单个变量可用的内存预算
+
+    Returns:
+        dict: chunks（目标分块）/ single_pass / block_days（第一遍每次读取的天数）/
+              scratch_chunks（中间存储分块）/ slab（第二遍每次读取的 (time, lat, lon) 范围）/ peak_bytes
+    """
+    ny, nx = shape
+    tc = n_time if chunks[0] is None else min(chunks[0], n_time)
+    cy, cx = min(chunks[1], ny), min(chunks[2], nx)
+    day_bytes = ny * nx * 4
+    block_days = int(max(1, memory_bytes // day_bytes))
+    layout = {'chunks': (tc, cy, cx), 'single_pass': block_days >= n_time}
+    if layout['single_pass']:
+        return dict(layout, block_days=n_time, scratch_chunks=None, slab=(n_time, ny, nx),
+                    peak_bytes=n_time * day_bytes)
+    # 第二遍：每次读取 tc 天 x 若干个目标空间块，先沿经度方向扩展（同一纬度带的块相邻）
+    tiles = int(max(1, memory_bytes // (tc * cy * cx * 4)))
+    mx = min(-(-nx // cx), tiles)
+    my = min(-(-ny // cy), max(1, tiles // mx))
+    h, w = min(cy * my, ny), min(cx * mx, nx)
+    return dict(layout, block_days=block_days, scratch_chunks=(block_days, h, w), slab=(tc, h, w),
+                peak_bytes=max(block_days * day_bytes, tc * h * w * 4))
+
+
+def describe(path):
+    """
+    读取一个日文件的网格、数据变量与属性
+
+    Returns:
+        dict: lat / lon / variables（{变量名: {'long_name', 'units'}}，按文件中的顺序）/ attrs（全局属性）
+    """
+    with netCDF4.Dataset(path) as nc:
+        variables = {}
+        for name, var in nc.variables.items():
+            if name in ('lat', 'lon', era5l_land.LAND_DIM) or name in nc.dimensions:
+                continue
+            variables[name] = {k: var.getncattr(k) for k in ('long_name', 'units') if k in var.ncattrs()}
+        return {'lat': np.asarray(nc.variables['lat'][:], dtype=np.float64),
+                'lon': np.asarray(nc.variables['lon'][:], dtype=np.float64),
+                'variables': variables,
+                'attrs': {k: _attr_value(nc.getncattr(k)) for k in nc.ncattrs() if k not in SKIP_GLOBAL_ATTRS}}
+
+
+def _attr_value(value):
+    """NetCDF 数值属性（numpy 标量 / 数组）转换为 Python 类型，Zarr 属性须可序列化为 JSON"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def read_grid(path, name, out):
+    """
+    将日文件中的一个变量读入 out（(lat, lon) float32）；打包变量还原为 float32，陆地向量还原为网格
+
+    Returns:
+        是否读到该变量（文件中没有时 out 保持不变）
+    """
+    with netCDF4.Dataset(path) as nc:
+        if name not in nc.variables:
+            return False
+        var = nc.variables[name]
+        values = np.ma.filled(var[:].astype(np.float32), np.nan)
+        if var.dimensions == (era5l_land.LAND_DIM,):
+            values = era5l_land.scatter(values, nc.variables[era5l_land.LAND_DIM][:], out.shape)
+        out[...] = values
+    return True
+
+
+def _open(path, mode):
+    return zarr.open_group(path, mode=mode, zarr_format=2)
+
+
+def _create_array(group, name, shape, chunks, dtype, dims, attrs=None, fill_value=None, complevel=RECHUNK_COMPLEVEL):
+    arr = group.create_array(name, shape=shape, chunks=chunks, dtype=dtype, fill_value=fill_value,
+                             compressors=numcodecs.Zlib(level=complevel) if complevel else None)
+    arr.attrs.update(dict(attrs or {}, _ARRAY_DIMENSIONS=list(dims)))
+    return arr
+
+
+def rechunk_variable(store, scratch, name, files, layout):
+    """
+    重排一个变量（可在工作进程中执行）：读取各日文件，经中间存储（或直接）写入目标存储中已创建的数组
+
+    Args:
+        store: 目标存储（临时路径）
+        scratch: 中间存储；单遍时为 None
+        name: 变量名
+        files: 按日期顺序的日文件路径，缺失的日期为 None
+        layout: plan_layout() 的返回值
+
+    Returns:
+        (变量名, 第一遍耗时, 第二遍耗时)
+    """
+    target = _open(store, 'r+')[name]
+    n_time, shape = target.shape[0], target.shape[1:]
+    t = time.time()
+    dest = target if layout['single_pass'] else _open(scratch, 'r+')[name]
+    step = layout['block_days']
+    for t0 in range(0, n_time, step):
+        block = np.full((min(step, n_time - t0),) + shape, np.nan, dtype=np.float32)
+        for i, path in enumerate(files[t0:t0 + step]):
+            if path is not None:
+                read_grid(path, name, block[i])
+        dest[t0:t0 + len(block)] = block
+        del block
+    first = time.time() - t
+    if layout['single_pass']:
+        return name, first, 0.0
+
+    t = time.time()
+    tc, h, w = layout['slab']
+    for t0 in range(0, n_time, tc):
+        for r0 in range(0, shape[0], h):
+            for c0 in range(0, shape[1], w):
+                target[t0:t0 + tc, r0:r0 + h, c0:c0 + w] = dest[t0:t0 + tc, r0:r0 + h, c0:c0 + w]
+    return name, first, time.time() - t
+
+
+def build(path, dates, files, chunks, memory_bytes, workers=1):
+    """
+    将一个类别的逐日文件重排为时间序列存储
+
+    Args:
+        path: 存储路径（已存在时在完成后替换）
+        dates: 连续的日期列表
+        files: 与 dates 对应的日文件路径（不存在的文件视为缺失日期）
+        chunks: 目标分块 (time, lat, lon)，time 为 None 表示全部日期
+        memory_bytes: 内存预算（各工作进程均分）
+        workers: 并行重排的变量数（进程数）
+
+    Returns:
+        dict: plan_layout() 的返回值，另含 variables / present（有日文件的天数）/ pass1_s / pass2_s
+    """
+    require_zarr()
+    files = [f if os.path.isfile(f) else None for f in files]
+    first = next((f for f in files if f is not None), None)
+    if first is None:
+        raise FileNotFoundError(f'{path}: 日期范围内没有日文件')
+    info = describe(first)
+    shape = (len(info['lat']), len(info['lon']))
+    workers = max(1, min(workers, len(info['variables'])))
+    layout = plan_layout(len(dates), shape, chunks, memory_bytes // workers)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = era5l_journal.temp_path(path)
+    scratch = None if layout['single_pass'] else f'{tmp}.pass1'
+    for p in (tmp, scratch):
+        if p is not None and os.path.exists(p):
+            shutil.rmtree(p)
+    group = _open(tmp, 'w')
+    _create_array(group, 'lat', (shape[0],), (shape[0],), 'f8', ['lat'],
+                  {'units': 'degrees_north', 'long_name': 'latitude'})[:] = info['lat']
+    _create_array(group, 'lon', (shape[1],), (shape[1],), 'f8', ['lon'],
+                  {'units': 'degrees_east', 'long_name': 'longitude'})[:] = info['lon']
+    _create_array(group, 'time', (len(dates),), (len(dates),), 'i4', ['time'],
+                  {'units': f'days since {dates[0]:%Y-%m-%d}', 'calendar': 'standard', 'long_name': 'time'}
+                  )[:] = np.arange(len(dates), dtype='i4')
+    _create_array(group, 'present', (len(dates),), (len(dates),), 'i1', ['time'],
+                  {'long_name': 'daily file present (1) or missing (0)'}, complevel=0
+                  )[:] = np.array([f is not None for f in files], dtype='i1')
+    for name, attrs in info['variables'].items():
+        _create_array(group, name, (len(dates),) + shape, layout['chunks'], 'f4', ['time', 'lat', 'lon'],
+                      attrs, fill_value=np.nan)
+    group.attrs.update(info['attrs'])
+    group.attrs.update({'time_coverage_start': f'{dates[0]:%Y-%m-%d}', 'time_coverage_end': f'{dates[-1]:%Y-%m-%d}',
+                        'chunking': 'time-series (pixel-major)'})
+    if scratch is not None:
+        inter = _open(scratch, 'w')
+        for name in info['variables']:
+            _create_array(inter, name, (len(dates),) + shape, layout['scratch_chunks'], 'f4', ['time', 'lat', 'lon'],
+                          fill_value=np.nan, complevel=SCRATCH_COMPLEVEL)
+
+    jobs = [(tmp, scratch, name, files, layout) for name in info['variables']]
+    pass1 = pass2 = 0.0
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(rechunk_variable, *zip(*jobs)))
+        else:
+            results = [rechunk_variable(*job) for job in jobs]
+        for name, s1, s2 in results:
+            pass1 += s1
+            pass2 += s2
+    finally:
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+    zarr.consolidate_metadata(tmp, zarr_format=2)
+
+    if os.path.exists(path):
+        old = f'{path}.{os.getpid()}.old'
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, path)
+    return dict(layout, variables=list(info['variables']), present=sum(f is not None for f in files),
+                pass1_s=pass1, pass2_s=pass2)
+
+
+def _time_origin(units):
+    m = re.match(r'days since (\d{4}-\d{2}-\d{2})', units)
+    if m is None:
+        raise ValueError(f'不支持的 time 单位: {units}')
+    return dt.datetime.strptime(m.group(1), '%Y-%m-%d')
+
+
+def _as_datetime(value):
+    """'yyyymmdd' 字符串、date 或 datetime 转换为 datetime"""
+    if isinstance(value, str):
+        return dt.datetime.strptime(value, '%Y%m%d')
+    if isinstance(value, dt.datetime):
+        return value
+    if isinstance(value, dt.date):
+        return dt.datetime(value.year, value.month, value.day)
+    raise TypeError(f'日期须为 datetime 或 yyyymmdd 字符串: {value!r}')
+
+
+def nearest_cells(grid_lat, grid_lon, lat, lon):
+    """
+    各站点的最近格点 (行, 列)；经度可为 -180..180 或 0..360
+
+    站点经度折算到网格自身的经度区间 [grid_lon[0] - 半格距, 该值 + 360)，
+    因此跨越 180° 经线的区域网格（经度连续递增超过 180）也能匹配。
+
+    Raises:
+        ValueError: 站点不在网格范围内（距最近格点超过半个格距）
+    """
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+    dy = abs(grid_lat[1] - grid_lat[0]) if len(grid_lat) > 1 else np.inf
+    dx = abs(grid_lon[1] - grid_lon[0]) if len(grid_lon) > 1 else np.inf
+    west = grid_lon[0] - (dx / 2 if np.isfinite(dx) else 0.0)
+    lon = west + (lon - west) % 360.0
+    iy = np.abs(grid_lat[:, None] - lat[None, :]).argmin(axis=0)
+    ix = np.abs(grid_lon[:, None] - lon[None, :]).argmin(axis=0)
+    outside = (np.abs(grid_lat[iy] - lat) > dy * 0.501) | (np.abs(grid_lon[ix] - lon) > dx * 0.501)
+    if outside.any():
+        bad = ', '.join(f'({a:g}, {o:g})' for a, o in zip(lat[outside], lon[outside]))
+        raise ValueError(f'站点不在网格范围内: {bad}')
+    return iy, ix
+
+
+def extract_points(store, lat, lon, variables=None, start=None, end=None, names=None):
+    """
+    提取多个站点（最近格点）的逐日时间序列，只读取站点所在的块
+
+    Args:
+        store: 时间序列存储路径（build() 写出的存储，或任何带 lat / lon / time 的 (time, lat, lon) Zarr 存储）
+        lat, lon: 站点纬度、经度（标量或数组）
+        variables: 变量名列表；None 为全部 (time, lat, lon) 变量
+        start, end: 起止日期（含，datetime 或 'yyyymmdd'）；None 为存储的起止
+        names: 站点名称（作为 point 坐标）；None 时为 0..n-1
+
+    Returns:
+        xarray.Dataset：各变量为 (time, point)；point 上的坐标 lat / lon 为格点位置，station_lat / station_lon 为站点位置
+    """
+    require_zarr()
+    group = _open(store, 'r')
+    grid_lat, grid_lon = group['lat'][:], group['lon'][:]
+    iy, ix = nearest_cells(grid_lat, grid_lon, lat, lon)
+    origin = _time_origin(group['time'].attrs['units'])
+    days = group['time'][:]
+    t0 = 0 if start is None else int(np.searchsorted(days, (_as_datetime(start) - origin).days))
+    t1 = len(days) if end is None else int(np.searchsorted(days, (_as_datetime(end) - origin).days, side='right'))
+    if variables is None:
+        variables = [name for name in group.array_keys()
+                     if group[name].attrs.get('_ARRAY_DIMENSIONS') == ['time', 'lat', 'lon']]
+
+    data_vars = {}
+    for name in variables:
+        arr = group[name]
+        cy, cx = arr.chunks[1:]
+        values = np.empty((t1 - t0, len(iy)), dtype=arr.dtype)
+        # 同一个块内的站点一次读取：读取范围为这些站点的外接框，不超出该块
+        blocks = (iy // cy) * (-(-arr.shape[2] // cx)) + ix // cx
+        for block in np.unique(blocks):
+            sel = np.flatnonzero(blocks == block)
+            r0, r1 = iy[sel].min(), iy[sel].max() + 1
+            c0, c1 = ix[sel].min(), ix[sel].max() + 1
+            values[:, sel] = arr[t0:t1, r0:r1, c0:c1][:, iy[sel] - r0, ix[sel] - c0]
+        data_vars[name] = xr.DataArray(values, dims=['time', 'point'], attrs=dict(arr.attrs))
+        data_vars[name].attrs.pop('_ARRAY_DIMENSIONS', None)
+    n = len(iy)
+    coords = {
+        'time': [origin + dt.timedelta(days=int(d)) for d in days[t0:t1]],
+        'point': list(names) if names is not None else np.arange(n),
+        'lat': ('point', grid_lat[iy]),
+        'lon': ('point', grid_lon[ix]),
+        'station_lat': ('point', np.atleast_1d(np.asarray(lat, dtype=np.float64))),
+        'station_lon': ('point', np.atleast_1d(np.asarray(lon, dtype=np.float64))),
+    }
+    return xr.Dataset(data_vars, coords=coords)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+逐日 NetCDF 输出的虚拟聚合索引（kerchunk 引用）
+--------------------------------------------------------------------
+- 每个日文件写出后记录一个引用片段 <类别输出目录>/refs/<yyyy>/<类别>_<yyyymmdd>.json：
+  各变量的 Zarr 元数据与每个 HDF5 数据块在文件中的 (偏移, 长度)，坐标直接内嵌
+- 各类别的片段按日期合并为一个引用索引 refs/ERA5_Land_Daily_<类别>.json：数据变量增加 time 维，
+  每个 (日期, 数据块) 指向对应日文件中的字节范围；合并只读片段，不打开任何 NetCDF 文件
+- 合并时核对各日的网格与变量结构（分块、类型、过滤器、属性），不一致的日期不纳入索引并报告
+- 索引中的文件路径相对类别输出目录（模板 {{root}}），整个输出目录移动后 open_index() 仍可打开
+
+用 open_index(path) 或 fsspec 的 reference:// 协议，可将整个时间序列作为一个惰性 Dataset 打开，
+每个变量按 (1, lat, lon) 分块读取，只在读取数据时访问对应日文件。
+依赖 kerchunk 与 h5py（conda install -c conda-forge kerchunk h5py），仅在生成片段时导入。
+"""
+
+import os
+import json
+import glob
+import base64
+import datetime as dt
+import numpy as np
+import xarray as xr
+
+import era5l_journal
+
+try:
+    from kerchunk.hdf import SingleHdf5ToZarr
+except ImportError:  # 仅在启用引用索引时才需要
+    SingleHdf5ToZarr = None
+
+
+def require_kerchunk():
+    if SingleHdf5ToZarr is None:
+        raise ImportError('引用索引需要 kerchunk 与 h5py：conda install -c conda-forge kerchunk h5py')
+
+
+def fragment_path(out_dir, file_tag, d):
+    """某日文件的引用片段路径"""
+    return os.path.join(out_dir, 'refs', str(d.year), f'{file_tag}_{d:%Y%m%d}.json')
+
+
+def index_path(out_dir, file_tag):
+    """某类别的合并引用索引路径"""
+    return os.path.join(out_dir, 'refs', f'ERA5_Land_Daily_{file_tag}.json')
+
+
+def fragment_stale(nc_path, frag_path):
+    """片段不存在或早于日文件（文件已重写/追加）时返回 True"""
+    try:
+        return os.path.getmtime(frag_path) < os.path.getmtime(nc_path)
+    except FileNotFoundError:
+        return True
+
+
+def make_fragment(nc_path, out_dir, d):
+    """
+    读取一个日文件的 HDF5 元数据，生成引用片段
+
+    Args:
+        nc_path: 日文件路径
+        out_dir: 类别输出根目录（片段中的文件路径相对此目录）
+        d: 日期
+
+    Returns:
+        dict: date / file（相对路径）/ refs（Zarr v2 键 -> 元数据 JSON 字符串或 [url, 偏移, 长度]）
+    """
+    require_kerchunk()
+    rel = os.path.relpath(nc_path, out_dir).replace(os.sep, '/')
+    with open(nc_path, 'rb') as f:
+        refs = SingleHdf5ToZarr(f, nc_path, inline_threshold=0).translate()['refs']
+        for key, value in refs.items():
+            if isinstance(value, list):
+                refs[key] = ['{{root}}/' + rel] + value[1:]
+        # 坐标（未压缩的一维数组）内嵌，合并时可直接比较网格，索引也不依赖某个日文件
+        for name in _coord_names(refs):
+            meta = json.loads(refs[f'{name}/.zarray'])
+            ref = refs.get(f'{name}/0')
+            if meta['compressor'] is None and not meta['filters'] and isinstance(ref, list):
+                f.seek(ref[1])
+                refs[f'{name}/0'] = 'base64:' + base64.b64encode(f.read(ref[2])).decode('ascii')
+    return {'date': f'{d:%Y-%m-%d}', 'file': rel, 'refs': refs}
+
+
+def write_fragment(nc_path, out_dir, file_tag, d):
+    """生成并原子写出某日文件的引用片段，返回片段路径"""
+    path = fragment_path(out_dir, file_tag, d)
+    _write_json(make_fragment(nc_path, out_dir, d), path)
+    return path
+
+
+def _write_json(obj, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = era5l_journal.temp_path(path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def _array_names(refs):
+    return [key[:-len('/.zarray')] for key in refs if key.endswith('/.zarray')]
+
+
+def _coord_names(refs):
+    """一维且维度名与自身同名的数组（lat / lon）"""
+    return [name for name in _array_names(refs)
+            if json.loads(refs[f'{name}/.zattrs']).get('_ARRAY_DIMENSIONS') == [name]]
+
+
+def load_fragments(out_dir, file_tag):
+    """载入某类别的全部引用片段，按日期排序"""
+    frags = []
+    for path in glob.glob(os.path.join(glob.escape(os.path.join(out_dir, 'refs')), '*', f'{file_tag}_*.json')):
+        with open(path, encoding='utf-8') as f:
+            frags.append(json.load(f))
+    return sorted(frags, key=lambda frag: frag['date'])
+
+
+def combine(out_dir, file_tag, fragments=None):
+    """
+    将某类别的引用片段合并为一个带 time 维的引用索引并原子写出
+
+    以第一个片段的网格与各变量结构为基准；网格或某个已有变量的结构不同的日期不纳入索引。
+    变量取各日并集，某日文件缺少的变量（如增量追加前的日期）读取为缺测。
+
+    Args:
+        out_dir: 类别输出根目录
+        file_tag: 类别文件标签
+        fragments: 已载入的片段（None 时从 refs 目录载入）
+
+    Returns:
+        (索引路径, 纳入的天数, 未纳入的 [(日期, 原因)])；没有片段时索引路径为 None
+    """
+    fragments = load_fragments(out_dir, file_tag) if fragments is None else fragments
+    if not fragments:
+        return None, 0, []
+    base = fragments[0]['refs']
+    coords = _coord_names(base)
+    grid = {key: value for key, value in base.items() if key.split('/')[0] in coords}
+    meta = {}       # 变量名 -> (.zarray, .zattrs)
+    days = []
+    skipped = []
+    for frag in fragments:
+        refs = frag['refs']
+        reason = None
+        if any(refs.get(key) != value for key, value in grid.items()):
+            reason = '网格不同'
+        else:
+            for name in _array_names(refs):
+                if name in coords:
+                    continue
+                item = (refs[f'{name}/.zarray'], refs[f'{name}/.zattrs'])
+                if meta.setdefault(name, item) != item:
+                    reason = f'{name} 的结构不同'
+                    break
+        if reason:
+            skipped.append((frag['date'], reason))
+        else:
+            days.append(frag)
+
+    t0 = dt.datetime.strptime(days[0]['date'], '%Y-%m-%d')
+    offsets = [(dt.datetime.strptime(frag['date'], '%Y-%m-%d') - t0).days for frag in days]
+    refs = {'.zgroup': base['.zgroup'], '.zattrs': base['.zattrs']}
+    refs.update(grid)
+    refs['time/.zarray'] = json.dumps({'shape': [len(days)], 'chunks': [len(days)], 'dtype': '<i4',
+                                       'fill_value': None, 'order': 'C', 'filters': None, 'compressor': None,
+                                       'zarr_format': 2})
+    refs['time/.zattrs'] = json.dumps({'_ARRAY_DIMENSIONS': ['time'], 'standard_name': 'time',
+                                       'units': f'days since {t0:%Y-%m-%d}', 'calendar': 'proleptic_gregorian'})
+    refs['time/0'] = 'base64:' + base64.b64encode(b''.join(n.to_bytes(4, 'little', signed=True)
+                                                           for n in offsets)).decode('ascii')
+    for name, (zarray, zattrs) in meta.items():
+        zarray, zattrs = json.loads(zarray), json.loads(zattrs)
+        zarray['shape'] = [len(days)] + zarray['shape']
+        zarray['chunks'] = [1] + zarray['chunks']
+        zattrs['_ARRAY_DIMENSIONS'] = ['time'] + zattrs['_ARRAY_DIMENSIONS']
+        refs[f'{name}/.zarray'] = json.dumps(zarray)
+        refs[f'{name}/.zattrs'] = json.dumps(zattrs)
+    for t, frag in enumerate(days):
+        for key, value in frag['refs'].items():
+            name, _, chunk = key.rpartition('/')
+            if name in meta and not chunk.startswith('.'):
+                refs[f'{name}/{t}.{chunk}'] = value
+
+    path = index_path(out_dir, file_tag)
+    _write_json({'version': 1, 'templates': {'root': os.path.abspath(out_dir).replace(os.sep, '/')},
+                 'refs': refs}, path)
+    return path, len(days), skipped
+
+
+def open_index(path, chunks=None):
+    """
+    将引用索引作为一个惰性 Dataset 打开（只读索引文件，不打开日文件）
+
+    Args:
+        path: combine() 写出的索引
+        chunks: 传给 xarray 的分块；None 时按索引中的 (1, lat, lon) 数据块
+
+    Returns:
+        xarray.Dataset（dask 数组）；日文件按索引所在的类别输出目录定位
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(path))).replace(os.sep, '/')
+    ds = xr.open_dataset('reference://', engine='zarr', chunks={} if chunks is None else chunks,
+                         mask_and_scale=False,
+                         backend_kwargs={'consolidated': False,
+                                         'storage_options': {'fo': path, 'template_overrides': {'root': root}}})
+    # 索引中的属性经 JSON 保存为 float64，直接解码会把 int16 打包变量还原为 float64；
+    # 打包参数写出时为 float32 (era5l_packing)，恢复其类型后按 float32 解码，与直接打开日文件一致
+    for var in ds.variables.values():
+        if np.issubdtype(var.dtype, np.integer):
+            for attr in ('scale_factor', 'add_offset'):
+                if attr in var.attrs:
+                    var.attrs[attr] = np.float32(var.attrs[attr])
+    return xr.decode_cf(ds, decode_times=False)
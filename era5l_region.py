@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 区域子集与粗化输出
+--------------------------------------------------------------------
+- 经纬度框换算为全球 0.1° 网格上的行列范围，再换算为与之相交的半球 tif 上的 rasterio 窗口，
+  框外数据（包括完全不相交的那块半球）不会被读取
+- 可选整数粗化倍数：按块求平均输出 0.2°/0.5°/1° 等网格，*_min / *_max 变量分别取块内最小/最大值；
+  块内缺测 (NaN) 忽略，全部缺测时仍为 NaN
+- 粗化时行列范围向外对齐到倍数的整数倍，使不同区域的粗网格与全球粗网格重合
+- 西界大于东界的框跨越 180° 经线：列范围越过网格东端后从西端继续，输出经度连续递增（东段加 360°，如 170..190）
+
+0.1° 网格上只能得到 0.1° 整数倍的粗网格（0.25° 需要插值，不在此处理）。
+"""
+
+import warnings
+import numpy as np
+from rasterio.windows import Window
+
+
+def make_grid(bbox, factor, lat, lon, tile_width):
+    """
+    区域输出网格
+
+    Args:
+        bbox: (南, 北, 西, 东) 度；None 表示全球；西 > 东 时跨越 180° 经线
+        factor: 粗化倍数（1 表示不粗化），须整除全球网格的行数与列数
+        lat, lon: 全球网格中心点坐标（lat 由北向南）
+        tile_width: 每块半球 tif 的列数
+
+    Returns:
+        dict: rows / cols（全球网格上的 [起, 止) 范围；跨越 180° 经线时列止点大于网格列数，超出部分对列数取模）、
+              factor、lat / lon（输出坐标）、
+              windows（[(tif 序号, 窗口, 目标列起点)]）、shape（输出 (lat, lon) 形状）
+    """
+    n_rows, n_cols = len(lat), len(lon)
+    if n_rows % factor or n_cols % factor:
+        raise ValueError(f'粗化倍数 {factor} 须整除网格尺寸 {n_rows}x{n_cols}')
+    if bbox is None:
+        r0, r1, c0, c1 = 0, n_rows, 0, n_cols
+    else:
+        south, north, west, east = bbox
+        if not (south < north and west != east):
+            raise ValueError(f'区域范围无效: {bbox}，应为 (南, 北, 西, 东)')
+        rows = np.flatnonzero((lat >= south) & (lat <= north))
+        if west < east:
+            cols = np.flatnonzero((lon >= west) & (lon <= east))
+        else:  # 跨越 180° 经线：西段接东段，东段列号加 n_cols
+            cols = np.concatenate([np.flatnonzero(lon >= west), np.flatnonzero(lon <= east) + n_cols])
+        if not len(rows) or not len(cols):
+            raise ValueError(f'区域 {bbox} 内没有网格点')
+        r0, r1 = int(rows[0]) // factor * factor, -(-(int(rows[-1]) + 1) // factor) * factor
+        c0, c1 = int(cols[0]) // factor * factor, -(-(int(cols[-1]) + 1) // factor) * factor
+        if c0 >= n_cols:  # 框只落在网格西端（如西界 179.99、东界 -170）
+            c0, c1 = c0 - n_cols, c1 - n_cols
+        c1 = min(c1, c0 + n_cols)
+
+    windows = []
+    n_tiles = n_cols // tile_width
+    for k in range(2 * n_tiles):  # 第二轮为跨越 180° 经线后从西端继续的部分
+        t0, t1 = k * tile_width, (k + 1) * tile_width
+        lo, hi = max(c0, t0), min(c1, t1)
+        if lo < hi:
+            windows.append((k % n_tiles, Window(lo - t0, r0, hi - lo, r1 - r0), lo - c0))
+
+    cols = np.arange(c0, c1)
+    out_lat = lat[r0:r1].reshape(-1, factor).mean(axis=1)
+    out_lon = (lon[cols % n_cols] + 360.0 * (cols >= n_cols)).reshape(-1, factor).mean(axis=1)
+    return {'rows': (r0, r1), 'cols': (c0, c1), 'factor': factor, 'lat': out_lat, 'lon': out_lon,
+            'windows': windows, 'shape': (len(out_lat), len(out_lon))}
+
+
+def reducer_for(var_name):
+    """粗化时使用的块统计：*_min 取最小、*_max 取最大，其余取平均"""
+    if var_name.endswith('_min'):
+        return np.nanmin
+    if var_name.endswith('_max'):
+        return np.nanmax
+    return np.nanmean
+
+
+def coarsen(data, reducers, factor):
+    """
+    按块粗化 (波段, 行, 列) 数组
+
+    Args:
+        data: float32 数组，行列数为 factor 的整数倍
+        reducers: 每个波段的块统计函数（见 reducer_for）
+        factor: 粗化倍数
+
+    Returns:
+        float32 数组 (波段, 行/factor, 列/factor)
+    """
+    n, h, w = data.shape
+    blocks = data.reshape(n, h // factor, factor, w // factor, factor)
+    out = np.empty((n, h // factor, w // factor), dtype=np.float32)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # 全部缺测的块返回 NaN
+        for i, reduce in enumerate(reducers):
+            out[i] = reduce(blocks[i], axis=(1, 3))
+    return out
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ERA5-Land 各类别的 Zarr 输出后端
+--------------------------------------------------------------------
+- 每个类别一个 Zarr 存储 (ERA5_Land_Daily_<类别>.zarr)，变量形状为 (time, lat, lon)
+- time 轴按 ZARR_EPOCH 起算的日序号定位，每天只写入自身的 time 切片（chunk 的 time 长度为 1），
+  因此不同进程/机器可同时写入不同日期
+- 每天写完已选变量后在 complete 数组中为这些变量置位；中断后重新运行时跳过已完成的日期，
+  增量追加模式 (INCREMENTAL_APPEND) 下新增变量只补写各日缺少的变量切片
+- 存储的创建与 time 轴扩展只在主进程的规划阶段进行，工作进程只做区域写入
+
+依赖 zarr>=3（conda install -c conda-forge zarr），仅在 OUTPUT_BACKEND='zarr' 时导入。
+写出格式为 Zarr v2，可直接用 xr.open_zarr(path) 读取。
+"""
+
+import os
+import datetime as dt
+import numpy as np
+
+try:
+    import zarr
+    import numcodecs
+except ImportError:  # 仅在选择 Zarr 后端时才需要
+    zarr = None
+
+ZARR_EPOCH = dt.datetime(1950, 1, 1)   # ERA5-Land 数据起始日，time 坐标以此为基准
+ZARR_SPATIAL_CHUNKS = (450, 900)       # 每个 chunk 的 (lat, lon) 大小，time 方向固定为 1
+ZARR_COMPLEVEL = 5
+
+
+def _require_zarr():
+    if zarr is None:
+        raise ImportError('Zarr 输出后端需要 zarr>=3：conda install -c conda-forge zarr')
+
+
+def store_path(out_dir, file_tag):
+    """某类别 Zarr 存储的路径"""
+    return os.path.join(out_dir, f'ERA5_Land_Daily_{file_tag}.zarr')
+
+
+def time_index(d):
+    """日期在 time 轴上的位置"""
+    return (d - ZARR_EPOCH).days
+
+
+def _create_array(group, name, shape, chunks, dtype, dims, attrs=None, fill_value=None, compress=True):
+    arr = group.create_array(name, shape=shape, chunks=chunks, dtype=dtype, fill_value=fill_value,
+                             compressors=numcodecs.Zlib(level=ZARR_COMPLEVEL) if compress else None)
+    arr.attrs.update(dict(attrs or {}, _ARRAY_DIMENSIONS=list(dims)))
+    return arr
+
+
+def prepare_store(path, category_bands, band_list, end_dt, lat, lon, global_attrs):
+    """
+    创建或扩展类别存储，使 time 轴覆盖到 end_dt，并返回已选变量全部写入的日期集合
+
+    complete 数组形状为 (time, 类别全部变量数)，按类别变量表的顺序为每个变量留一个标记位，
+    因此变量子集与后续新增变量都能正确判断完成状态。
+    必须在写入进程启动前、于单一进程中调用（创建与扩展会修改元数据）。
+
+    Args:
+        path: 存储路径
+        category_bands: 该类别的完整变量表（决定 complete 标记位的顺序）
+        band_list: 该类别已选变量（波段字典列表）
+        end_dt: 本次运行的结束日期
+        lat, lon: 坐标数组
+        global_attrs: 全局属性
+
+    Returns:
+        set: 已选变量均已写入的日期
+    """
+    _require_zarr()
+    n_time = time_index(end_dt) + 1
+    n_lat, n_lon = len(lat), len(lon)
+    slots = [b['VarName'] for b in category_bands]
+    group = zarr.open_group(path, mode='a', zarr_format=2)
+
+    if 'complete' not in set(group.array_keys()):
+        _create_array(group, 'lat', (n_lat,), (n_lat,), 'f8', ['lat'],
+                      {'units': 'degrees_north', 'long_name': 'latitude'})[:] = lat
+        _create_array(group, 'lon', (n_lon,), (n_lon,), 'f8', ['lon'],
+                      {'units': 'degrees_east', 'long_name': 'longitude'})[:] = lon
+        _create_array(group, 'time', (n_time,), (n_time,), 'i4', ['time'],
+                      {'units': f'days since {ZARR_EPOCH:%Y-%m-%d}', 'calendar': 'standard',
+                       'long_name': 'time'})[:] = np.arange(n_time, dtype='i4')
+        _create_array(group, 'complete', (n_time, len(slots)), (1, len(slots)), 'i1', ['time', 'variable'],
+                      {'long_name': 'variable written for this day (1) or not (0)', 'variables': slots},
+                      compress=False)  # 不设 _FillValue，未写入的块读出为 0，且 xarray 不会将 0 屏蔽为 NaN
+        group.attrs.update(global_attrs)
+    elif group['complete'].attrs['variables'] != slots:
+        raise ValueError(f'{path} 的变量表与当前版本不一致，请使用新的输出目录')
+
+    existing = set(group.array_keys())
+    for b in band_list:
+        if b['VarName'] not in existing:
+            _create_array(group, b['VarName'], (group['time'].shape[0], n_lat, n_lon),
+                          (1,) + ZARR_SPATIAL_CHUNKS, 'f4', ['time', 'lat', 'lon'],
+                          {'long_name': b['LongName'], 'units': b['Units']}, fill_value=np.nan)
+
+    # time 轴不足时整体扩展（time/complete/各变量）
+    if group['time'].shape[0] < n_time:
+        old = group['time'].shape[0]
+        for name in group.array_keys():
+            arr = group[name]
+            if arr.attrs.get('_ARRAY_DIMENSIONS', [None])[0] == 'time':
+                arr.resize((n_time,) + arr.shape[1:])
+        group['time'][old:] = np.arange(old, n_time, dtype='i4')
+
+    zarr.consolidate_metadata(path, zarr_format=2)
+    sel = [slots.index(b['VarName']) for b in band_list]
+    done = np.flatnonzero(group['complete'][:, sel].all(axis=1))
+    return {ZARR_EPOCH + dt.timedelta(days=int(i)) for i in done}
+
+
+def written_variables(path, band_list):
+    """
+    各日已写入的已选变量（增量追加时只补写缺少的变量）
+
+    Returns:
+        {日期: set(变量名)}，仅包含至少写入一个已选变量的日期
+    """
+    _require_zarr()
+    group = zarr.open_group(path, mode='r', zarr_format=2)
+    slots = group['complete'].attrs['variables']
+    names = [b['VarName'] for b in band_list]
+    flags = group['complete'][:, [slots.index(n) for n in names]]
+    return {ZARR_EPOCH + dt.timedelta(days=int(i)): {n for n, f in zip(names, flags[i]) if f}
+            for i in np.flatnonzero(flags.any(axis=1))}
+
+
+def write_day(path, d, arrays):
+    """
+    将某日的各变量写入其 time 切片，全部写完后为这些变量标记该日完成
+
+    Args:
+        path: 存储路径
+        d: 日期
+        arrays: {变量名: (lat, lon) 数组}
+    """
+    _require_zarr()
+    group = zarr.open_group(path, mode='r+', zarr_format=2)
+    ti = time_index(d)
+    for name, data in arrays.items():
+        group[name][ti] = data
+    complete = group['complete']
+    slots = complete.attrs['variables']
+    row = complete[ti]
+    row[[slots.index(name) for name in arrays]] = 1
+    complete[ti] = row
+
+
+def last_complete(done):
+    """已完成日期中最近的一天（用于进度提示）；无则返回 None"""
+    return max(done) if done else None
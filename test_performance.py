@@ -2,38 +2,1011 @@
 # -*- coding: utf-8 -*-
 
 """
-性能测试脚本 - 测试优化后的ERA5L处理性能
-运行单日数据处理以验证优化效果
+性能测试脚本 - 基于合成数据的基准测试
+--------------------------------------------------------------------
+- 在本地生成与 ERA5-Land 同形状的合成 GeoTIFF（每日两块 1800x1800 半球，150 个波段），
+  分块方式 (--block)、压缩 (--compress) 与波段排列 (--interleave) 可配置；同一布局的数据会复用
+- 通过 run_era5l_multi() 非交互运行各场景（类别子集、波段数、并行方式），不经过 tkinter 对话框与 input()
+- 每个场景在独立子进程中运行，记录读取/构建/写出耗时、吞吐量与峰值内存 (RSS)
+- --save-baseline 保存结果为基准 JSON，--baseline 与基准比较，耗时或峰值内存超过容差时标记为退化并返回非零退出码
+
+用法示例：
+    python test_performance.py --work-dir D:/era5l_bench --save-baseline baseline.json
+    python test_performance.py --work-dir D:/era5l_bench --baseline baseline.json --scenarios all-serial all-stream
+
+pytest 运行 test_* 用例：test_single_day 为单日、单类别的冒烟测试（合成数据为常数波段，几秒内完成）；
+其余用例共用三日合成输入 (synthetic_days)：各运行模式、输出后端与编码的输出与默认路径一致，
+多个认领工作进程 (worker --claim-dir) 每个单元只写出一次，时间序列重排的站点提取与逐日文件一致。
 """
 
+import os
 import sys
+import json
+import shutil
+import argparse
 import datetime as dt
+import subprocess
+import tempfile
 import time
-from deal_ERA5L_MultiCategory import process_era5l_data_multi
+import warnings
+import netCDF4
+import numpy as np
+import pytest
+import rasterio
+import xarray as xr
+from rasterio.transform import from_origin
+
+import deal_ERA5L_MultiCategory as era5l
+import era5l_claims
+import era5l_aggregate
+import era5l_cube
+import era5l_input_index
+import era5l_journal
+import era5l_manifest
+import era5l_metrics
+import era5l_nc_template
+import era5l_qc
+import era5l_read_plan
+import era5l_refindex
+import era5l_rechunk
+import era5l_region
+import era5l_zarr
+
+try:
+    import resource
+except ImportError:  # Windows 上没有 resource 模块，峰值内存记为 None
+    resource = None
+
+TILE_SIZE = 1800
+N_BANDS = 150
+FIRST_DAY = dt.datetime(2024, 1, 1)
+TEST_BANDS = 50            # pytest 用例的合成输入波段数：覆盖蒸发 (35-44) 与 lai_high / lai_low (49, 50)
+
+# 场景：categories 为类别子集，max_bands 限制每个类别的变量数（None 为全部），options 传给 run_era5l_multi
+SCENARIOS = {
+    'evap-only':          {'categories': ['evap'], 'max_bands': None, 'options': {}},
+    'rad-5bands':         {'categories': ['rad'], 'max_bands': 5, 'options': {}},
+    'all-serial':         {'categories': None, 'max_bands': None, 'options': {}},
+    'all-prefetch':       {'categories': None, 'max_bands': None, 'options': {'prefetch_depth': 2}},
+    'all-parallel-days':  {'categories': None, 'max_bands': None, 'options': {'parallel_days': 2}},
+    'all-parallel-write': {'categories': None, 'max_bands': None, 'options': {'parallel_writers': True}},
+    'all-stream':         {'categories': None, 'max_bands': None, 'options': {'stream_strip_rows': 225}},
+}
+DEFAULT_SCENARIOS = ['evap-only', 'rad-5bands', 'all-serial', 'all-prefetch', 'all-parallel-days', 'all-stream']
+
+
+def make_synthetic_inputs(base_dir, dates, n_bands=N_BANDS, block=256, compress='deflate', interleave='band',
+                          pattern='smooth'):
+    """
+    生成合成输入：base_dir/yyyy/mm/ERA5_LAND_DAILY_yyyymmdd_{1,2}.tif
+
+    Args:
+        block: 分块边长；0 表示按行条带存储 (GDAL 默认)
+        compress: 'deflate' / 'lzw' / 'none'
+        interleave: 'band' 或 'pixel'
+        pattern: 'smooth' 为带缺测区域的平滑场（压缩比接近真实数据）；'constant' 每个波段为常数（生成最快）
+    """
+    yy, xx = np.mgrid[0:TILE_SIZE, 0:TILE_SIZE].astype(np.float32)
+    for d in dates:
+        out_dir = os.path.join(base_dir, str(d.year), f'{d.month:02d}')
+        os.makedirs(out_dir, exist_ok=True)
+        for tile in (1, 2):
+            path = os.path.join(out_dir, f'ERA5_LAND_DAILY_{d:%Y%m%d}_{tile}.tif')
+            if os.path.isfile(path):
+                continue
+            profile = {'driver': 'GTiff', 'height': TILE_SIZE, 'width': TILE_SIZE, 'count': n_bands,
+                       'dtype': 'float32', 'crs': 'EPSG:4326', 'nodata': np.nan, 'interleave': interleave,
+                       'transform': from_origin(-180.0 + (tile - 1) * 180.0, 90.0, 0.1, 0.1)}
+            if block:
+                profile.update(tiled=True, blockxsize=block, blockysize=block)
+            if compress != 'none':
+                profile['compress'] = compress
+            if pattern == 'smooth':
+                base = np.sin(yy / 200.0) + np.cos(xx / 300.0 + tile) + d.day * 0.001
+                base[(yy + xx) % 977 < 300] = np.nan
+            else:
+                base = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.float32)
+            tmp = f'{path}.tmp'
+            with rasterio.open(tmp, 'w', **profile) as dst:
+                for b in range(1, n_bands + 1):
+                    dst.write((base + b * 0.01).astype(np.float32), b)
+            os.replace(tmp, path)
+
+
+def scenario_selection(scenario):
+    """场景对应的 {Key: 波段列表}"""
+    keys = scenario['categories'] or [spec['Key'] for spec in era5l.CATEGORY_SPECS]
+    return {spec['Key']: spec['Bands'][:scenario['max_bands']] for spec in era5l.CATEGORY_SPECS
+            if spec['Key'] in keys}
+
+
+def peak_rss_mb():
+    """本进程及已结束子进程中最大的峰值 RSS (MB)"""
+    if resource is None:
+        return None
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10  # macOS 为字节，Linux 为 KB
+
+
+def _timed(stats, key, func):
+    def wrapper(*args, **kwargs):
+        t = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats[key] += time.time() - t
+    return wrapper
+
+
+def run_scenario_inprocess(scenario, input_dir, out_dir, n_days):
+    """
+    在当前进程中运行一个场景并返回指标
+
+    读取/构建/写出耗时通过包装主程序中的阶段函数统计，只覆盖在本进程中执行的部分：
+    PARALLEL_DAYS > 1 时为 None，PARALLEL_WRITERS 时写出耗时为 None。
+    """
+    selected = scenario_selection(scenario)
+    options = dict(scenario['options'])
+    stats = {'read': 0.0, 'build': 0.0, 'write': 0.0}
+    era5l.read_day_bands = _timed(stats, 'read', era5l.read_day_bands)
+    era5l.build_category_dataset = _timed(stats, 'build', era5l.build_category_dataset)
+    if not options.get('parallel_writers'):
+        era5l.timed_save_nc = _timed(stats, 'write', era5l.timed_save_nc)
+    stream_day = era5l.stream_day
+
+    def timed_stream_day(*args, **kwargs):
+        read_time, write_time = stream_day(*args, **kwargs)
+        stats['read'] += read_time
+        stats['write'] += write_time
+        return read_time, write_time
+    era5l.stream_day = timed_stream_day
+
+    out_dirs = {spec['Key']: os.path.join(out_dir, spec['Key']) for spec in era5l.CATEGORY_SPECS}
+    t = time.time()
+    counts = era5l.run_era5l_multi(input_dir, out_dirs, FIRST_DAY, FIRST_DAY + dt.timedelta(days=n_days - 1),
+                                   selected, **options)
+    wall = time.time() - t
+
+    n_bands = len({b['Index'] for bands in selected.values() for b in bands})
+    in_mb = counts['ok'] * n_bands * era5l.GRID_HEIGHT * era5l.GRID_WIDTH * 4 / 2**20
+    out_mb = sum(os.path.getsize(os.path.join(root, f)) for root, _dirs, files in os.walk(out_dir)
+                 for f in files) / 2**20
+    in_process = options.get('parallel_days', 1) <= 1
+    return {
+        'counts': counts,
+        'days': n_days,
+        'bands': n_bands,
+        'wall_s': round(wall, 3),
+        'read_s': round(stats['read'], 3) if in_process else None,
+        'build_s': round(stats['build'], 3) if in_process else None,
+        'write_s': round(stats['write'], 3) if in_process and not options.get('parallel_writers') else None,
+        'throughput_mb_s': round(in_mb / wall, 1) if wall > 0 else None,
+        'output_mb': round(out_mb, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1) if resource is not None else None,
+    }
+
+
+def run_scenario(name, input_dir, work_dir, n_days):
+    """在独立子进程中运行场景（峰值内存互不影响），返回指标字典"""
+    out_dir = os.path.join(work_dir, 'out', name)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    cmd = [sys.executable, os.path.abspath(__file__), '_run', name, input_dir, out_dir, str(n_days)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:], proc.stderr[-4000:], file=sys.stderr)
+        raise RuntimeError(f'场景 {name} 运行失败')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    与基准比较耗时与峰值内存
+
+    Returns:
+        退化项列表 [(场景, 指标, 基准值, 当前值)]
+    """
+    regressions = []
+    for name, cur in results.items():
+        ref = baseline.get(name)
+        if ref is None:
+            print(f'  {name}: 基准中无此场景')
+            continue
+        for metric in ('wall_s', 'read_s', 'write_s', 'peak_rss_mb'):
+            if ref.get(metric) is None or cur.get(metric) is None:
+                continue
+            ratio = cur[metric] / ref[metric] if ref[metric] else 1.0
+            flag = '退化' if ratio > 1 + tolerance else ''
+            print(f'  {name:<20} {metric:<12} 基准 {ref[metric]:>9.2f}  当前 {cur[metric]:>9.2f}  ({ratio - 1:+.0%}) {flag}')
+            if flag:
+                regressions.append((name, metric, ref[metric], cur[metric]))
+    return regressions
+
 
 def test_single_day():
-    """测试单日处理性能"""
-    print("=== ERA5L 性能测试 ===")
-    print("本测试将处理单日数据以验证优化效果")
-    
-    # 模拟用户输入，设置同一天作为开始和结束日期
-    test_date = "20240101"  # 可以根据实际可用数据调整
-    
-    print(f"测试日期: {test_date}")
-    print("开始性能测试...")
-    
-    start_time = time.time()
-    
-    # 这里需要修改原函数以支持程序化调用
-    # 暂时先打印说明
-    print("注意：需要修改主函数以支持程序化测试")
-    print("建议运行方式：")
-    print("1. 直接运行 deal_ERA5L_MultiCategory.py")
-    print("2. 输入测试日期（如20240101）作为开始和结束日期")
-    print("3. 观察输出的各阶段耗时信息")
-    
-    end_time = time.time()
-    print(f"测试准备耗时: {end_time - start_time:.2f}秒")
+    """冒烟测试：单日、仅蒸发类别，检查非交互入口可正常完成并写出文件"""
+    max_index = max(b['Index'] for b in era5l.EVAP_BANDS)
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_dir = os.path.join(work_dir, 'in')
+        make_synthetic_inputs(input_dir, [FIRST_DAY], n_bands=max_index, pattern='constant')
+        out_dirs = {spec['Key']: os.path.join(work_dir, spec['Key']) for spec in era5l.CATEGORY_SPECS}
+        counts = era5l.run_era5l_multi(input_dir, out_dirs, FIRST_DAY, FIRST_DAY, {'evap': era5l.EVAP_BANDS})
+        assert counts == {'ok': 1, 'skip': 0, 'fail': 0}
+        spec = era5l.CATEGORY_SPECS[0]
+        assert os.path.isfile(era5l.out_path_for(out_dirs, spec, FIRST_DAY))
+
+
+def test_metrics_output(capsys):
+    """test_single_day 的单日运行开启指标：JSONL 的日/类别记录、Prometheus textfile 与 metrics-summary 子命令"""
+    max_index = max(b['Index'] for b in era5l.EVAP_BANDS)
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_dir = os.path.join(work_dir, 'in')
+        make_synthetic_inputs(input_dir, [FIRST_DAY], n_bands=max_index, pattern='constant')
+        out_dirs = {spec['Key']: os.path.join(work_dir, spec['Key']) for spec in era5l.CATEGORY_SPECS}
+        metrics_path = os.path.join(work_dir, 'metrics', 'metrics.jsonl')
+        textfile = os.path.join(work_dir, 'era5l.prom')
+        counts = era5l.run_era5l_multi(input_dir, out_dirs, FIRST_DAY, FIRST_DAY, {'evap': era5l.EVAP_BANDS},
+                                       metrics_path=metrics_path, prometheus_textfile=textfile)
+        assert counts == {'ok': 1, 'skip': 0, 'fail': 0}
+        out_path = era5l.out_path_for(out_dirs, era5l.CATEGORY_SPECS[0], FIRST_DAY)
+
+        with open(metrics_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert [r['type'] for r in records] == ['category', 'day']
+        cat, day = records
+        assert cat['category'] == 'evap' and cat['date'] == day['date'] == f'{FIRST_DAY:%Y-%m-%d}'
+        assert cat['bytes_written'] == os.path.getsize(out_path)
+        assert cat['bytes_raw'] == len(era5l.EVAP_BANDS) * era5l.GRID_HEIGHT * era5l.GRID_WIDTH * 4
+        assert cat['compression_ratio'] == round(cat['bytes_raw'] / cat['bytes_written'], 3)
+        assert day['status'] == 'ok' and day['pid'] == os.getpid()
+        assert day['bytes_read'] == len(era5l.EVAP_BANDS) * era5l.GRID_HEIGHT * era5l.GRID_WIDTH * 4
+        assert day['input_bytes'] == sum(os.path.getsize(os.path.join(root, fn))
+                                         for root, _dirs, files in os.walk(input_dir) for fn in files)
+        assert day['bytes_written'] == cat['bytes_written']
+        assert day['total_s'] >= day['read_s'] + day['write_s'] > 0
+
+        gauges = {}
+        with open(textfile, encoding='utf-8') as f:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    name, value = line.rsplit(' ', 1)
+                    gauges[name] = float(value)
+        assert gauges['era5l_day_ok'] == 1
+        assert gauges['era5l_day_seconds{stage="total"}'] == day['total_s']
+        assert gauges['era5l_day_bytes{kind="written"}'] == day['bytes_written']
+        assert gauges['era5l_category_compression_ratio{category="evap"}'] == cat['compression_ratio']
+        assert not [fn for fn in os.listdir(work_dir) if fn.endswith('.tmp')]
+
+        capsys.readouterr()
+        era5l.main(['metrics-summary', '--metrics', metrics_path])
+        printed = capsys.readouterr().out
+        assert '1 天 (成功 1，失败 0)' in printed and 'evap.compression_ratio' in printed
+        summary = era5l_metrics.summarize(metrics_path)
+        assert summary['day.total_s'] == {'n': 1, 'p50': day['total_s'], 'p95': day['total_s']}
+        assert summary['evap.write_s']['p50'] == cat['write_s']
+
+
+def test_gdal_cache_setting():
+    """GDAL_CACHEMAX 的各种写法换算为 MB；ensure_cache_mb 按字节设置进程级块缓存，只调大不调小"""
+    assert era5l_read_plan.parse_cache_mb(512 * 2**20) == 512
+    assert era5l_read_plan.parse_cache_mb('512') == 512
+    assert era5l_read_plan.parse_cache_mb('300MB') == 300
+    assert era5l_read_plan.parse_cache_mb('2GB') == 2048
+    assert era5l_read_plan.parse_cache_mb('209715200') == 200
+    assert era5l_read_plan.parse_cache_mb('junk') is None
+    total = era5l_read_plan._physical_memory_bytes()
+    if total is not None:
+        assert era5l_read_plan.parse_cache_mb('5%') == int(total * 0.05) // 2**20
+    target = max(era5l_read_plan.current_cache_mb() or 0, 64) + 32
+    assert era5l_read_plan.ensure_cache_mb(target) == target
+    assert era5l_read_plan.current_cache_mb() == target
+    assert era5l_read_plan.ensure_cache_mb(target - 16) == target
+
+
+def test_input_index():
+    """
+    输入索引与逐日 glob 的结果一致（含缺失、单块与混入的其他文件）；扩展名不区分大小写；
+    目录修改时间不变时使用缓存，变化后重新列出
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        base_dir = os.path.join(work_dir, 'in')
+        dates = [FIRST_DAY + dt.timedelta(days=i) for i in range(40)]  # 跨月
+        for i, d in enumerate(dates):
+            in_dir = era5l_input_index.month_dir(base_dir, d)
+            os.makedirs(in_dir, exist_ok=True)
+            parts = [] if i % 7 == 3 else ['0000000000-0000000000', '0000000000-0000001800'][:1 + (i % 5 > 0)]
+            for part in parts:
+                open(os.path.join(in_dir, f'ERA5_LAND_DAILY_{d:%Y%m%d}-{part}.tif'), 'w').close()
+            open(os.path.join(in_dir, f'ERA5_LAND_DAILY_{d:%Y%m%d}.tif.aux.xml'), 'w').close()
+        index = era5l_input_index.build_index(base_dir, dates)
+        for d in dates:
+            assert era5l_input_index.day_tifs(index, d) == era5l.find_day_tifs(base_dir, d)
+        missing, incomplete = era5l_input_index.check(index, dates)
+        assert missing == [d for i, d in enumerate(dates) if i % 7 == 3]
+        assert set(incomplete) == {d for i, d in enumerate(dates) if i % 7 != 3 and i % 5 == 0}
+
+        in_dir = era5l_input_index.month_dir(base_dir, dates[0])
+        upper = os.path.join(in_dir, f'ERA5_LAND_DAILY_{dates[3]:%Y%m%d}-0000000000-0000000000.TIF')
+        open(upper, 'w').close()
+        assert era5l_input_index.day_tifs(era5l_input_index.build_index(base_dir, dates), dates[3]) == [upper]
+
+        cache_path = os.path.join(work_dir, 'index.json')
+        era5l_input_index.build_index(base_dir, dates, cache_path)
+        extra = os.path.join(in_dir, f'ERA5_LAND_DAILY_{dates[10]:%Y%m%d}-0000000000-0000001800.tif')
+        st = os.stat(in_dir)
+        open(extra, 'w').close()
+        os.utime(in_dir, ns=(st.st_atime_ns, st.st_mtime_ns))  # 修改时间不变：使用缓存，看不到新文件
+        assert extra not in era5l_input_index.day_tifs(era5l_input_index.build_index(base_dir, dates, cache_path),
+                                                       dates[10])
+        os.utime(in_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        index = era5l_input_index.build_index(base_dir, dates, cache_path)
+        assert extra in era5l_input_index.day_tifs(index, dates[10])
+        assert era5l_input_index.day_tifs(index, dates[10]) == era5l.find_day_tifs(base_dir, dates[10])
+
+
+@pytest.fixture(scope='module')
+def synthetic_days():
+    """三日合成输入：平滑场带缺测区域，只含前 TEST_BANDS 个波段（蒸发与两个植被变量），不压缩以加快生成"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        dates = [FIRST_DAY + dt.timedelta(days=i) for i in range(3)]
+        input_dir = os.path.join(work_dir, 'in')
+        make_synthetic_inputs(input_dir, dates, n_bands=TEST_BANDS, compress='none')
+        yield {'work_dir': work_dir, 'input_dir': input_dir, 'dates': dates}
+
+
+def test_rechunk_extract_points(synthetic_days):
+    """两遍重排（内存预算小于全部日期）后，extract_points 的序列与逐日文件中最近格点的值一致"""
+    dates = synthetic_days['dates']
+    out_dirs = {spec['Key']: os.path.join(synthetic_days['work_dir'], 'rechunk', spec['Key'])
+                for spec in era5l.CATEGORY_SPECS}
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[-1],
+                                   {'evap': era5l.EVAP_BANDS})
+    assert counts['ok'] == len(dates)
+    spec = era5l.CATEGORY_SPECS[0]
+    files = [era5l.out_path_for(out_dirs, spec, d) for d in dates]
+    store = era5l_rechunk.store_path(out_dirs['evap'], spec['FileTag'])
+    info = era5l_rechunk.build(store, dates, files, (None, 50, 50), int(0.06 * 1024**3))
+    assert not info['single_pass'] and info['block_days'] < len(dates)
+
+    # 含缺测区域、接缝两侧与经度 0..360 写法的站点
+    lat = np.array([45.03, -12.5, 0.05, 89.95, -60.0, 33.3])
+    lon = np.array([-179.95, 0.05, -0.05, 359.0, 120.0, 250.0])
+    ds = era5l_rechunk.extract_points(store, lat, lon, ['E', 'Es'])
+    assert ds['E'].shape == (len(dates), len(lat))
+    for t, path in enumerate(files):
+        with xr.open_dataset(path) as daily:
+            iy, ix = era5l_rechunk.nearest_cells(daily['lat'].values, daily['lon'].values, lat, lon)
+            for name in ('E', 'Es'):
+                np.testing.assert_array_equal(ds[name].values[t], daily[name].values[iy, ix])
+    sub = era5l_rechunk.extract_points(store, lat, lon, ['E'], start=dates[1], end=f'{dates[2]:%Y%m%d}')
+    assert list(sub['time'].values) == list(ds['time'].values[1:])
+    np.testing.assert_array_equal(sub['E'].values, ds['E'].values[1:])
+
+
+def test_manifest_verify(synthetic_days):
+    """
+    完成清单：两日写出后登记并据此跳过；一个文件同大小同修改时间被改写后，只比较大小时仍通过，
+    校验和复核（首次复核保存的基准）将其标出，prune 删除该记录；manifest-scan 重新登记已有文件
+    """
+    dates = synthetic_days['dates'][:2]
+    base = os.path.join(synthetic_days['work_dir'], 'manifest')
+    out_dirs = era5l.default_out_dirs(base)
+    manifest = os.path.join(base, 'manifest.sqlite')
+    selected = {'evap': era5l.EVAP_BANDS}
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[-1], selected,
+                                   manifest_path=manifest)
+    assert counts == {'ok': 2, 'skip': 0, 'fail': 0}
+    assert era5l_manifest.load_done(manifest, selected) == {'evap': set(dates)}
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[-1], selected,
+                                   manifest_path=manifest)
+    assert counts == {'ok': 0, 'skip': 2, 'fail': 0}
+
+    assert era5l_manifest.verify(manifest, checksum=True)['ok'] == 2
+    path = era5l.out_path_for(out_dirs, era5l.CATEGORY_SPECS[0], dates[1])
+    st = os.stat(path)
+    with open(path, 'r+b') as f:
+        f.seek(st.st_size // 2)
+        data = f.read(64)
+        f.seek(st.st_size // 2)
+        f.write(bytes(b ^ 0xFF for b in data))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert era5l_manifest.verify(manifest)['ok'] == 2
+    assert era5l_manifest.verify(manifest, checksum=True, prune=True)['checksum'] == 1
+    assert era5l_manifest.load_done(manifest, selected) == {'evap': {dates[0]}}
+    assert era5l_manifest.verify(manifest, checksum=True) == {'ok': 1, 'missing': 0, 'size': 0, 'mtime': 0,
+                                                              'checksum': 0}
+
+    rescanned = os.path.join(base, 'rescanned.sqlite')
+    n, broken = era5l_manifest.scan(rescanned, out_dirs, {spec['FileTag']: spec['Key'] for spec in era5l.CATEGORY_SPECS})
+    assert (n, broken) == (2, [])
+    assert era5l_manifest.load_done(rescanned, selected) == {'evap': set(dates)}
+
+
+def test_aggregate_resume(synthetic_days):
+    """
+    流式月聚合：前两日累加后保存检查点，续跑第三日（月内其余日期无输入）时从检查点继续并写出月聚合，
+    结果与三个日文件直接计算的 count / 均值 / 样本标准差 / min / max 一致；气候态按指定方案压缩；
+    累加器超出内存预算时拒绝运行
+    """
+    dates = synthetic_days['dates']
+    base = os.path.join(synthetic_days['work_dir'], 'aggregate')
+    out_dirs = era5l.default_out_dirs(base)
+    spec = era5l.CATEGORY_SPECS[0]
+    selected = {'evap': era5l.EVAP_BANDS}
+    options = {'aggregate_periods': ('month',), 'aggregate_checkpoint_days': 1}
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[1], selected, **options)
+    assert counts == {'ok': 2, 'skip': 0, 'fail': 0}
+    checkpoint = era5l.aggregate_state_path(out_dirs, spec, dates[0], 'month')
+    names = [b['VarName'] for b in era5l.EVAP_BANDS]
+    state = era5l_aggregate.load_state(checkpoint, names, (era5l.GRID_HEIGHT, era5l.GRID_WIDTH))
+    assert state['dates'] == set(dates[:2])
+    assert not os.path.isfile(era5l.aggregate_path(out_dirs, spec, dates[0], 'month'))
+
+    month_end = dt.datetime(2024, 1, 31)
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[2], month_end, selected, **options)
+    assert counts['ok'] == 1 and counts['fail'] == (month_end - dates[2]).days
+    assert not os.path.isfile(checkpoint)
+    daily = []
+    for d in dates:
+        with xr.open_dataset(era5l.out_path_for(out_dirs, spec, d)) as ds:
+            daily.append({name: ds[name].values for name in names})
+    with xr.open_dataset(era5l.aggregate_path(out_dirs, spec, dates[0], 'month')) as agg:
+        assert agg.attrs['days_aggregated'] == len(dates)
+        for name in names:
+            stack = np.stack([day[name] for day in daily]).astype(np.float64)
+            valid = ~np.isnan(stack).all(axis=0)
+            np.testing.assert_array_equal(agg[f'{name}_count'].values, (~np.isnan(stack)).sum(axis=0))
+            np.testing.assert_array_equal(agg[f'{name}_min'].values[valid], np.nanmin(stack[:, valid], axis=0))
+            np.testing.assert_array_equal(agg[f'{name}_max'].values[valid], np.nanmax(stack[:, valid], axis=0))
+            np.testing.assert_allclose(agg[f'{name}_mean'].values[valid], np.nanmean(stack[:, valid], axis=0),
+                                       rtol=1e-6, atol=1e-4)
+            np.testing.assert_allclose(agg[f'{name}_std'].values[valid], np.nanstd(stack[:, valid], axis=0, ddof=1),
+                                       rtol=1e-3, atol=2e-3)
+            assert np.isnan(agg[f'{name}_mean'].values[~valid]).all()
+
+    clim = era5l.monthly_climatology(out_dirs, ['evap'], category_encoding={'evap': 'fast'})
+    with netCDF4.Dataset(clim[0]) as nc:
+        assert nc.variables['E_mean'].chunking() == list(era5l.ENCODING_PROFILES['fast']['chunksizes'])
+
+    everything = {spec['Key']: spec['Bands'] for spec in era5l.CATEGORY_SPECS}
+    with pytest.raises(ValueError, match='MEMORY_BUDGET_GB'):
+        era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[0], everything,
+                              aggregate_periods=('month', 'year'), memory_budget_gb=4.0)
+
+
+# 模式对比用例：前两日，蒸发全部变量与 lai_high / lai_low（打包变量）
+MODE_SELECTION = {'evap': era5l.EVAP_BANDS, 'veg': era5l.VEG_BANDS[:2]}
+# 输出应与默认路径逐文件一致 (compare_files) 的运行模式；条带流式按条带高度分块，不比较分块
+NETCDF_MODES = {
+    'stream':           {'stream_strip_rows': 225},
+    'lazy':             {'dask_lazy': True},
+    'direct':           {'nc_writer': 'direct'},
+    'parallel-writers': {'parallel_writers': True},
+    'read-bands':       {'read_strategy': 'bands'},
+    'read-full':        {'read_strategy': 'full'},
+    'read-windows':     {'read_strategy': 'windows'},
+    'parallel-days':    {'parallel_days': 2},
+    'prefetch':         {'prefetch_depth': 2},
+}
+
+
+def mode_dirs(synthetic_days, name):
+    """模式 name 的各类别输出目录 work_dir/modes/<name>/<Key>"""
+    return {spec['Key']: os.path.join(synthetic_days['work_dir'], 'modes', name, spec['Key'])
+            for spec in era5l.CATEGORY_SPECS}
+
+
+def mode_specs(selection=MODE_SELECTION):
+    """selection 中的类别定义"""
+    return [spec for spec in era5l.CATEGORY_SPECS if spec['Key'] in selection]
+
+
+def run_mode(synthetic_days, name, selection=MODE_SELECTION, **options):
+    """以 selection 运行前两日，输出到 mode_dirs(name)，返回 out_dirs"""
+    dates = synthetic_days['dates'][:2]
+    out_dirs = mode_dirs(synthetic_days, name)
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[-1], selection, **options)
+    assert counts['ok'] == len(dates) and counts['fail'] == 0, counts
+    return out_dirs
+
+
+def mode_outputs(out_dirs, dates, selection=MODE_SELECTION):
+    """各 (类别, 日期) 的日文件路径"""
+    return {(spec['Key'], d): era5l.out_path_for(out_dirs, spec, d) for spec in mode_specs(selection) for d in dates}
+
+
+def assert_same_outputs(reference_dirs, out_dirs, dates, selection=MODE_SELECTION, ignore=()):
+    """两组输出的日文件在结构、属性与数据上一致（compare_files）；ignore 中的差异类别不比较"""
+    reference = mode_outputs(reference_dirs, dates, selection)
+    for unit, path in mode_outputs(out_dirs, dates, selection).items():
+        diffs = [diff for diff in era5l_nc_template.compare_files(reference[unit], path, data=True)
+                 if not any(kind in diff for kind in ignore)]
+        assert not diffs, f'{unit}: {diffs}'
+
+
+def assert_mode_matches_default(synthetic_days, default_run, name, ignore=(), **options):
+    """运行模式 name 并与默认路径的输出逐文件比较，返回 out_dirs"""
+    out_dirs = run_mode(synthetic_days, name, **options)
+    assert_same_outputs(default_run, out_dirs, synthetic_days['dates'][:2], ignore=ignore)
+    return out_dirs
+
+
+@pytest.fixture(scope='module')
+def default_run(synthetic_days):
+    """默认配置（整幅读取、xarray 写出、串行）的输出，作为各模式的参照"""
+    return run_mode(synthetic_days, 'default')
+
+
+@pytest.mark.parametrize('name', list(NETCDF_MODES))
+def test_mode_matches_default(synthetic_days, default_run, name):
+    """各运行模式写出的日文件与默认路径在结构、属性与数据上一致"""
+    assert_mode_matches_default(synthetic_days, default_run, name, ignore=('分块不同',) if name == 'stream' else (),
+                                **NETCDF_MODES[name])
+
+
+def read_reference(default_run, dates, key, name):
+    """默认路径日文件中一个变量的 (time, lat, lon) 数据"""
+    spec = next(spec for spec in era5l.CATEGORY_SPECS if spec['Key'] == key)
+    values = []
+    for d in dates:
+        with xr.open_dataset(era5l.out_path_for(default_run, spec, d)) as daily:
+            values.append(daily[name].values)
+    return np.stack(values)
+
+
+@pytest.mark.parametrize('backend', ['zarr', 'cube'])
+def test_backend_matches_default(synthetic_days, default_run, backend):
+    """Zarr / cube 后端各日的时间切片与默认路径的日文件数据一致"""
+    out_dirs = run_mode(synthetic_days, backend, output_backend=backend)
+    dates = synthetic_days['dates'][:2]
+    for spec in mode_specs():
+        if backend == 'zarr':
+            ds = xr.open_zarr(era5l_zarr.store_path(out_dirs[spec['Key']], spec['FileTag']))
+        else:
+            ds = xr.open_dataset(era5l_cube.cube_path(out_dirs[spec['Key']], spec['FileTag'], dates[0], 'month'))
+        with ds:
+            ds = ds.sel(time=dates)
+            for b in MODE_SELECTION[spec['Key']]:
+                np.testing.assert_array_equal(ds[b['VarName']].values,
+                                              read_reference(default_run, dates, spec['Key'], b['VarName']))
+
+
+def test_cube_recovers_from_killed_write(synthetic_days, default_run):
+    """
+    cube 写入中途进程被杀后重新运行，数据与默认路径一致；
+    周期文件损坏（无法打开）时移到一旁并重新生成
+    """
+    dates = synthetic_days['dates'][:2]
+    spec = era5l.CATEGORY_SPECS[0]
+    out_dirs = mode_dirs(synthetic_days, 'cube-killed')
+    path = era5l_cube.cube_path(out_dirs[spec['Key']], spec['FileTag'], dates[0], 'month')
+    child = (
+        'import os, signal, sys, json, types, datetime as dt, netCDF4\n'
+        'import deal_ERA5L_MultiCategory as era5l, era5l_cube\n'
+        'modes = []\n'
+        'class Dataset(netCDF4.Dataset):\n'
+        '    def close(self):\n'
+        '        if modes[-1] == "a":\n'
+        '            os.kill(os.getpid(), signal.SIGKILL)  # 第二天的数据已写入、文件尚未关闭\n'
+        '        super().close()\n'
+        'def open_dataset(path, mode="r", **kwargs):\n'
+        '    modes.append(mode)\n'
+        '    return Dataset(path, mode, **kwargs)\n'
+        'era5l_cube.netCDF4 = types.SimpleNamespace(Dataset=open_dataset)\n'
+        'start, end = (dt.datetime.strptime(v, "%Y%m%d") for v in sys.argv[2:4])\n'
+        'era5l.run_era5l_multi(sys.argv[1], json.loads(sys.argv[4]), start, end, {"evap": era5l.EVAP_BANDS},\n'
+        '                      output_backend="cube")\n'
+    )
+    proc = subprocess.run([sys.executable, '-c', child, synthetic_days['input_dir'], f'{dates[0]:%Y%m%d}',
+                           f'{dates[-1]:%Y%m%d}', json.dumps(out_dirs)],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=1200)
+    assert proc.returncode == -9, proc.stdout + proc.stderr
+
+    def rerun_and_compare():
+        counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[-1],
+                                       {'evap': era5l.EVAP_BANDS}, output_backend='cube')
+        assert counts['fail'] == 0, counts
+        with xr.open_dataset(path) as ds:
+            for b in era5l.EVAP_BANDS:
+                np.testing.assert_array_equal(ds[b['VarName']].sel(time=dates).values,
+                                              read_reference(default_run, dates, 'evap', b['VarName']))
+        assert era5l_cube.load_done(path, era5l.EVAP_BANDS, dates[0], 'month') == set(dates)
+
+    # 被杀的写入可能留下可打开但第二天未标记完成的文件，也可能留下无法打开的文件
+    rerun_and_compare()
+
+    # 截断的周期文件：规划时移到一旁，两天均重新生成
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+    rerun_and_compare()
+    assert os.path.isfile(f'{path}.damaged')
+
+
+# 区域/粗化用例：(区域框, 粗化倍数, 输出经度首尾)
+REGION_MODES = {
+    'region':       ((10.0, 20.0, -10.0, 10.0), 1, (-9.95, 9.95)),
+    'coarsen':      (None, 5, (-179.75, 179.75)),
+    'antimeridian': ((10.0, 20.0, 170.0, -170.0), 5, (170.25, 189.75)),
+}
+
+
+@pytest.mark.parametrize('name', list(REGION_MODES))
+def test_region_matches_default(synthetic_days, default_run, name):
+    """
+    区域子集与粗化的输出等于默认全球输出的切片 / 块统计（均值，*_min / *_max 取最小/最大）；
+    跨越 180° 经线的区域由网格东端接西端，经度连续递增
+    """
+    bbox, factor, lon_ends = REGION_MODES[name]
+    out_dirs = run_mode(synthetic_days, name, region_bbox=bbox, coarsen_factor=factor)
+    dates = synthetic_days['dates'][:2]
+    for spec in mode_specs():
+        with xr.open_dataset(era5l.out_path_for(default_run, spec, dates[0])) as daily:
+            lat, lon = daily['lat'].values, daily['lon'].values
+        if bbox is None:
+            rows, cols = np.arange(len(lat)), np.arange(len(lon))
+        else:
+            south, north, west, east = bbox
+            rows = np.flatnonzero((lat >= south) & (lat <= north))
+            cols = np.r_[np.flatnonzero(lon >= west), np.flatnonzero(lon <= east)] if west > east else \
+                np.flatnonzero((lon >= west) & (lon <= east))
+        for d in dates:
+            with xr.open_dataset(era5l.out_path_for(out_dirs, spec, d)) as ds:
+                assert ds['lon'].values[[0, -1]] == pytest.approx(lon_ends)
+                assert np.all(np.diff(ds['lon'].values) > 0)
+                assert ds['lat'].values == pytest.approx(lat[rows].reshape(-1, factor).mean(axis=1))
+                for b in MODE_SELECTION[spec['Key']]:
+                    full = read_reference(default_run, [d], spec['Key'], b['VarName'])[0]
+                    expected = full[rows][:, cols]
+                    if factor == 1:
+                        np.testing.assert_array_equal(ds[b['VarName']].values, expected)
+                        continue
+                    h, w = expected.shape
+                    blocks = expected.reshape(h // factor, factor, w // factor, factor)
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('ignore', RuntimeWarning)  # 全部缺测的块
+                        expected = era5l_region.reducer_for(b['VarName'])(blocks, axis=(1, 3))
+                    # float32 块平均的累加顺序随内存布局不同，允许舍入误差（数据量级 ~1e2）
+                    np.testing.assert_allclose(ds[b['VarName']].values, expected, rtol=1e-5, atol=1e-4)
+
+
+def test_rechunk_extract_points_antimeridian(synthetic_days):
+    """跨越 180° 经线的区域输出重排后，-180..180 与 0..360 写法的站点都匹配到经度大于 180 的格点"""
+    bbox, factor, _ = REGION_MODES['antimeridian']
+    out_dirs = run_mode(synthetic_days, 'antimeridian-points', selection={'evap': era5l.EVAP_BANDS[:2]},
+                        region_bbox=bbox, coarsen_factor=factor)
+    dates = synthetic_days['dates'][:2]
+    spec = era5l.CATEGORY_SPECS[0]
+    files = [era5l.out_path_for(out_dirs, spec, d) for d in dates]
+    store = era5l_rechunk.store_path(out_dirs['evap'], spec['FileTag'])
+    era5l_rechunk.build(store, dates, files, (None, 10, 10), int(0.06 * 1024**3))
+
+    # 日界线两侧、区域西端与东端
+    lat = np.array([15.0, 15.0, 12.0, 19.0, 10.5])
+    lon = np.array([-175.0, 175.0, 185.0, 170.3, -170.2])
+    ds = era5l_rechunk.extract_points(store, lat, lon)
+    names = [b['VarName'] for b in era5l.EVAP_BANDS[:2]]
+    for t, path in enumerate(files):
+        with xr.open_dataset(path) as daily:
+            grid_lat, grid_lon = daily['lat'].values, daily['lon'].values
+            iy = np.abs(grid_lat[:, None] - lat).argmin(axis=0)
+            ix = np.abs(grid_lon[:, None] - lon % 360).argmin(axis=0)
+            assert np.all(np.abs(grid_lon[ix] - lon % 360) <= 0.25)
+            for name in names:
+                np.testing.assert_array_equal(ds[name].values[t], daily[name].values[iy, ix])
+    assert ds['lon'].values[0] > 180
+    with pytest.raises(ValueError, match='站点不在网格范围内'):
+        era5l_rechunk.extract_points(store, [15.0], [0.0])
+
+
+@pytest.mark.parametrize('feature', ['pack_int16', 'land_gather'])
+def test_encoded_output(synthetic_days, default_run, feature):
+    """
+    int16 打包与陆地格点存储：xarray 与直接写出的文件一致；还原后的数据与默认路径一致
+    （打包变量在有效范围内的误差不超过半个精度，陆地格点存储还原后完全一致）
+    """
+    dates = synthetic_days['dates'][:2]
+    out_dirs = {writer: run_mode(synthetic_days, f'{feature}-{writer}', nc_writer=writer, **{feature: True})
+                for writer in ('xarray', 'direct')}
+    assert_same_outputs(out_dirs['xarray'], out_dirs['direct'], dates)
+    for (key, d), path in mode_outputs(out_dirs['xarray'], dates).items():
+        for b in MODE_SELECTION[key]:
+            name = b['VarName']
+            expected = read_reference(default_run, [d], key, name)[0]
+            restored = np.full_like(expected, np.nan)
+            assert era5l_rechunk.read_grid(path, name, restored)
+            spec = era5l.PACK_SPECS.get(name) if feature == 'pack_int16' else None
+            if spec is None:
+                np.testing.assert_array_equal(restored, expected)
+            else:
+                lo, hi = spec['ValidRange']
+                inside = (expected >= lo) & (expected <= hi)
+                np.testing.assert_allclose(restored[inside], expected[inside], rtol=0,
+                                           atol=spec['Precision'] / 2 + 1e-6)
+
+
+def test_bench_encoding_box(synthetic_days):
+    """bench-encoding --land：区域框内没有陆地格点时陆地格点存储方案的区域读取报告为 nan；框内没有格点时报错"""
+    work_dir = os.path.join(synthetic_days['work_dir'], 'bench-box')
+    ocean_box = (89.0, 90.0, -180.0, -179.0)  # 合成输入左上角的缺测区域
+    results = era5l.benchmark_encodings(synthetic_days['input_dir'], synthetic_days['dates'][0], work_dir,
+                                        ['evap'], ['fast'], box=ocean_box, land=True)
+    region_read = {r['profile']: r['region_read_s'] for r in results}
+    assert np.isnan(region_read['fast+land']) and region_read['fast'] >= 0
+    with pytest.raises(ValueError, match='内没有格点'):
+        era5l.benchmark_encodings(synthetic_days['input_dir'], synthetic_days['dates'][0], work_dir,
+                                  ['evap'], ['fast'], box=(95.0, 99.0, 0.0, 10.0), land=True)
+
+
+@pytest.mark.parametrize('pack_int16', [False, True])
+def test_ref_index_matches_source(synthetic_days, pack_int16):
+    """引用索引作为一个 Dataset 打开后，各日的数据、坐标与属性与对应日文件 (xarray 解码后) 一致"""
+    out_dirs = run_mode(synthetic_days, f'refindex-{pack_int16}', ref_index=True, pack_int16=pack_int16)
+    dates = synthetic_days['dates'][:2]
+    for spec in mode_specs():
+        path = era5l_refindex.index_path(out_dirs[spec['Key']], spec['FileTag'])
+        with era5l_refindex.open_index(path) as index:
+            assert list(index['time'].values) == [np.datetime64(d, 'ns') for d in dates]
+            for t, d in enumerate(dates):
+                with xr.open_dataset(era5l.out_path_for(out_dirs, spec, d)) as daily:
+                    np.testing.assert_array_equal(index['lat'].values, daily['lat'].values)
+                    np.testing.assert_array_equal(index['lon'].values, daily['lon'].values)
+                    for b in MODE_SELECTION[spec['Key']]:
+                        name = b['VarName']
+                        assert index[name].dtype == daily[name].dtype
+                        assert index[name].attrs == daily[name].attrs
+                        np.testing.assert_array_equal(index[name].isel(time=t).values, daily[name].values)
+
+
+def test_incremental_append(synthetic_days, default_run):
+    """
+    增量追加：先写出部分蒸发变量，再选择全部变量运行，已有变量的存储内容、编码与属性逐位不变，
+    补写的变量与默认路径一致
+    """
+    dates = synthetic_days['dates'][:2]
+    spec = era5l.CATEGORY_SPECS[0]
+    first, added = era5l.EVAP_BANDS[:3], era5l.EVAP_BANDS[3:]
+    out_dirs = run_mode(synthetic_days, 'append', selection={'evap': first})
+
+    def snapshot(path):
+        with netCDF4.Dataset(path) as nc:
+            nc.set_auto_maskandscale(False)
+            return {b['VarName']: (nc[b['VarName']][:].tobytes(), nc[b['VarName']].filters(),
+                                   nc[b['VarName']].chunking(), repr(nc[b['VarName']].__dict__)) for b in first}
+
+    before = {d: snapshot(era5l.out_path_for(out_dirs, spec, d)) for d in dates}
+    run_mode(synthetic_days, 'append', selection={'evap': era5l.EVAP_BANDS}, incremental_append=True)
+    for d in dates:
+        path = era5l.out_path_for(out_dirs, spec, d)
+        assert snapshot(path) == before[d]
+        with xr.open_dataset(path) as ds:
+            assert [b['VarName'] for b in era5l.EVAP_BANDS if b['VarName'] in ds] == \
+                [b['VarName'] for b in era5l.EVAP_BANDS]
+            for b in added:
+                np.testing.assert_array_equal(ds[b['VarName']].values,
+                                              read_reference(default_run, [d], 'evap', b['VarName'])[0])
+
+    # 已齐全时不再读取或写出
+    mtimes = {d: os.stat(era5l.out_path_for(out_dirs, spec, d)).st_mtime_ns for d in dates}
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[-1],
+                                   {'evap': era5l.EVAP_BANDS}, incremental_append=True)
+    assert counts['skip'] == len(dates)
+    assert {d: os.stat(era5l.out_path_for(out_dirs, spec, d)).st_mtime_ns for d in dates} == mtimes
+
+
+def test_journal_resume(synthetic_days, default_run):
+    """
+    写出进程在 start 与 done 之间被杀：重新运行时删除其临时文件并重新生成该单元，输出与默认路径一致；
+    同一输出旁其他主机遗留的临时文件（其 pid 在本机恰好不存在）保留并列出
+    """
+    dates = synthetic_days['dates'][:2]
+    spec = era5l.CATEGORY_SPECS[0]
+    out_dirs = mode_dirs(synthetic_days, 'journal')
+    journal_path = os.path.join(synthetic_days['work_dir'], 'modes', 'journal', 'journal.jsonl')
+    killed = era5l.out_path_for(out_dirs, spec, dates[1])
+    child = (
+        'import os, signal, sys, json, datetime as dt\n'
+        'import deal_ERA5L_MultiCategory as era5l\n'
+        'save_nc = era5l.save_nc\n'
+        'def save_then_die(ds, path, profile="default"):\n'
+        '    save_nc(ds, path, profile)\n'
+        '    if path.startswith(sys.argv[1] + "."):\n'
+        '        os.kill(os.getpid(), signal.SIGKILL)  # 临时文件已写完、尚未重命名与记录 done\n'
+        'era5l.save_nc = save_then_die\n'
+        'start, end = (dt.datetime.strptime(v, "%Y%m%d") for v in sys.argv[4:6])\n'
+        'era5l.run_era5l_multi(sys.argv[2], json.loads(sys.argv[3]), start, end, {"evap": era5l.EVAP_BANDS},\n'
+        '                      journal_path=sys.argv[6])\n'
+    )
+    proc = subprocess.run([sys.executable, '-c', child, killed, synthetic_days['input_dir'], json.dumps(out_dirs),
+                           f'{dates[0]:%Y%m%d}', f'{dates[-1]:%Y%m%d}', journal_path],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=1200)
+    assert proc.returncode == -9, proc.stdout + proc.stderr
+    assert not os.path.exists(killed)
+    own_tmp, = era5l_journal.stale_temps(killed)
+
+    # 其他主机对同一输出的中断写出：pid 取本机一个已退出的进程
+    other = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    other_pid = int(other.stdout)
+    foreign_tmp = f'{killed}.{other_pid}.tmp'
+    open(foreign_tmp, 'w').close()
+    with open(journal_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'event': 'start', 'date': f'{dates[1]:%Y-%m-%d}', 'category': spec['Key'],
+                            'path': killed, 'host': 'other-node', 'pid': other_pid, 'time': ''}) + '\n')
+
+    summary = era5l_journal.resume(journal_path)
+    assert summary['done'] == 1 and summary['inflight'] == 1 and summary['removed'] == 1
+    assert summary['foreign'] == [(foreign_tmp, 'other-node', other_pid)]
+    assert not os.path.exists(own_tmp) and os.path.exists(foreign_tmp)
+
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[-1],
+                                   {'evap': era5l.EVAP_BANDS}, journal_path=journal_path)
+    assert counts == {'ok': 1, 'skip': 1, 'fail': 0}
+    assert_same_outputs(default_run, out_dirs, dates, selection={'evap': era5l.EVAP_BANDS})
+    done, inflight, _writers = era5l_journal.load(journal_path)
+    assert done == {spec['Key']: set(dates)} and not inflight
+    assert era5l_journal.stale_temps(killed) == [foreign_tmp]
+
+
+def test_qc_checks():
+    """QC 分别报告注入的超出物理范围的值、X_min > X_max 的格点与接缝两侧不连续；无注入时通过"""
+    yy, xx = np.mgrid[0:180, 0:360].astype(np.float32)
+    base = 3.0 + np.sin(yy / 20.0) + np.cos(xx * np.float32(np.pi / 60))  # 经向周期，±180° 处连续
+    arrays = {'lai_high': base, 'lai_high_min': base - 0.5, 'lai_high_max': base + 0.5,
+              'lai_low_min': base - 0.5, 'lai_low_max': base + 0.5}
+    limits = dict(era5l.QC_LIMITS)
+    seam_cols = (180, 0)
+    record = era5l_qc.check_day(FIRST_DAY, {'veg': {k: v.copy() for k, v in arrays.items()}}, era5l.QC_RANGES,
+                                limits, seam_cols)
+    assert record['status'] == 'ok' and not record['issues'], record['issues']
+
+    arrays['lai_high'] = base.copy()
+    arrays['lai_high'][10:30, 10:30] = 50.0                                   # 超出 (0, 10)：0.6% 的格点
+    arrays['lai_low_min'] = arrays['lai_low_min'].copy()
+    arrays['lai_low_min'][100:120, 200:220] = arrays['lai_low_max'][100:120, 200:220] + 1.0  # min > max
+    arrays['lai_high_max'] = arrays['lai_high_max'].copy()
+    arrays['lai_high_max'][:, 180:] += 3.0                                    # 右半幅整体偏移：两处接缝不连续
+    record = era5l_qc.check_day(FIRST_DAY, {'veg': arrays}, era5l.QC_RANGES, limits, seam_cols)
+    found = {(i['check'], i['var']): i for i in record['issues']}
+    # 越界的 lai_high 同时大于 lai_high_max，也违反 X <= X_max
+    assert set(found) == {('out_of_range', 'veg/lai_high'), ('bounds', 'veg/lai_high<=lai_high_max'),
+                          ('bounds', 'veg/lai_low_min<=lai_low_max'), ('seam_ratio', 'veg/lai_high_max')}, \
+        record['issues']
+    assert all(i['level'] == 'error' for i in record['issues']) and record['status'] == 'error'
+    assert found[('out_of_range', 'veg/lai_high')]['value'] == pytest.approx(400 / base.size, rel=1e-3)
+    assert found[('bounds', 'veg/lai_low_min<=lai_low_max')]['value'] == pytest.approx(400 / base.size, rel=1e-3)
+    assert [r > limits['seam_ratio'] for r in record['seam']['veg/lai_high_max']] == [True, True]
+    assert record['vars']['veg/lai_high'][2] == 50.0
+    assert 'out_of_range veg/lai_high' in era5l_qc.failure_message(record)
+
+
+def test_qc_fail_fast(synthetic_days, monkeypatch):
+    """fail-fast：未通过检查的日期抛出 QCFailed 且不写出，累计达到 QC_FAIL_FAST 天后停止运行，报告记录停止"""
+    dates = synthetic_days['dates']
+    base = os.path.join(synthetic_days['work_dir'], 'qc')
+    out_dirs = {spec['Key']: os.path.join(base, spec['Key']) for spec in era5l.CATEGORY_SPECS}
+    report = os.path.join(base, 'qc.jsonl')
+    raised = []
+    process_one_day = era5l.process_one_day
+
+    def recording(plan, ctx, *args, **kwargs):
+        try:
+            return process_one_day(plan, ctx, *args, **kwargs)
+        except era5l_qc.QCFailed as e:
+            raised.append((plan['date'], str(e)))
+            raise
+    monkeypatch.setattr(era5l, 'process_one_day', recording)
+
+    # 合成输入约 30% 缺测，缺测比例阈值 1% 时每日均为 error
+    counts = era5l.run_era5l_multi(synthetic_days['input_dir'], out_dirs, dates[0], dates[-1],
+                                   {'evap': era5l.EVAP_BANDS}, qc_report_path=report,
+                                   qc_limits={'nan_fraction': 0.01}, qc_fail_fast=2)
+    assert counts == {'ok': 0, 'skip': 0, 'fail': 2}
+    assert [d for d, _msg in raised] == dates[:2]
+    assert all('nan_fraction evap/' in msg for _d, msg in raised)
+    for d in dates:
+        assert not os.path.exists(era5l.out_path_for(out_dirs, era5l.CATEGORY_SPECS[0], d))
+
+    with open(report, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [r['date'] for r in records if r['type'] == 'day'] == [f'{d:%Y-%m-%d}' for d in dates[:2]]
+    run = records[-1]
+    assert run['type'] == 'run' and run['stopped'] and run['failed_days'] == 2 and run['error'] == 2
+    assert run['checks']['nan_fraction']['error'] == 2 * len(era5l.EVAP_BANDS)
+
+
+def test_claim_workers(synthetic_days):
+    """三个 worker --claim-dir 进程处理同一日期范围：每个 (日期, 类别) 单元恰好由一个进程写出一次"""
+    dates = synthetic_days['dates']
+    base = os.path.join(synthetic_days['work_dir'], 'claims')
+    claim_dir = os.path.join(base, 'locks')
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'deal_ERA5L_MultiCategory.py')
+    cmd = [sys.executable, script, 'worker', '--input', synthetic_days['input_dir'], '--output', base,
+           '--start', f'{dates[0]:%Y%m%d}', '--end', f'{dates[-1]:%Y%m%d}', '--categories', 'evap',
+           '--claim-dir', claim_dir, '--lease', '600']
+    workers = [subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+               for _ in range(3)]
+    outputs = [w.communicate(timeout=1200)[0] for w in workers]
+    assert [w.returncode for w in workers] == [0, 0, 0], outputs
+
+    claimed = [line.split(']')[0].split('[')[1] for out in outputs for line in out.splitlines()
+               if '] 认领: evap' in line]
+    assert sorted(claimed) == [f'{d:%Y-%m-%d}' for d in dates], claimed
+    out_dirs = era5l.default_out_dirs(base)
+    for d in dates:
+        assert os.path.isfile(era5l.out_path_for(out_dirs, era5l.CATEGORY_SPECS[0], d))
+    assert os.listdir(claim_dir) == []
+
+
+def test_claim_takeover_release():
+    """A 的租约过期后由 B 接管：A 结束时释放的是已不属于它的锁，B 的锁保留，第三个工作进程无法认领"""
+    with tempfile.TemporaryDirectory() as claim_dir:
+        path = era5l_claims.try_claim(claim_dir, FIRST_DAY, 'evap', 60, 'host-a:1')
+        assert path is not None
+        assert era5l_claims.try_claim(claim_dir, FIRST_DAY, 'evap', 60, 'host-b:2') is None
+        stale = time.time() - 120
+        os.utime(path, (stale, stale))
+        assert era5l_claims.try_claim(claim_dir, FIRST_DAY, 'evap', 60, 'host-b:2') == path
+        held = {path}
+        era5l_claims.release(path, 'host-a:1', held)
+        assert not held
+        assert era5l_claims.lock_owner(path) == 'host-b:2'
+        assert era5l_claims.try_claim(claim_dir, FIRST_DAY, 'evap', 60, 'host-c:3') is None
+        era5l_claims.release(path, 'host-b:2')
+        assert os.listdir(claim_dir) == []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ERA5-Land 处理流程的合成数据基准测试')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'era5l_bench'),
+                        help='合成输入与输出目录（同一布局的输入会复用）')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=DEFAULT_SCENARIOS)
+    parser.add_argument('--days', type=int, default=2, help='每个场景处理的天数')
+    parser.add_argument('--block', type=int, default=256, help='tif 分块边长，0 为行条带')
+    parser.add_argument('--compress', choices=['deflate', 'lzw', 'none'], default='deflate')
+    parser.add_argument('--interleave', choices=['band', 'pixel'], default='band')
+    parser.add_argument('--baseline', help='与此基准 JSON 比较')
+    parser.add_argument('--save-baseline', help='将结果保存为基准 JSON')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='允许的相对退化幅度')
+    args = parser.parse_args(argv)
+
+    layout = f'b{args.block}_{args.compress}_{args.interleave}'
+    input_dir = os.path.join(args.work_dir, 'in', layout)
+    dates = [FIRST_DAY + dt.timedelta(days=i) for i in range(args.days)]
+    t = time.time()
+    make_synthetic_inputs(input_dir, dates, block=args.block, compress=args.compress, interleave=args.interleave)
+    print(f'合成输入 ({layout}) 就绪，耗时 {time.time() - t:.1f}秒: {input_dir}')
+
+    results = {}
+    for name in args.scenarios:
+        print(f'运行场景 {name} …')
+        results[name] = dict(run_scenario(name, input_dir, args.work_dir, args.days), layout=layout)
+
+    columns = ['wall_s', 'read_s', 'build_s', 'write_s', 'throughput_mb_s', 'peak_rss_mb']
+    print('\n' + f"{'scenario':<20}" + ''.join(f'{c:>16}' for c in columns))
+    for name, r in results.items():
+        print(f'{name:<20}' + ''.join(f'{r[c]:>16.2f}' if r[c] is not None else f"{'-':>16}" for c in columns))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'基准已保存: {args.save_baseline}')
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f'\n与基准比较 (容差 {args.tolerance:.0%}):')
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f'发现 {len(regressions)} 项退化。', file=sys.stderr)
+            return 1
+        print('未发现退化。')
+    return 0
+
 
 if __name__ == '__main__':
-    test_single_day()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == '_run':
+        # 子进程：运行单个场景，最后一行输出 JSON 指标
+        _, _, name, input_dir, out_dir, n_days = sys.argv
+        metrics = run_scenario_inprocess(SCENARIOS[name], input_dir, out_dir, int(n_days))
+        print(json.dumps(metrics))
+    else:
+        sys.exit(main())